@@ -0,0 +1,239 @@
+"""Hiring funnel analytics over the CSV tables, computed with pandas."""
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import utils
+import archive
+import shards
+from locking import read_lock, atomic_write
+
+SNAPSHOT_DIR = 'analytics'
+# Bump when the frame layout changes so stale snapshots are rebuilt
+SNAPSHOT_VERSION = 1
+
+SCORE_BINS = [0, 20, 40, 60, 80, 100]
+SCORE_LABELS = ['0-20', '20-40', '40-60', '60-80', '80-100']
+
+# Columns read per table; large free-text columns (content_text, hr_notes) are never loaded.
+TABLE_SPECS = {
+    'applications.csv': {
+        'columns': ['id', 'job_id', 'user_id', 'status', 'score', 'eligibility', 'applied_date', 'decision_date'],
+        'categories': {
+            'status': ['Applied', 'Selected', 'Rejected'],
+            'eligibility': ['High', 'Medium', 'Low'],
+        },
+        'dates': ['applied_date', 'decision_date'],
+    },
+    'jobs.csv': {
+        'columns': ['id', 'hr_id', 'title', 'vacancies', 'status'],
+        'categories': {'status': ['Open', 'Closed']},
+        'dates': [],
+    },
+    'candidate_pool.csv': {
+        'columns': ['id', 'job_id', 'score', 'recommendation', 'hr_decision', 'upload_date', 'decision_date'],
+        'categories': {
+            'recommendation': ['Select', 'Review', 'Reject'],
+            'hr_decision': ['Hire', 'Interview', 'Reject'],
+        },
+        'dates': ['upload_date', 'decision_date'],
+    },
+}
+
+
+def _source_signature(filename):
+    generation = utils.table_generation(filename)
+    if generation == '0':
+        return None
+    return (SNAPSHOT_VERSION, generation)
+
+
+def _read_csv(path, columns):
+    return pd.read_csv(path, usecols=lambda c: c in columns, dtype=str, keep_default_na=False,
+                       engine='c', on_bad_lines='skip')
+
+
+def _read_table(filename):
+    """Parse one CSV into a typed frame with categorical encodings."""
+    spec = TABLE_SPECS[filename]
+    columns = spec['columns']
+    names = shards.list_shards(filename) if shards.is_sharded(filename) else [filename]
+    frames = []
+    for name in names:
+        path = os.path.join(utils.DATA_DIR, name)
+        with read_lock(name):
+            if os.path.exists(path):
+                frames.append(_read_csv(path, columns))
+    if filename in archive.TABLES:
+        # Closed jobs' rows live in the archive; reports still cover them
+        frames += [_read_csv(p, columns) for p in archive.archive_paths(filename)]
+    if not frames:
+        return pd.DataFrame({c: pd.Series(dtype='object') for c in columns})
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    for col in columns:
+        if col not in df.columns:
+            df[col] = ''
+
+    df['id'] = pd.to_numeric(df['id'], errors='coerce').astype('Int64')
+    for col in ('score', 'vacancies'):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    for col in ('job_id', 'user_id', 'hr_id'):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col, levels in spec['categories'].items():
+        df[col] = pd.Categorical(df[col], categories=levels)
+    for col in spec['dates']:
+        df[col] = pd.to_datetime(df[col], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    return df[columns]
+
+
+def load_table(filename, use_snapshot=True):
+    """Load a table, reusing the on-disk pickled snapshot while the CSV is unchanged."""
+    signature = _source_signature(filename)
+    if signature and filename in archive.TABLES:
+        signature += (archive.generation(),)
+    snapshot_dir = os.path.join(utils.DATA_DIR, SNAPSHOT_DIR)
+    snapshot_path = os.path.join(snapshot_dir, filename.replace('.csv', '.pkl'))
+
+    if use_snapshot and signature and os.path.exists(snapshot_path):
+        try:
+            with open(snapshot_path, 'rb') as f:
+                cached_signature, df = pickle.load(f)
+            if cached_signature == signature:
+                return df
+        except Exception as e:
+            print(f"Discarding analytics snapshot {snapshot_path}: {e}")
+
+    df = _read_table(filename)
+    if use_snapshot and signature:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        with atomic_write(snapshot_path, 'wb') as f:
+            pickle.dump((signature, df), f, protocol=pickle.HIGHEST_PROTOCOL)
+    return df
+
+
+def load_frames(use_snapshot=True):
+    return {
+        'applications': load_table('applications.csv', use_snapshot),
+        'jobs': load_table('jobs.csv', use_snapshot),
+        'candidates': load_table('candidate_pool.csv', use_snapshot),
+    }
+
+
+def _hours_between(start, end):
+    return (end - start).dt.total_seconds() / 3600.0
+
+
+def _application_funnel(apps, key):
+    """Per-group application metrics: counts, score quantiles, eligibility mix, decisions."""
+    grouped = apps.groupby(key, observed=True)
+    out = pd.DataFrame({
+        'applications': grouped.size(),
+        'avg_score': grouped['score'].mean(),
+        'median_score': grouped['score'].median(),
+        'p25_score': grouped['score'].quantile(0.25),
+        'p75_score': grouped['score'].quantile(0.75),
+    })
+
+    eligibility = pd.crosstab(apps[key], apps['eligibility'], dropna=False)
+    status = pd.crosstab(apps[key], apps['status'], dropna=False)
+    out = out.join(eligibility.add_prefix('eligibility_')).join(status.add_prefix('status_'))
+
+    decided = apps['decision_date'].notna() & apps['applied_date'].notna()
+    hours = _hours_between(apps.loc[decided, 'applied_date'], apps.loc[decided, 'decision_date'])
+    out['median_hours_to_decision'] = hours.groupby(apps.loc[decided, key], observed=True).median()
+
+    bins = pd.cut(apps['score'], bins=SCORE_BINS, labels=SCORE_LABELS, include_lowest=True)
+    histogram = pd.crosstab(apps[key], bins, dropna=False).reindex(columns=SCORE_LABELS, fill_value=0)
+    out = out.join(histogram.add_prefix('bin_'))
+
+    out = out.fillna({c: 0 for c in out.columns if c.startswith(('eligibility_', 'status_', 'bin_'))})
+    total = out['applications'].replace(0, np.nan)
+    out['select_rate'] = out.get('status_Selected', 0) / total * 100
+    out['reject_rate'] = out.get('status_Rejected', 0) / total * 100
+    return out
+
+
+def _candidate_funnel(candidates, key):
+    """Per-group candidate pool metrics from bulk screening."""
+    grouped = candidates.groupby(key, observed=True)
+    out = pd.DataFrame({
+        'candidates': grouped.size(),
+        'avg_pool_score': grouped['score'].mean(),
+    })
+    recommendation = pd.crosstab(candidates[key], candidates['recommendation'], dropna=False)
+    decision = pd.crosstab(candidates[key], candidates['hr_decision'], dropna=False)
+    out = out.join(recommendation.add_prefix('rec_')).join(decision.add_prefix('decision_'))
+
+    decided = candidates['decision_date'].notna() & candidates['upload_date'].notna()
+    hours = _hours_between(candidates.loc[decided, 'upload_date'], candidates.loc[decided, 'decision_date'])
+    out['median_pool_hours_to_decision'] = hours.groupby(candidates.loc[decided, key], observed=True).median()
+    return out.fillna({c: 0 for c in out.columns if c.startswith(('rec_', 'decision_'))})
+
+
+def _records(df):
+    """Convert a frame to template-friendly dicts (NaN -> None, floats rounded)."""
+    df = df.round(1).astype(object).where(df.notna(), None)
+    return df.reset_index().to_dict('records')
+
+
+def funnel_report(hr_id=None, frames=None):
+    """Build funnel metrics per job, per HR user and overall.
+
+    When ``hr_id`` is given the report only covers that HR user's jobs.
+    """
+    frames = frames or load_frames()
+    jobs = frames['jobs']
+    apps = frames['applications']
+    candidates = frames['candidates']
+
+    if hr_id is not None:
+        jobs = jobs[jobs['hr_id'] == str(hr_id)]
+        job_ids = set(jobs['id'].dropna().astype(str))
+        apps = apps[apps['job_id'].isin(job_ids)]
+        candidates = candidates[candidates['job_id'].isin(job_ids)]
+
+    # job_id stays categorical on the large tables; only the small jobs table is converted
+    jobs = jobs.assign(job_id=jobs['id'].astype(str))
+
+    per_job = (jobs.set_index('job_id')[['title', 'hr_id', 'vacancies', 'status']]
+               .join(_application_funnel(apps, 'job_id'))
+               .join(_candidate_funnel(candidates, 'job_id')))
+    per_job[['applications', 'candidates']] = per_job[['applications', 'candidates']].fillna(0).astype(int)
+
+    hr_of_job = jobs.set_index('job_id')['hr_id'].astype(str)
+    apps_hr = apps.assign(hr_id=apps['job_id'].map(hr_of_job).astype('category'))
+    candidates_hr = candidates.assign(hr_id=candidates['job_id'].map(hr_of_job).astype('category'))
+    per_hr = pd.DataFrame({'jobs': jobs.groupby(jobs['hr_id'].astype(str)).size()})
+    per_hr = (per_hr.join(_application_funnel(apps_hr.dropna(subset=['hr_id']), 'hr_id'))
+              .join(_candidate_funnel(candidates_hr.dropna(subset=['hr_id']), 'hr_id')))
+    per_hr[['applications', 'candidates']] = per_hr[['applications', 'candidates']].fillna(0).astype(int)
+    usernames = {u['id']: u['username'] for u in utils.load_users()}
+    per_hr['username'] = [usernames.get(h, 'Unknown') for h in per_hr.index]
+
+    bins = pd.cut(apps['score'], bins=SCORE_BINS, labels=SCORE_LABELS, include_lowest=True)
+    histogram = bins.value_counts(sort=False).reindex(SCORE_LABELS, fill_value=0)
+    decided = apps['decision_date'].notna() & apps['applied_date'].notna()
+    hours = _hours_between(apps.loc[decided, 'applied_date'], apps.loc[decided, 'decision_date'])
+    total_apps = len(apps)
+
+    totals = {
+        'applications': total_apps,
+        'candidates': len(candidates),
+        'jobs': len(jobs),
+        'avg_score': round(float(apps['score'].mean()), 1) if total_apps else 0,
+        'select_rate': round(float((apps['status'] == 'Selected').mean() * 100), 1) if total_apps else 0,
+        'reject_rate': round(float((apps['status'] == 'Rejected').mean() * 100), 1) if total_apps else 0,
+        'median_hours_to_decision': round(float(hours.median()), 1) if len(hours) else None,
+        'eligibility': {k: int(v) for k, v in apps['eligibility'].value_counts(sort=False).items()},
+        'score_histogram': [{'label': k, 'count': int(v)} for k, v in histogram.items()],
+    }
+
+    return {
+        'jobs': _records(per_job.rename_axis('job_id')),
+        'hr': _records(per_hr.rename_axis('hr_id')),
+        'totals': totals,
+    }
@@ -1,20 +1,53 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory
+from flask import (Flask, render_template, request, redirect, url_for, session, flash, send_from_directory, jsonify,
+                   stream_with_context)
 import os
+import io
+import json
+import base64
+import hmac
+import itertools
 import secrets
+import hashlib
+import utils
 from utils import (load_users, save_user, authenticate_user, load_jobs, save_job, 
                    class_based_compatibility, save_resume, get_user_resume, get_user_resumes,
-                   basic_resume_analysis, get_job_by_id, save_application, get_user_applications,
-                   get_hr_jobs_with_applications, update_application_status, get_system_stats,
+                   basic_resume_analysis, get_job_by_id, save_application,
                    initialize_admin, get_resume_by_id, deep_resume_analysis, check_job_satisfaction, 
-                   bulk_update_applications, delete_user, delete_job, update_job_status, get_all_jobs,
-                   extract_and_parse_resumes, screen_candidates, save_candidate_to_pool, get_candidate_pool,
-                   update_candidate_decision, get_recent_activity, get_system_metrics)
+                   delete_user, get_all_jobs, save_candidate_to_pool,
+                   get_recent_activity, get_system_metrics, bootstrap_data,
+                   table_generation, score_resume, update_job)
+# Reads and writes that must see archived jobs' rows too
+from archive import (get_user_applications, get_hr_jobs_with_applications, get_system_stats,
+                     get_candidate_pool, update_application_status, bulk_update_applications,
+                     update_candidate_decision, apply_batch_decisions, update_job_status, delete_job)
 from werkzeug.utils import secure_filename
-
+from werkzeug.sansio.multipart import MultipartDecoder, NeedData, Field, File, Data, Epilogue
+from markupsafe import Markup
+from cache import fragment_cache, row_version
+import rescore
+import export
+import archive
+import scheduler
+import recommend
+import groupcommit
+import scorecache
+import screening
+
+# Importing this module has no side effects: data files are created by
+# bootstrap_data(), which create_app() and the first request both trigger.
 app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)
-app.config['UPLOAD_FOLDER'] = 'data/uploads'
+# Set SECRET_KEY when running several workers so sessions are valid on all of them
+app.secret_key = os.environ.get('SECRET_KEY') or secrets.token_hex(16)
+app.config['DATA_DIR'] = os.environ.get('RESUME_DATA_DIR', utils.DATA_DIR)
+app.config['UPLOAD_FOLDER'] = os.path.join(app.config['DATA_DIR'], 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
+# Bearer tokens for external systems calling /api/score, comma separated
+app.config['API_TOKENS'] = [t.strip() for t in os.environ.get('RESUME_API_TOKENS', '').split(',') if t.strip()]
+app.config['API_MAX_CONTENT_LENGTH'] = 512 * 1024 * 1024  # bodies are streamed, not buffered
+# keyword, tfidf or bm25; see utils.SCORING_MODES
+app.config['SCORING_MODE'] = os.environ.get('RESUME_SCORING_MODE', utils.SCORING_MODE)
+# none, interval, group or always; see groupcommit.py
+app.config['DURABILITY'] = os.environ.get('RESUME_DURABILITY', groupcommit.DURABILITY)
 
 DEFAULT_JOB_ROLES = [
     "Software Engineer", "Frontend Developer", "Backend Developer", "Full Stack Developer",
@@ -23,32 +56,87 @@ DEFAULT_JOB_ROLES = [
     "UX/UI Designer", "QA Engineer", "Cloud Architect", "Database Administrator"
 ]
 
-# Ensure directories exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs('data', exist_ok=True)
-
-# Initialize CSVs if not exist
-import os
-if not os.path.exists('data/users.csv'):
-    with open('data/users.csv', 'w') as f:
-        f.write('id,username,password,role,email\n')
-    initialize_admin() # Initialize admin if creating fresh
-else:
-    # Attempt to init admin even if file exists (e.g. if it was manually deleted from csv)
-    initialize_admin()
-
-if not os.path.exists('data/jobs.csv'):
-    with open('data/jobs.csv', 'w') as f:
-        f.write('id,hr_id,title,description,skills_required,vacancies,status\n')
-if not os.path.exists('data/resumes.csv'):
-    with open('data/resumes.csv', 'w') as f:
-        f.write('id,user_id,filename,content_text,upload_date,file_path\n')
-if not os.path.exists('data/candidate_pool.csv'):
-    with open('data/candidate_pool.csv', 'w') as f:
-        f.write('id,job_id,filename,content_text,score,recommendation,justification,hr_decision,upload_date,file_path\n')
-if not os.path.exists('data/applications.csv'):
-    with open('data/applications.csv', 'w') as f:
-        f.write('id,job_id,user_id,resume_id,status,hr_notes,score,eligibility\n')
+def create_app(config=None):
+    """App factory: apply config overrides and bootstrap the data directory once.
+
+    Use ``gunicorn 'app:create_app()'`` for multi-worker deployments.
+    """
+    if config:
+        app.config.update(config)
+        if 'DATA_DIR' in config and 'UPLOAD_FOLDER' not in config:
+            app.config['UPLOAD_FOLDER'] = os.path.join(app.config['DATA_DIR'], 'uploads')
+    if app.config['SCORING_MODE'] not in utils.SCORING_MODES:
+        raise ValueError(f"SCORING_MODE must be one of {', '.join(utils.SCORING_MODES)}")
+    if app.config['DURABILITY'] not in groupcommit.DURABILITY_MODES:
+        raise ValueError(f"DURABILITY must be one of {', '.join(groupcommit.DURABILITY_MODES)}")
+    utils.DATA_DIR = app.config['DATA_DIR']
+    utils.SCORING_MODE = app.config['SCORING_MODE']
+    groupcommit.DURABILITY = app.config['DURABILITY']
+    bootstrap_data()
+    return app
+
+@app.before_request
+def ensure_bootstrapped():
+    # Covers `flask run` / `gunicorn app:app`, which never call create_app()
+    utils.DATA_DIR = app.config['DATA_DIR']
+    utils.SCORING_MODE = app.config['SCORING_MODE']
+    groupcommit.DURABILITY = app.config['DURABILITY']
+    bootstrap_data()
+    archive.maybe_sweep()
+
+# Uploaded resumes are stored under a fresh uuid name and never rewritten
+UPLOAD_MAX_AGE = 365 * 24 * 3600
+
+# What resume pickers and lists show; the resume text is only read for the one being analyzed
+RESUME_LIST_COLUMNS = ('id', 'filename', 'upload_date')
+
+_render_version = None
+
+def _get_render_version():
+    """Changes when templates or app code are deployed, so cached pages are not reused across releases."""
+    global _render_version
+    if _render_version is None:
+        template_dir = os.path.join(app.root_path, app.template_folder)
+        paths = [__file__, utils.__file__] + [os.path.join(template_dir, name) for name in os.listdir(template_dir)]
+        _render_version = max(os.stat(path).st_mtime_ns for path in paths)
+    return _render_version
+
+def page_etag(*tables):
+    """ETag for a page derived from the data generations of the tables it reads.
+
+    Returns None when the page must be rendered anyway (pending flash messages).
+    """
+    if session.get('_flashes'):
+        return None
+    parts = [request.full_path, str(session.get('user_id')), str(session.get('role')), str(_get_render_version())]
+    parts += [f"{t}={table_generation(t)}" for t in tables]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+def not_modified(etag):
+    """Short-circuit with a 304 when the client already has this version of the page."""
+    if etag and request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        return cache_page(response, etag)
+    return None
+
+def cache_page(response, etag):
+    if etag:
+        response = app.make_response(response)
+        response.set_etag(etag)
+        # Browsers keep the page but revalidate it on every visit
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response
+
+@app.template_global()
+def cached_row(template_name, table, row):
+    """Render a per-row partial, reusing the cached HTML while the row is unchanged."""
+    version = row_version(row)
+    html = fragment_cache.get(template_name, table, row['id'], version)
+    if html is None:
+        html = Markup(render_template(template_name, row=row))
+        fragment_cache.put(template_name, table, row['id'], version, html)
+    return html
 
 @app.route('/')
 def index():
@@ -113,10 +201,15 @@ def user_dashboard():
     if 'user_id' not in session or session['role'] != 'user':
         return redirect(url_for('login'))
     
+    etag = page_etag('resumes.csv', 'jobs.csv', 'applications.csv')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
     user_id = session['user_id']
-    resumes = get_user_resumes(user_id)
+    resumes = get_user_resumes(user_id, RESUME_LIST_COLUMNS)
     # Default to the most recent resume for analysis display if available
-    resume = resumes[-1] if resumes else None
+    resume = get_user_resume(user_id) if resumes else None
     
     jobs = load_jobs()
     applications = get_user_applications(user_id)
@@ -124,7 +217,7 @@ def user_dashboard():
     analysis = None
     if resume:
         # Re-run basic analysis for display
-        score, suggestions = basic_resume_analysis(resume['content_text'])
+        score, suggestions = basic_resume_analysis(utils.resume_document(resume))
         analysis = {
             'filename': resume['filename'],
             'upload_date': resume['upload_date'],
@@ -133,7 +226,7 @@ def user_dashboard():
             'id': resume['id']
         }
         
-    return render_template('user_dashboard.html', analysis=analysis, jobs=jobs, applications=applications, resumes=resumes, default_roles=DEFAULT_JOB_ROLES)
+    return cache_page(render_template('user_dashboard.html', analysis=analysis, jobs=jobs, applications=applications, resumes=resumes, default_roles=DEFAULT_JOB_ROLES), etag)
 
 @app.route('/user/upload_resume', methods=['POST'])
 def upload_resume():
@@ -161,7 +254,7 @@ def check_satisfaction():
         return redirect(url_for('login'))
 
     result = None
-    resumes = get_user_resumes(session['user_id'])
+    resumes = get_user_resumes(session['user_id'], RESUME_LIST_COLUMNS)
     
     if request.method == 'POST':
         job_description = request.form['job_description']
@@ -171,13 +264,13 @@ def check_satisfaction():
         if resume_id:
             resume = get_resume_by_id(resume_id)
         elif resumes:
-            resume = resumes[-1] # Default to latest
+            resume = get_user_resume(session['user_id']) # Default to latest
             
         if not resume:
             flash('Please upload a resume first!', 'error')
             return redirect(url_for('user_dashboard'))
             
-        score, missing = check_job_satisfaction(resume['content_text'], job_description)
+        score, missing = check_job_satisfaction(utils.resume_document(resume), job_description)
         result = {
             'score': score,
             'missing_keywords': missing,
@@ -204,8 +297,7 @@ def check_eligibility(job_id):
         flash('Invalid resume or job.', 'error')
         return redirect(url_for('user_dashboard'))
     
-    job_description = f"{job['title']} {job['description']} {job['skills_required']}"
-    score, details = check_job_satisfaction(resume['content_text'], job_description, detailed=True)
+    score, details = scorecache.job_score(resume, job)
     
     result = {
         'job_title': job['title'],
@@ -219,9 +311,29 @@ def check_eligibility(job_id):
     }
     
     # Return JSON for AJAX request or redirect
-    from flask import jsonify
     return jsonify(result)
 
+@app.route('/user/recommendations')
+def job_recommendations():
+    """Open jobs ranked for one of the user's resumes (default: the latest), as JSON."""
+    if 'user_id' not in session or session['role'] != 'user':
+        return redirect(url_for('login'))
+
+    resume_id = request.args.get('resume_id')
+    resume = get_resume_by_id(resume_id) if resume_id else get_user_resume(session['user_id'])
+    if not resume or str(resume['user_id']) != str(session['user_id']):
+        return jsonify({'error': 'Please upload a resume first.'}), 404
+    try:
+        limit = max(1, int(request.args.get('limit', recommend.DEFAULT_LIMIT)))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number.'}), 400
+
+    return jsonify({
+        'resume_id': resume['id'],
+        'filename': resume['filename'],
+        'jobs': recommend.recommend_jobs(resume, limit)
+    })
+
 @app.route('/user/apply/<job_id>', methods=['POST'])
 def apply_job(job_id):
     if 'user_id' not in session:
@@ -242,12 +354,11 @@ def apply_job(job_id):
         flash('Job not found.', 'error')
         return redirect(url_for('user_dashboard'))
         
-    # Check compatibility with detailed analysis
-    job_description = f"{job['title']} {job['description']} {job['skills_required']}"
-    score, details = check_job_satisfaction(resume['content_text'], job_description, detailed=True)
+    # Check compatibility with detailed analysis; usually memoized by the eligibility check
+    score, details = scorecache.job_score(resume, job)
     eligibility = details.get('eligibility_level', 'Medium')
     
-    if save_application(job_id, session['user_id'], resume['id'], score, eligibility):
+    if save_application(job_id, session['user_id'], resume['id'], score, eligibility, utils.job_version(job)):
         flash(f'Applied successfully with {resume["filename"]}! Compatibility: {score}% ({eligibility} match)', 'success')
     else:
         flash('You have already applied to this job.', 'warning')
@@ -259,8 +370,13 @@ def hr_dashboard():
     if 'user_id' not in session or session['role'] != 'hr':
         return redirect(url_for('login'))
         
+    etag = page_etag('jobs.csv', 'applications.csv', 'users.csv')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
     job_applications = get_hr_jobs_with_applications(session['user_id'])
-    return render_template('hr_dashboard.html', job_applications=job_applications, default_roles=DEFAULT_JOB_ROLES)
+    return cache_page(render_template('hr_dashboard.html', job_applications=job_applications, default_roles=DEFAULT_JOB_ROLES), etag)
 
 @app.route('/hr/post_job', methods=['POST'])
 def post_job():
@@ -276,6 +392,36 @@ def post_job():
     flash('Job posted successfully!', 'success')
     return redirect(url_for('hr_dashboard'))
 
+@app.route('/hr/edit_job/<job_id>', methods=['POST'])
+def edit_job(job_id):
+    """Edit a job; its applications and pool candidates are rescored in the background."""
+    if 'user_id' not in session or session['role'] != 'hr':
+        return redirect(url_for('login'))
+
+    job = get_job_by_id(job_id)
+    if not job or str(job['hr_id']) != str(session['user_id']):
+        flash('Unauthorized action.', 'error')
+        return redirect(url_for('hr_dashboard'))
+
+    result = update_job(job_id, request.form['title'], request.form['description'],
+                        request.form['skills'], request.form['vacancies'])
+    if result:
+        old_job, new_job = result
+        rescore.schedule(old_job)
+        flash(f"Job updated to version {new_job['version']}. Scores are being refreshed in the background.", 'success')
+    else:
+        flash('Job not found.', 'error')
+    return redirect(url_for('hr_dashboard'))
+
+@app.route('/hr/rescore_status/<job_id>')
+def rescore_status(job_id):
+    if 'user_id' not in session or session['role'] != 'hr':
+        return jsonify({'error': 'HR login required.'}), 401
+    job = get_job_by_id(job_id)
+    if not job or str(job['hr_id']) != str(session['user_id']):
+        return jsonify({'error': 'Job not found.'}), 404
+    return jsonify(dict(rescore.rescore_status(job_id), job_version=utils.job_version(job)))
+
 @app.route('/hr/update_app', methods=['POST'])
 def update_application():
     if 'user_id' not in session or session['role'] != 'hr':
@@ -317,6 +463,35 @@ def bulk_update_apps():
     flash(f'{count} candidates {status} with justification!', 'success')
     return redirect(url_for('hr_dashboard'))
 
+# Upper bound on items per batch call; clients split larger workloads
+MAX_BATCH_DECISIONS = 20000
+
+@app.route('/hr/api/decisions', methods=['POST'])
+def batch_decisions():
+    """Apply select/reject and hire/interview/reject decisions to many rows in one transaction.
+
+    Body: {"applications": [{"id", "action", "notes"}], "candidates": [{"id", "decision", "notes"}]}.
+    Send an ``Idempotency-Key`` header so retries return the original result.
+    """
+    if 'user_id' not in session or session['role'] != 'hr':
+        return jsonify({'error': 'HR login required.'}), 401
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    app_decisions = payload.get('applications') or []
+    candidate_decisions = payload.get('candidates') or []
+    if not isinstance(app_decisions, list) or not isinstance(candidate_decisions, list):
+        return jsonify({'error': '"applications" and "candidates" must be lists.'}), 400
+    if not all(isinstance(item, dict) for item in app_decisions + candidate_decisions):
+        return jsonify({'error': 'Each decision must be an object.'}), 400
+    if len(app_decisions) + len(candidate_decisions) > MAX_BATCH_DECISIONS:
+        return jsonify({'error': f'At most {MAX_BATCH_DECISIONS} decisions per request.'}), 413
+
+    idempotency_key = request.headers.get('Idempotency-Key') or payload.get('idempotency_key')
+    result = apply_batch_decisions(session['user_id'], app_decisions, candidate_decisions, idempotency_key)
+    return jsonify(result)
+
 @app.route('/hr/toggle_job/<job_id>')
 def toggle_job(job_id):
     if 'user_id' not in session or session['role'] != 'hr':
@@ -337,9 +512,14 @@ def view_resume(resume_id):
     if 'user_id' not in session or (session['role'] != 'hr' and session['role'] != 'admin'):
         return redirect(url_for('login'))
         
+    etag = page_etag('resumes.csv')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
     resume = get_resume_by_id(resume_id)
     if resume:
-        return render_template('view_resume.html', resume=resume)
+        return cache_page(render_template('view_resume.html', resume=resume), etag)
     
     flash('Resume not found.', 'error')
     return redirect(url_for('hr_dashboard'))
@@ -353,19 +533,68 @@ def get_resume_file(filename):
 # Security check: ensure the file is in data/uploads
     # We use basename to prevent directory traversal if something weird is passed
     filename = os.path.basename(filename)
-    return send_from_directory('data/uploads', filename)
+    # conditional=True gives ETag/Last-Modified validation and byte-range
+    # (206) responses, so the PDF viewer can fetch pages on demand
+    response = send_from_directory(app.config['UPLOAD_FOLDER'], filename, conditional=True,
+                                   etag=True, max_age=UPLOAD_MAX_AGE)
+    response.cache_control.private = True
+    response.cache_control.public = False
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/admin/dashboard')
 def admin_dashboard():
     if 'user_id' not in session or session['role'] != 'admin':
         return redirect(url_for('login'))
         
+    etag = page_etag('users.csv', 'jobs.csv', 'applications.csv', 'resumes.csv',
+                     'archive/index.csv', 'archive/retention.json')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
     stats = get_system_stats()
     all_jobs = get_all_jobs()
     activity = get_recent_activity()
     metrics = get_system_metrics()
+    retention = dict(archive.get_policy(), archived_jobs=len(archive.archived_jobs()))
     
-    return render_template('admin_dashboard.html', stats=stats, users=stats['user_list'], jobs=all_jobs, activity=activity, metrics=metrics)
+    return cache_page(render_template('admin_dashboard.html', stats=stats, users=stats['user_list'], jobs=all_jobs, activity=activity, metrics=metrics, retention=retention), etag)
+
+@app.route('/admin/retention', methods=['POST'])
+def admin_retention():
+    """Set how long closed jobs stay in the hot tables and how long archives are kept, then apply it."""
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('login'))
+
+    try:
+        archive_after = int(request.form.get('archive_after_days') or 0)
+        purge_after = request.form.get('purge_after_days', '').strip()
+        archive.set_policy(archive_after, int(purge_after) if purge_after else None)
+    except ValueError:
+        flash('Retention periods must be whole numbers of days, zero or more.', 'error')
+        return redirect(url_for('admin_dashboard'))
+
+    result = archive.sweep()
+    flash(f"Retention policy saved. Archived {result['jobs_archived']} closed jobs, "
+          f"purged {result['jobs_purged']} expired archives.", 'success')
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/reports')
+def reports():
+    """Hiring funnel report: all jobs for admins, own jobs for HR."""
+    if 'user_id' not in session or session['role'] not in ('admin', 'hr'):
+        return redirect(url_for('login'))
+
+    etag = page_etag('users.csv', 'jobs.csv', 'applications.csv', 'candidate_pool.csv')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    import analytics
+    hr_id = None if session['role'] == 'admin' else session['user_id']
+    report = analytics.funnel_report(hr_id=hr_id)
+    return cache_page(render_template('reports.html', report=report), etag)
 
 @app.route('/admin/delete_user/<user_id>')
 def admin_delete_user(user_id):
@@ -391,6 +620,16 @@ def admin_delete_job(job_id):
         
     return redirect(url_for('admin_dashboard'))
 
+@app.route('/hr/screening_progress/<job_id>')
+def screening_progress(job_id):
+    """Provisional ranking of the upload being screened for a job, for the upload page to poll."""
+    if 'user_id' not in session or session['role'] != 'hr':
+        return jsonify({'error': 'HR login required.'}), 401
+    job = get_job_by_id(job_id)
+    if not job or str(job['hr_id']) != str(session['user_id']):
+        return jsonify({'error': 'Job not found.'}), 404
+    return jsonify(screening.progress(job_id) or {'state': 'idle'})
+
 @app.route('/hr/bulk_upload/<job_id>', methods=['GET', 'POST'])
 def bulk_upload_resumes(job_id):
     """Bulk upload and screen resumes for a job."""
@@ -414,23 +653,34 @@ def bulk_upload_resumes(job_id):
             return redirect(url_for('bulk_upload_resumes', job_id=job_id))
         
         try:
-            # Extract and parse resumes
-            resumes_data = extract_and_parse_resumes(zip_file)
+            # Parsing and scoring run as low-priority bulk work, so they don't slow down interactive requests;
+            # candidates are saved as they are scored and the leaders published for the upload page to poll
+            if request.form.get('all_jobs'):
+                # One pass over the archive fills every open job's pool, this job's first
+                job_ids = [job_id] + [i for i in screening.open_job_ids(session['user_id']) if i != str(job_id)]
+                results = scheduler.run_bulk(session['user_id'], screening.screen_zip_for_jobs, job_ids,
+                                             io.BytesIO(zip_file.read()))
+                saved, duplicates = results.get(str(job_id), (0, 0))
+            else:
+                results = None
+                saved, duplicates = scheduler.run_bulk(session['user_id'], screening.screen_zip, job_id,
+                                                       io.BytesIO(zip_file.read()))
             
-            if not resumes_data:
+            if not saved:
                 flash('No valid resumes found in ZIP file.', 'error')
                 return redirect(url_for('bulk_upload_resumes', job_id=job_id))
             
-            # Screen candidates
-            scored_candidates = screen_candidates(job_id, resumes_data)
-            
-            # Save to candidate pool
-            for candidate in scored_candidates:
-                save_candidate_to_pool(job_id, candidate)
-            
-            flash(f'Successfully screened {len(scored_candidates)} candidates!', 'success')
+            message = f'Successfully screened {saved} candidates!'
+            if results:
+                message = f'Successfully screened {saved} candidates for {len(results)} open jobs!'
+            if duplicates:
+                message += f' {duplicates} near-duplicate resumes were flagged and not rescored.'
+            flash(message, 'success')
             return redirect(url_for('view_screening_results', job_id=job_id))
             
+        except scheduler.Busy as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('bulk_upload_resumes', job_id=job_id))
         except Exception as e:
             flash(f'Error processing ZIP file: {str(e)}', 'error')
             return redirect(url_for('bulk_upload_resumes', job_id=job_id))
@@ -448,12 +698,17 @@ def view_screening_results(job_id):
         flash('Unauthorized access.', 'error')
         return redirect(url_for('hr_dashboard'))
     
-    candidates = get_candidate_pool(job_id)
+    etag = page_etag('jobs.csv', 'candidate_pool.csv')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    candidates = get_candidate_pool(job_id, utils.listing_columns('candidate_pool.csv'))
     
     # Sort by score descending
     candidates.sort(key=lambda x: float(x.get('score', 0)), reverse=True)
     
-    return render_template('screening_results.html', job=job, candidates=candidates)
+    return cache_page(render_template('screening_results.html', job=job, candidates=candidates), etag)
 
 @app.route('/hr/update_candidate/<candidate_id>', methods=['POST'])
 def update_candidate(candidate_id):
@@ -475,5 +730,215 @@ def update_candidate(candidate_id):
         return redirect(url_for('view_screening_results', job_id=job_id))
     return redirect(url_for('hr_dashboard'))
 
+@app.route('/hr/export/<job_id>/<kind>')
+def export_job_rows(job_id, kind):
+    """Download a job's candidate pool or applications as CSV or XLSX, streamed row by row.
+
+    Query parameters: ``format`` (csv or xlsx), ``columns`` (comma-separated),
+    ``min_score``, and any table column as an exact-match filter (repeat it
+    to accept several values, e.g. ``hr_decision=Hire&hr_decision=Interview``).
+    """
+    if 'user_id' not in session or session['role'] != 'hr':
+        return redirect(url_for('login'))
+
+    job = get_job_by_id(job_id)
+    if not job or str(job['hr_id']) != str(session['user_id']) or kind not in export.TABLES:
+        flash('Unauthorized access.', 'error')
+        return redirect(url_for('hr_dashboard'))
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(export.FORMATS)}"}), 400
+    available = export.available_columns(kind)
+    columns = [c.strip() for c in request.args.get('columns', '').split(',') if c.strip()]
+    columns = columns or export.DEFAULT_COLUMNS[kind]
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        return jsonify({'error': f"Unknown columns: {', '.join(unknown)}"}), 400
+    try:
+        min_score = float(request.args['min_score']) if request.args.get('min_score') else None
+    except ValueError:
+        return jsonify({'error': 'min_score must be a number.'}), 400
+    table_columns = utils.CSV_HEADERS[export.TABLES[kind]]
+    where = {name: set(request.args.getlist(name)) for name in request.args
+             if name in table_columns and name != 'job_id'}
+
+    rows = export.export_rows(job_id, kind, columns, where, min_score)
+    name = f"{secure_filename(job['title']) or 'job'}-{job_id}-{kind}.{fmt}"
+    if fmt == 'xlsx':
+        body = export.xlsx_chunks(columns, rows, sheet_name=f"{job['title']} {kind}")
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        body = export.csv_chunks(columns, rows)
+        mimetype = 'text/csv'
+    response = app.response_class(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+# --- SCORING API ---
+def _api_client():
+    """'token' for a valid bearer token, the role for an HR/admin session, otherwise None."""
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        token = auth[len('Bearer '):].strip()
+        if any(hmac.compare_digest(token, t) for t in app.config['API_TOKENS']):
+            return 'token'
+        return None
+    if 'user_id' in session and session.get('role') in ('hr', 'admin'):
+        return session['role']
+    return None
+
+def _api_job_description(spec, client):
+    """Resolve a job_id (or inline job_description) to the text resumes are scored against."""
+    job_id = spec.get('job_id')
+    if job_id not in (None, ''):
+        job = get_job_by_id(job_id)
+        # HR sessions may only score against their own jobs
+        if not job or (client == 'hr' and str(job['hr_id']) != str(session['user_id'])):
+            return None, 'Job not found.'
+        return utils.job_description_text(job), None
+    description = spec.get('job_description')
+    if isinstance(description, str) and description.strip():
+        return description, None
+    return None, 'Provide a job_id or job_description.'
+
+def _ndjson_resumes(lines):
+    """Yield (id, text, error) per NDJSON line: {"id", "text"} or {"filename", "content_base64"}."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            yield None, None, 'Invalid JSON line.'
+            continue
+        if not isinstance(item, dict):
+            yield None, None, 'Each line must be a JSON object.'
+            continue
+        ident = item.get('id', item.get('filename'))
+        if 'content_base64' in item:
+            try:
+                data = base64.b64decode(item['content_base64'] or '', validate=True)
+            except (TypeError, ValueError):
+                yield ident, None, 'Invalid base64 content.'
+                continue
+            yield ident, utils.extract_text(item.get('filename') or 'resume.txt', io.BytesIO(data)), None
+        else:
+            text = item.get('text')
+            yield ident, text if isinstance(text, str) else None, None
+
+def _multipart_parts(stream, boundary):
+    """Yield (name, filename, data) per multipart part as the body arrives, holding one part at a time."""
+    decoder = MultipartDecoder(boundary.encode('latin-1'))
+    name = filename = None
+    data = []
+    while True:
+        event = decoder.next_event()
+        if isinstance(event, NeedData):
+            decoder.receive_data(stream.read(64 * 1024) or None)
+        elif isinstance(event, (Field, File)):
+            name, filename, data = event.name, getattr(event, 'filename', None), []
+        elif isinstance(event, Data):
+            data.append(event.data)
+            if not event.more_data:
+                yield name, filename, b''.join(data)
+        elif isinstance(event, Epilogue):
+            return
+
+def _multipart_resumes(parts):
+    """Yield (id, text, error) per ``resume_text`` field or ``resumes`` file among the parts."""
+    while True:
+        try:
+            name, filename, data = next(parts)
+        except StopIteration:
+            return
+        except ValueError:
+            yield None, None, 'Invalid multipart body.'
+            return
+        if name == 'resume_text':
+            yield None, data.decode('utf-8', errors='replace'), None
+        elif name == 'resumes':
+            yield filename, utils.extract_text(filename or 'resume.txt', io.BytesIO(data)), None
+
+@app.route('/api/score', methods=['POST'])
+def api_score():
+    """Score many resumes against one job, streaming one NDJSON result line per resume.
+
+    The job comes from ``job_id``/``job_description`` in the query string,
+    multipart fields sent before the first resume, or the first NDJSON line.
+    Resumes are multipart ``resumes`` files / ``resume_text`` fields, or
+    NDJSON lines of ``{"id", "text"}`` or ``{"filename", "content_base64"}``.
+    Either body is read as it arrives (not through ``request.form``, which
+    would take in the whole upload first), so results start with the first
+    resume. Authenticate with an HR/admin session or ``Authorization: Bearer
+    <token>``.
+    """
+    client = _api_client()
+    if client is None:
+        return jsonify({'error': 'Authentication required.'}), 401
+    request.max_content_length = app.config['API_MAX_CONTENT_LENGTH']
+
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        lines = iter(io.BufferedReader(request.stream, 64 * 1024))
+        spec = request.args
+        if not (spec.get('job_id') or spec.get('job_description')):
+            first = next((line for line in lines if line.strip()), b'')
+            try:
+                spec = json.loads(first)
+            except ValueError:
+                spec = None
+            if not isinstance(spec, dict):
+                return jsonify({'error': 'First line must be a JSON object with job_id or job_description.'}), 400
+        items = _ndjson_resumes(lines)
+    elif request.mimetype == 'multipart/form-data':
+        boundary = request.mimetype_params.get('boundary')
+        if not boundary:
+            return jsonify({'error': 'Invalid multipart body.'}), 400
+        parts = _multipart_parts(request.stream, boundary)
+        form = {}
+        first = []
+        try:
+            for name, filename, data in parts:
+                if name in ('resumes', 'resume_text'):
+                    first = [(name, filename, data)]
+                    break
+                form[name] = data.decode('utf-8', errors='replace')
+        except ValueError:
+            return jsonify({'error': 'Invalid multipart body.'}), 400
+        spec = form if (form.get('job_id') or form.get('job_description')) else request.args
+        items = _multipart_resumes(itertools.chain(first, parts))
+    else:
+        return jsonify({'error': 'Send multipart/form-data or application/x-ndjson.'}), 415
+
+    job_description, error = _api_job_description(spec, client)
+    if error:
+        return jsonify({'error': error}), 404 if spec.get('job_id') else 400
+
+    def generate():
+        scored = failed = 0
+        for index, (ident, text, error) in enumerate(items):
+            result = {'index': index, 'id': ident}
+            try:
+                if error is None and not (text or '').strip():
+                    error = 'No resume text.'
+                if error is None:
+                    result.update(score_resume(text, job_description))
+            except Exception as e:
+                print(f"Error scoring API item {index}: {e}")
+                error = 'Scoring failed.'
+            if error:
+                result['error'] = error
+                failed += 1
+            else:
+                scored += 1
+            yield json.dumps(result) + '\n'
+        yield json.dumps({'done': True, 'scored': scored, 'errors': failed}) + '\n'
+
+    response = app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'  # let nginx pass lines through as they are produced
+    return response
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
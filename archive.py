@@ -0,0 +1,455 @@
+"""Cold storage for closed jobs' applications and pool candidates.
+
+Closing a job (after the retention policy's grace period) moves its rows
+out of ``applications.csv`` and ``candidate_pool.csv`` into gzipped CSVs
+under ``data/archive`` (``job-<id>.<table>.gz``), so the hot tables every
+request scans only hold active hiring. Lookups never scan archived rows:
+
+* ``index.csv`` has one line per archived job (when, row counts, highest
+  ids);
+* ``users/<user_id>.csv`` lists the archived jobs a user applied to, so a
+  user's history opens only those archives;
+* an archived row id still maps to its job in the table's id directory
+  (see shards), so a write to it finds the job to restore.
+
+Reads through ``iter_job_rows`` and ``iter_user_applications`` chain the
+hot and archived rows. Writing to an archived row (an HR decision, a
+rescore after an edit) first restores its job to the hot tables; the
+next retention sweep archives it again. Reopening a job restores it too.
+The functions under "Reads and writes across both tiers" do this for the
+app; the same-named ones in utils only see the hot tables.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import utils
+import termstats
+import shards
+from locking import write_lock, atomic_write
+
+ARCHIVE_DIR = 'archive'
+TABLES = ('applications.csv', 'candidate_pool.csv')
+INDEX_HEADERS = ['job_id', 'archived_date', 'applications', 'candidates', 'max_application_id', 'max_candidate_id']
+USER_DIR = 'users'
+DEFAULT_POLICY = {'archive_after_days': 0, 'purge_after_days': None}
+SWEEP_INTERVAL = 3600
+
+_index_cache = {'key': None, 'index': {}}
+_index_lock = threading.Lock()
+_last_sweep = {}
+_sweep_lock = threading.Lock()
+
+
+def _dir():
+    return os.path.join(utils.DATA_DIR, ARCHIVE_DIR)
+
+
+def _path(name):
+    return os.path.join(_dir(), name)
+
+
+def _archive_path(job_id, filename):
+    return _path(f"job-{job_id}.{filename[:-len('.csv')]}.gz")
+
+
+def _user_path(user_id):
+    return os.path.join(_dir(), USER_DIR, f"{shards._file_key(user_id)}.csv")
+
+
+# --- INDEX ---
+def _read_index_file(name, columns=None, where=None):
+    # Archives and index files only change under both tables' write locks and are
+    # replaced atomically, so readers (id allocation among them) need no lock
+    return list(utils.decode_csv_rows(_open_text(_path(name)), columns, where))
+
+
+def _open_text(path):
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from f
+    except FileNotFoundError:
+        return
+
+
+def archived_jobs():
+    """job_id -> index entry of every archived job; re-read only when the index file changes."""
+    key = (utils.DATA_DIR, generation())
+    if key[1] is None:
+        return {}
+    with _index_lock:
+        if _index_cache['key'] != key:
+            _index_cache.update(key=key, index={r['job_id']: r for r in _read_index_file('index.csv')})
+        return _index_cache['index']
+
+
+def generation():
+    """Changes whenever jobs are archived, restored or purged."""
+    try:
+        st = os.stat(_path('index.csv'))
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def archive_paths(filename):
+    """Archive files of one table, for readers that want every archived row."""
+    paths = (_archive_path(job_id, filename) for job_id in archived_jobs())
+    return [p for p in paths if os.path.exists(p)]
+
+
+def is_archived(job_id):
+    return str(job_id) in archived_jobs()
+
+
+def max_archived_id(filename):
+    """Highest row id of a table that lives in the archive, so ids are never reused."""
+    column = 'max_application_id' if filename == 'applications.csv' else 'max_candidate_id'
+    return max((int(e.get(column) or 0) for e in archived_jobs().values()), default=0)
+
+
+def archived_count(filename):
+    column = 'applications' if filename == 'applications.csv' else 'candidates'
+    return sum(int(e.get(column) or 0) for e in archived_jobs().values())
+
+
+def _write_csv(path, headers, rows):
+    with atomic_write(path, newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=headers, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# --- ARCHIVE FILES ---
+def read_archive(job_id, filename, columns=None, where=None):
+    path = _archive_path(job_id, filename)
+    try:
+        f = gzip.open(path, 'rt', newline='', encoding='utf-8')
+    except FileNotFoundError:
+        return
+    with f:
+        yield from utils.decode_csv_rows(f, columns, where)
+
+
+def _write_archive(job_id, filename, rows):
+    with atomic_write(_archive_path(job_id, filename), 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) as gz:
+            text = io.TextIOWrapper(gz, encoding='utf-8', newline='')
+            writer = csv.DictWriter(text, fieldnames=utils.CSV_HEADERS[filename], extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+            text.flush()
+            text.detach()
+
+
+def iter_jobs_rows(filename, job_ids, columns=None, where=None):
+    """The jobs' rows of applications.csv or candidate_pool.csv, hot ones first, then archived ones."""
+    job_ids = {str(j) for j in job_ids}
+    yield from utils.iter_csv(filename, columns, dict(where or {}, job_id=job_ids))
+    jobs = archived_jobs()
+    for job_id in sorted(job_ids & set(jobs), key=int):
+        yield from read_archive(job_id, filename, columns, where)
+
+
+def iter_job_rows(filename, job_id, columns=None, where=None):
+    return iter_jobs_rows(filename, {job_id}, columns, where)
+
+
+def iter_user_applications(user_id, columns=None):
+    """A user's applications across hot and archived jobs."""
+    yield from utils.iter_csv('applications.csv', columns, where={'user_id': user_id})
+    jobs = archived_jobs()
+    if not jobs:
+        return
+    for job_id in sorted(_user_jobs(user_id) & set(jobs), key=int):
+        yield from read_archive(job_id, 'applications.csv', columns, {'user_id': user_id})
+
+
+# --- MOVING JOBS BETWEEN TIERS ---
+def archive_jobs(job_ids):
+    """Move the jobs' rows into their archives (merging with what is archived already)."""
+    job_ids = {str(j) for j in job_ids}
+    if not job_ids:
+        return 0
+    os.makedirs(_dir(), exist_ok=True)
+    with write_lock(*TABLES):
+        index = {r['job_id']: r for r in _read_index_file('index.csv')}
+        moved = {filename: list(utils.iter_csv(filename, where={'job_id': job_ids})) for filename in TABLES}
+
+        # Archives first, then the hot tables, then the index: a crash at any point
+        # leaves rows in both tiers at worst (merged again by id), never in neither
+        for job_id in job_ids:
+            entry = index.get(job_id)
+            archived = {}
+            for filename in TABLES:
+                new_rows = [r for r in moved[filename] if r['job_id'] == job_id]
+                new_ids = {r['id'] for r in new_rows}
+                old_rows = [r for r in read_archive(job_id, filename) if r['id'] not in new_ids] if entry else []
+                archived[filename] = old_rows + new_rows
+                if new_rows or not entry:
+                    _write_archive(job_id, filename, archived[filename])
+            index[job_id] = {
+                'job_id': job_id,
+                'archived_date': entry['archived_date'] if entry else datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'applications': len(archived['applications.csv']),
+                'candidates': len(archived['candidate_pool.csv']),
+                'max_application_id': max((int(r['id']) for r in archived['applications.csv']), default=0),
+                'max_candidate_id': max((int(r['id']) for r in archived['candidate_pool.csv']), default=0),
+            }
+
+        applied = {}
+        for app in moved['applications.csv']:
+            applied.setdefault(app.get('user_id') or '', set()).add(app['job_id'])
+        for user_id, user_job_ids in applied.items():
+            _set_user_jobs(user_id, _user_jobs(user_id) | user_job_ids)
+
+        for filename in TABLES:
+            for job_id in job_ids:
+                shards.drop(shards.shard_name(filename, job_id))
+        _write_csv(_path('index.csv'), INDEX_HEADERS, sorted(index.values(), key=lambda e: int(e['job_id'])))
+        for candidate in filter(termstats.in_corpus, moved['candidate_pool.csv']):
+            termstats.remove_document(candidate.get('content_text') or '')
+    return sum(len(rows) for rows in moved.values())
+
+
+def archive_job(job_id):
+    return archive_jobs([job_id])
+
+
+def restore_job(job_id):
+    """Move an archived job's rows back into the hot tables. Returns the number of rows restored."""
+    job_id = str(job_id)
+    if not is_archived(job_id):
+        return 0
+    restored = 0
+    with write_lock(*TABLES):
+        index = {r['job_id']: r for r in _read_index_file('index.csv')}
+        if job_id not in index:
+            return 0
+        for filename in TABLES:
+            # Rows already back in the hot table are left alone, should an earlier restore have been cut short
+            present = {r['id'] for r in utils.iter_csv(filename, ('id',), where={'job_id': job_id})}
+            rows = [r for r in read_archive(job_id, filename) if r['id'] not in present]
+            if rows:
+                utils.append_csv_rows(filename, utils.CSV_HEADERS[filename], rows)
+                restored += len(rows)
+            if filename == 'candidate_pool.csv':
+                for candidate in filter(termstats.in_corpus, rows):
+                    termstats.add_document(candidate.get('content_text') or '')
+        _drop_from_index(index, job_id)
+    return restored
+
+
+def restore_rows(filename, row_ids):
+    """Make sure the given rows are in the hot table before they are written to."""
+    jobs = archived_jobs()
+    if not jobs:
+        return
+    for job_id in shards.keys_for_ids(filename, row_ids) & set(jobs):
+        restore_job(job_id)
+
+
+def delete_job_archive(job_id):
+    """Drop a deleted job's archived rows."""
+    job_id = str(job_id)
+    if not is_archived(job_id):
+        return
+    with write_lock(*TABLES):
+        index = {r['job_id']: r for r in _read_index_file('index.csv')}
+        for candidate in filter(termstats.in_corpus, read_archive(job_id, 'candidate_pool.csv',
+                                                                  ('content_text', 'copy_of'))):
+            termstats.remove_document(candidate.get('content_text') or '')
+        _drop_from_index(index, job_id)
+
+
+def _drop_from_index(index, job_id):
+    """Forget an archived job, then delete its archives. The caller holds both tables' write locks."""
+    _write_csv(_path('index.csv'), INDEX_HEADERS,
+               sorted((e for j, e in index.items() if j != job_id), key=lambda e: int(e['job_id'])))
+    # Users still listing the job after a crash here are harmless: only archived jobs are read
+    for user_id in {app.get('user_id') or '' for app in read_archive(job_id, 'applications.csv', ('user_id',))}:
+        _set_user_jobs(user_id, _user_jobs(user_id) - {job_id})
+    for filename in TABLES:
+        _remove(_archive_path(job_id, filename))
+
+
+def _user_jobs(user_id):
+    """Ids of the archived jobs a user has applications in (and, after a crash, perhaps a few restored ones)."""
+    return {r['job_id'] for r in utils.decode_csv_rows(_open_text(_user_path(user_id)), ('job_id',), None)}
+
+
+def _set_user_jobs(user_id, job_ids):
+    path = _user_path(user_id)
+    if not job_ids:
+        _remove(path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_csv(path, ['job_id'], [{'job_id': j} for j in sorted(job_ids, key=int)])
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# --- READS AND WRITES ACROSS BOTH TIERS ---
+# What the app calls instead of the hot-table functions in utils: reads chain in the
+# archived rows, and writes restore an archived row's job before changing it.
+def get_candidate_pool(job_id, columns=None):
+    """Get all candidates from pool for a specific job (only ``columns``, if given), archived ones included."""
+    return list(iter_job_rows('candidate_pool.csv', job_id, columns))
+
+
+def get_user_applications(user_id):
+    jobs = {j['id']: j['title'] for j in utils.iter_csv('jobs.csv', columns=('id', 'title'))}
+    user_apps = []
+    for app in iter_user_applications(user_id):
+        app['job_title'] = jobs.get(app['job_id'], 'Unknown Job')
+        user_apps.append(app)
+    return user_apps
+
+
+def get_hr_jobs_with_applications(hr_id):
+    my_jobs = {j['id']: j for j in utils.load_jobs() if str(j['hr_id']) == str(hr_id)}
+    if not my_jobs:
+        return {}
+
+    users = {u['id']: u['username'] for u in utils.iter_csv('users.csv', columns=('id', 'username'))}
+    result = {}
+    for jid, job in my_jobs.items():
+        result[jid] = {
+            'title': job['title'],
+            'description': job['description'],
+            'skills_required': job['skills_required'],
+            'vacancies': job['vacancies'],
+            'status': job['status'],
+            'version': utils.job_version(job),
+            'apps': []
+        }
+    for app in iter_jobs_rows('applications.csv', my_jobs):
+        app['username'] = users.get(app['user_id'], 'Unknown')
+        result[app['job_id']]['apps'].append(app)
+
+    # Sort applications by score
+    for jid in result:
+        result[jid]['apps'].sort(key=lambda x: float(x.get('score', 0) or 0), reverse=True)
+    return result
+
+
+def get_system_stats():
+    users = utils.load_users()
+    return {
+        'users': len(users),
+        'jobs': len(utils.load_jobs()),
+        'apps': sum(1 for _ in utils.iter_csv('applications.csv', columns=())) + archived_count('applications.csv'),
+        'user_list': users
+    }
+
+
+def update_application_status(app_id, status, notes):
+    restore_rows('applications.csv', [app_id])
+    return utils.update_application_status(app_id, status, notes)
+
+
+def bulk_update_applications(app_ids, status, justification):
+    app_ids = {str(a) for a in app_ids}
+    restore_rows('applications.csv', app_ids)
+    return utils.bulk_update_applications(app_ids, status, justification)
+
+
+def update_candidate_decision(candidate_id, decision, notes=''):
+    restore_rows('candidate_pool.csv', [candidate_id])
+    return utils.update_candidate_decision(candidate_id, decision, notes)
+
+
+def apply_batch_decisions(hr_id, app_decisions, candidate_decisions, idempotency_key=None):
+    restore_rows('applications.csv', [str(item.get('id', '')) for item in app_decisions])
+    restore_rows('candidate_pool.csv', [str(item.get('id', '')) for item in candidate_decisions])
+    return utils.apply_batch_decisions(hr_id, app_decisions, candidate_decisions, idempotency_key)
+
+
+def update_job_status(job_id, new_status):
+    """Open or close a job; reopened jobs are active hiring again, closed ones go cold once the policy says so."""
+    updated = utils.update_job_status(job_id, new_status)
+    if updated:
+        if new_status == 'Open':
+            restore_job(job_id)
+        elif get_policy()['archive_after_days'] == 0:
+            archive_job(job_id)
+    return updated
+
+
+def delete_job(job_id):
+    delete_job_archive(job_id)
+    return utils.delete_job(job_id)
+
+
+# --- RETENTION ---
+def get_policy():
+    """Retention policy: days after closing before a job is archived, and before its archive is deleted."""
+    try:
+        with open(_path('retention.json'), encoding='utf-8') as f:
+            return dict(DEFAULT_POLICY, **json.load(f))
+    except (FileNotFoundError, ValueError):
+        return dict(DEFAULT_POLICY)
+
+
+def set_policy(archive_after_days, purge_after_days=None):
+    if archive_after_days < 0 or (purge_after_days is not None and purge_after_days < 0):
+        raise ValueError("Retention periods cannot be negative.")
+    os.makedirs(_dir(), exist_ok=True)
+    with atomic_write(_path('retention.json'), encoding='utf-8') as f:
+        json.dump({'archive_after_days': archive_after_days, 'purge_after_days': purge_after_days}, f)
+
+
+def _older_than(date_text, days):
+    if not date_text:
+        return True  # closed before closing dates were recorded
+    try:
+        return datetime.strptime(date_text, '%Y-%m-%d %H:%M:%S') <= datetime.now() - timedelta(days=days)
+    except ValueError:
+        return True
+
+
+def sweep():
+    """Apply the retention policy: archive closed jobs past the grace period, purge expired archives."""
+    policy = get_policy()
+    closed = {j['id'] for j in utils.iter_csv('jobs.csv', ('id', 'status', 'closed_date'), where={'status': 'Closed'})
+              if _older_than(j.get('closed_date'), policy['archive_after_days'])}
+    hot = set()
+    for filename in TABLES:
+        hot.update(r['job_id'] for r in utils.iter_csv(filename, ('job_id',), where={'job_id': closed}))
+    archived = archive_jobs(hot) if hot else 0
+
+    purged = 0
+    if policy['purge_after_days'] is not None:
+        for job_id, entry in list(archived_jobs().items()):
+            if _older_than(entry['archived_date'], policy['purge_after_days']):
+                delete_job_archive(job_id)
+                purged += 1
+    return {'jobs_archived': len(hot), 'rows_archived': archived, 'jobs_purged': purged}
+
+
+def maybe_sweep():
+    """Run a sweep in the background if this process has not run one in the last SWEEP_INTERVAL."""
+    now = time.monotonic()
+    with _sweep_lock:
+        last = _last_sweep.get(utils.DATA_DIR)
+        if last is not None and now - last < SWEEP_INTERVAL:
+            return
+        _last_sweep[utils.DATA_DIR] = now
+    threading.Thread(target=_sweep_quietly, name='archive-sweep', daemon=True).start()
+
+
+def _sweep_quietly():
+    try:
+        sweep()
+    except Exception as e:
+        print(f"Error in archive sweep: {e}")
@@ -0,0 +1,202 @@
+"""Score an archive of resumes against a set of jobs on all CPU cores.
+
+Usage: python batch_score.py RESUMES [--jobs data/jobs.csv] [--output scores.csv]
+                             [--workers N] [--format csv|parquet] [--restart]
+
+RESUMES is a directory (searched recursively) or a ZIP file of .pdf, .docx,
+.doc and .txt resumes. Every resume is scored against every job in the jobs
+CSV (id, title, description, skills_required; the app's own jobs.csv works
+as-is) and written as one output row per (resume, job).
+
+Runs are resumable: each finished resume is recorded in OUTPUT.checkpoint
+after its rows are flushed, so re-running the same command after an
+interruption skips the resumes already scored. Use --restart to start over.
+"""
+import argparse
+import csv
+import io
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+
+import utils
+from locking import atomic_write
+
+OUTPUT_COLUMNS = ['resume', 'job_id', 'job_title', 'score', 'eligibility', 'recommendation',
+                  'resume_quality', 'matched_count', 'total_keywords', 'missing_technical', 'error']
+# Resumes scored between checkpoint writes (each one costs an fsync)
+CHECKPOINT_EVERY = 500
+
+_jobs = None
+_zip = None
+
+
+def load_jobs_csv(path):
+    jobs = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for i, row in enumerate(csv.DictReader(f), 1):
+            fields = {k: row.get(k) or '' for k in ('title', 'description', 'skills_required')}
+            jobs.append({'id': row.get('id') or str(i), 'title': fields['title'],
+                         'text': utils.job_description_text(fields)})
+    return jobs
+
+
+def list_resumes(source):
+    """Resume keys: paths relative to a directory, or member names of a ZIP."""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zf:
+            names = [i.filename for i in zf.infolist() if not i.is_dir()]
+    else:
+        names = [os.path.relpath(os.path.join(root, name), source)
+                 for root, _, files in os.walk(source) for name in files]
+    return sorted(n for n in names
+                  if not os.path.basename(n).startswith('.')
+                  and utils.file_extension(n) in utils.RESUME_EXTENSIONS)
+
+
+def _init_worker(source, jobs):
+    global _jobs, _zip
+    _jobs = jobs
+    _zip = zipfile.ZipFile(source) if zipfile.is_zipfile(source) else source
+
+
+def _read_resume(key):
+    if isinstance(_zip, zipfile.ZipFile):
+        return io.BytesIO(_zip.read(key))
+    with open(os.path.join(_zip, key), 'rb') as f:
+        return io.BytesIO(f.read())
+
+
+def score_one(key):
+    """Parse one resume and score it against every job. Runs in a worker process."""
+    t0 = time.perf_counter()
+    try:
+        text = utils.extract_text(key, _read_resume(key))
+    except Exception as e:
+        text, error = '', f"parse failed: {e}"
+    else:
+        error = '' if text.strip() else 'no text extracted'
+    t1 = time.perf_counter()
+
+    # Tokenized once, scored against every job
+    doc = utils.ResumeDocument(text)
+    rows = []
+    for job in _jobs:
+        row = {'resume': key, 'job_id': job['id'], 'job_title': job['title'], 'error': error}
+        if not error:
+            result = utils.score_resume(doc, job['text'])
+            row.update({k: result[k] for k in ('score', 'eligibility', 'recommendation', 'resume_quality',
+                                               'matched_count', 'total_keywords')})
+            row['missing_technical'] = ';'.join(result['missing_technical'])
+        rows.append(row)
+    return key, rows, t1 - t0, time.perf_counter() - t1
+
+
+def _checkpoint_path(output):
+    return output + '.checkpoint'
+
+
+def load_checkpoint(output):
+    """Resumes finished by an earlier run; output rows of unfinished ones are dropped."""
+    checkpoint = _checkpoint_path(output)
+    if not os.path.exists(checkpoint) or not os.path.exists(output):
+        return set()
+    with open(checkpoint, encoding='utf-8') as f:
+        done = {line.rstrip('\n') for line in f if line.endswith('\n')}
+    with open(output, newline='', encoding='utf-8') as f:
+        rows = [r for r in csv.DictReader(f) if r.get('resume') in done]
+    with atomic_write(output, newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return done
+
+
+def write_parquet(csv_path, parquet_path):
+    try:
+        import pandas as pd
+        df = pd.read_csv(csv_path, dtype={'resume': str, 'job_id': str, 'missing_technical': str, 'error': str})
+        for col in ('eligibility', 'recommendation', 'job_id'):
+            df[col] = df[col].astype('category')
+        df.to_parquet(parquet_path, index=False)
+    except ImportError as e:
+        print(f"Parquet output needs pandas and pyarrow ({e}); CSV kept at {csv_path}")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('resumes', help='directory or ZIP of resumes')
+    parser.add_argument('--jobs', default=os.path.join(utils.DATA_DIR, 'jobs.csv'), help='jobs CSV')
+    parser.add_argument('--output', default='scores.csv')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and rescore everything')
+    args = parser.parse_args()
+
+    output = args.output if args.format == 'csv' else os.path.splitext(args.output)[0] + '.csv'
+    if args.restart:
+        for path in (output, _checkpoint_path(output)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    start = time.perf_counter()
+    jobs = load_jobs_csv(args.jobs)
+    if not jobs:
+        sys.exit(f"No jobs found in {args.jobs}")
+    keys = list_resumes(args.resumes)
+    done = load_checkpoint(output)
+    todo = [k for k in keys if k not in done]
+    setup_time = time.perf_counter() - start
+    print(f"{len(keys)} resumes x {len(jobs)} jobs; {len(done)} already scored, {len(todo)} to go "
+          f"on {args.workers} workers")
+
+    parse_time = score_time = write_time = 0.0
+    errors = 0
+    new_file = not os.path.exists(output)
+    with open(output, 'a', newline='', encoding='utf-8') as out, \
+            open(_checkpoint_path(output), 'a', encoding='utf-8') as checkpoint, \
+            multiprocessing.Pool(args.workers, _init_worker, (args.resumes, jobs)) as pool:
+        writer = csv.DictWriter(out, fieldnames=OUTPUT_COLUMNS)
+        if new_file:
+            writer.writeheader()
+        chunksize = max(1, min(64, len(todo) // (args.workers * 8)))
+        pending = []
+        for n, (key, rows, parse_s, score_s) in enumerate(pool.imap_unordered(score_one, todo, chunksize), 1):
+            t = time.perf_counter()
+            writer.writerows(rows)
+            pending.append(key + '\n')
+            errors += bool(rows and rows[0]['error'])
+            parse_time += parse_s
+            score_time += score_s
+            if len(pending) >= CHECKPOINT_EVERY or n == len(todo):
+                # Rows must be on disk before the checkpoint claims their resumes are done
+                out.flush()
+                os.fsync(out.fileno())
+                checkpoint.write(''.join(pending))
+                checkpoint.flush()
+                pending = []
+            write_time += time.perf_counter() - t
+            if n % 1000 == 0:
+                print(f"  {n}/{len(todo)} resumes ({n / (time.perf_counter() - start):.0f}/s)")
+
+    if args.format == 'parquet':
+        t = time.perf_counter()
+        parquet = os.path.splitext(args.output)[0] + '.parquet'
+        if write_parquet(output, parquet):
+            print(f"Wrote {parquet}")
+        write_time += time.perf_counter() - t
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {len(todo)} resumes ({len(todo) * len(jobs)} pairs, {errors} unreadable) in {elapsed:.1f}s: "
+          f"{len(todo) / elapsed if elapsed else 0:.0f} resumes/s")
+    print(f"  setup {setup_time:.2f}s | parse {parse_time:.1f} cpu-s | score {score_time:.1f} cpu-s | "
+          f"write {write_time:.2f}s")
+    print(f"Results: {output}")
+
+
+if __name__ == '__main__':
+    main()
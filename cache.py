@@ -0,0 +1,553 @@
+"""Caches shared by the web layer and utils.
+
+``LRUCache`` and ``FragmentCache`` live in one process. ``Cache`` stores
+JSON values in the backend ``RESUME_CACHE_BACKEND`` names, so entries can
+be shared by every worker on the host (``disk``) or by every app node
+(``memcache``), and survive restarts:
+
+``memory``    (default) an LRU in this process
+``disk``      one file per entry under ``RESUME_CACHE_DIR`` (default
+              ``data/cache``); a tmpfs such as /dev/shm keeps it in memory
+``memcache``  the memcached servers in ``RESUME_CACHE_SERVERS``
+              (``host:port,...``); ``kvserver.py`` is a local stand-in
+
+Entries expire after ``RESUME_CACHE_TTL`` seconds unless a cache sets its
+own TTL, and the memory and disk backends drop the least recently written
+entries beyond ``RESUME_CACHE_MAX_BYTES``. A backend that fails counts an
+error and behaves as a miss: the cache is never needed for correctness.
+"""
+import hashlib
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+CACHE_BACKEND = os.environ.get('RESUME_CACHE_BACKEND', 'memory')
+CACHE_SERVERS = os.environ.get('RESUME_CACHE_SERVERS', '127.0.0.1:11211')
+CACHE_DIR = os.environ.get('RESUME_CACHE_DIR')
+CACHE_MAX_BYTES = int(os.environ.get('RESUME_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+CACHE_TTL = int(os.environ.get('RESUME_CACHE_TTL', 7 * 24 * 3600))
+CACHE_TIMEOUT = float(os.environ.get('RESUME_CACHE_TIMEOUT', 0.5))
+KEY_PREFIX = 'ra:'
+# While one worker computes a missing entry, others wait up to LOCK_WAIT for it
+LOCK_TTL = 30
+LOCK_WAIT = 10
+
+
+class LRUCache:
+    """Thread-safe LRU bounded by entry count and, optionally, total size of the values."""
+
+    def __init__(self, maxsize=1024, max_bytes=None, sizeof=len):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self._discard(key)
+            self._data[key] = value
+            if self.max_bytes is not None:
+                self._bytes += self.sizeof(value)
+            while self._data and (len(self._data) > self.maxsize or
+                                  (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                self._discard(next(iter(self._data)))
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._data:
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def items(self):
+        """Snapshot of the entries, least recently used first."""
+        with self._lock:
+            return list(self._data.items())
+
+    def _discard(self, key):
+        value = self._data.pop(key)
+        if self.max_bytes is not None:
+            self._bytes -= self.sizeof(value)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+def row_version(row, exclude=('content_text',)):
+    """Checksum of a row's fields, so edits from any process produce a new cache key."""
+    payload = '\x1f'.join(f"{k}={v}" for k, v in sorted(row.items()) if k not in exclude)
+    return zlib.crc32(payload.encode('utf-8'))
+
+
+class FragmentCache:
+    """Rendered template fragments keyed by (template, table, row id, row version).
+
+    Keys embed the row version, so stale entries are never served; the
+    per-row index lets update functions drop superseded entries eagerly.
+    """
+
+    def __init__(self, maxsize=4096, max_bytes=32 * 1024 * 1024):
+        self._lru = LRUCache(maxsize=maxsize, max_bytes=max_bytes)
+        self._by_row = {}
+        self._lock = threading.Lock()
+
+    def get(self, template, table, row_id, version):
+        return self._lru.get((template, table, str(row_id), version))
+
+    def put(self, template, table, row_id, version, html):
+        key = (template, table, str(row_id), version)
+        self._lru.put(key, html)
+        with self._lock:
+            self._by_row.setdefault((table, str(row_id)), set()).add(key)
+            if len(self._by_row) > 2 * self._lru.maxsize:
+                # Forget index entries whose fragments the LRU already evicted
+                self._by_row = {row: {k for k in keys if k in self._lru}
+                                for row, keys in self._by_row.items()}
+                self._by_row = {row: keys for row, keys in self._by_row.items() if keys}
+
+    def invalidate(self, table, row_id):
+        with self._lock:
+            keys = self._by_row.pop((table, str(row_id)), ())
+        for key in keys:
+            self._lru.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._by_row.clear()
+        self._lru.clear()
+
+    @property
+    def stats(self):
+        return {'entries': len(self._lru), 'hits': self._lru.hits, 'misses': self._lru.misses}
+
+
+fragment_cache = FragmentCache()
+
+
+# --- SHARED CACHE ---
+def _expiry(ttl):
+    return time.time() + ttl if ttl else 0
+
+
+class MemoryBackend:
+    """Entries in this process only, least recently used dropped first."""
+    name = 'memory'
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self._lru = LRUCache(maxsize=1 << 20, max_bytes=max_bytes, sizeof=lambda entry: len(entry[1]))
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        if entry[0] and entry[0] < time.time():
+            self._lru.pop(key)
+            return None
+        return entry[1]
+
+    def set(self, key, value, ttl=None):
+        self._lru.put(key, (_expiry(ttl), value))
+
+    def add(self, key, value, ttl=None):
+        """Store only if the key is missing; True if stored."""
+        with self._lock:
+            if self.get(key) is not None:
+                return False
+            self.set(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        self._lru.pop(key)
+
+
+class DiskBackend:
+    """One file per entry, shared by every process on the host.
+
+    A file holds its expiry time, then the value. Files are written to a
+    temporary name and renamed into place, so readers never see half an
+    entry. Once this process has written an eighth of ``max_bytes`` it
+    deletes the oldest files beyond that size.
+    """
+    name = 'disk'
+    EXPIRY = struct.Struct('=d')
+
+    def __init__(self, directory, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._written = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest[2:])
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < self.EXPIRY.size:
+            return None
+        expires, = self.EXPIRY.unpack_from(data)
+        if expires and expires < time.time():
+            return None
+        return data[self.EXPIRY.size:]
+
+    def _write_temp(self, path, value, ttl):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self.EXPIRY.pack(_expiry(ttl)))
+            f.write(value)
+        return temp
+
+    def set(self, key, value, ttl=None):
+        path = self._path(key)
+        os.replace(self._write_temp(path, value, ttl), path)
+        self._account(len(value))
+
+    def add(self, key, value, ttl=None):
+        """Store only if the key is missing (or expired); True if stored."""
+        path = self._path(key)
+        temp = self._write_temp(path, value, ttl)
+        try:
+            for _ in range(2):
+                try:
+                    # link() fails if the name exists, and the entry appears complete
+                    os.link(temp, path)
+                    return True
+                except FileExistsError:
+                    if self.get(key) is not None:
+                        return False
+                    self._remove(path)
+            return False
+        finally:
+            self._remove(temp)
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _account(self, size):
+        with self._lock:
+            self._written += size
+            if self._written < self.max_bytes // 8:
+                return
+            self._written = 0
+        self.prune()
+
+    def prune(self):
+        """Delete the oldest entries until the directory is within ``max_bytes``."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            self._remove(path)
+            total -= size
+
+
+class MemcacheBackend:
+    """Client for servers speaking the memcached text protocol: memcached, or kvserver.py.
+
+    Keys are spread over the servers by hash. A server that fails is
+    skipped for ``RETRY`` seconds, so a dead cache costs one timeout, not
+    one per request.
+    """
+    name = 'memcache'
+    RETRY = 5
+    MAX_TTL = 30 * 24 * 3600   # longer exptimes read as absolute times
+
+    def __init__(self, servers, timeout=CACHE_TIMEOUT):
+        self.servers = []
+        for server in servers:
+            host, _, port = server.strip().rpartition(':')
+            self.servers.append((host or '127.0.0.1', int(port or 11211)))
+        self.timeout = timeout
+        self._local = threading.local()
+        self._down = {}
+
+    def _wire_key(self, key):
+        if len(key) <= 200 and key.isascii() and key.isprintable() and ' ' not in key:
+            return key.encode('ascii')
+        return KEY_PREFIX.encode('ascii') + hashlib.sha1(key.encode('utf-8')).hexdigest().encode('ascii')
+
+    def _connection(self, server):
+        connections = self._local.__dict__.setdefault('connections', {})
+        connection = connections.get(server)
+        if connection is None:
+            sock = socket.create_connection(server, timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = connections[server] = (sock, sock.makefile('rb'))
+        return connection
+
+    def _close(self, server):
+        connection = self._local.__dict__.get('connections', {}).pop(server, None)
+        if connection is not None:
+            connection[1].close()
+            connection[0].close()
+
+    def _request(self, server, payload, read):
+        if self._down.get(server, 0) > time.time():
+            raise ConnectionError(f"cache server {server[0]}:{server[1]} is marked down")
+        reused = server in self._local.__dict__.get('connections', {})
+        while True:
+            try:
+                sock, rfile = self._connection(server)
+                sock.sendall(payload)
+                return read(rfile)
+            except OSError as e:
+                self._close(server)
+                # The server may have closed an idle connection; try a fresh one before giving up
+                if reused:
+                    reused = False
+                    continue
+                self._down[server] = time.time() + self.RETRY
+                print(f"Cache server {server[0]}:{server[1]} unavailable, retrying in {self.RETRY}s: {e}")
+                raise ConnectionError(f"cache server {server[0]}:{server[1]}: {e}") from e
+
+    def _line(self, rfile):
+        line = rfile.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('connection closed by cache server')
+        return line[:-2]
+
+    def _status(self, rfile):
+        line = self._line(rfile)
+        if line.startswith((b'ERROR', b'CLIENT_ERROR', b'SERVER_ERROR')):
+            raise ValueError(line.decode('utf-8', 'replace'))
+        return line
+
+    def _server(self, wire_key):
+        return self.servers[zlib.crc32(wire_key) % len(self.servers)]
+
+    def get(self, key):
+        wire_key = self._wire_key(key)
+
+        def read(rfile):
+            value = None
+            while True:
+                line = self._status(rfile)
+                if line == b'END':
+                    return value
+                _, _, _, size = line.split()[:4]
+                data = rfile.read(int(size) + 2)
+                if len(data) != int(size) + 2:
+                    raise ConnectionError('connection closed by cache server')
+                value = data[:-2]
+        return self._request(self._server(wire_key), b'get ' + wire_key + b'\r\n', read)
+
+    def _store(self, command, key, value, ttl):
+        wire_key = self._wire_key(key)
+        exptime = int(ttl or 0)
+        if exptime > self.MAX_TTL:
+            exptime = int(time.time()) + exptime
+        header = b'%s %s 0 %d %d\r\n' % (command, wire_key, exptime, len(value))
+        return self._request(self._server(wire_key), header + value + b'\r\n', self._status) == b'STORED'
+
+    def set(self, key, value, ttl=None):
+        self._store(b'set', key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        """Store only if the key is missing; True if stored."""
+        return self._store(b'add', key, value, ttl)
+
+    def delete(self, key):
+        wire_key = self._wire_key(key)
+        self._request(self._server(wire_key), b'delete ' + wire_key + b'\r\n', self._status)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(kind=None):
+    """This process's backend of the given kind (default ``RESUME_CACHE_BACKEND``)."""
+    kind = kind or CACHE_BACKEND
+    if kind == 'disk':
+        import utils
+        key = (kind, CACHE_DIR or os.path.join(utils.DATA_DIR, 'cache'))
+    else:
+        key = (kind,)
+    backend = _backends.get(key)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(key)
+            if backend is None:
+                if kind == 'memory':
+                    backend = MemoryBackend()
+                elif kind == 'disk':
+                    backend = DiskBackend(key[1])
+                elif kind == 'memcache':
+                    backend = MemcacheBackend(CACHE_SERVERS.split(','))
+                else:
+                    raise ValueError("RESUME_CACHE_BACKEND must be one of memory, disk, memcache")
+                _backends[key] = backend
+    return backend
+
+
+class Cache:
+    """JSON-serializable values under one namespace of a backend.
+
+    ``get_or_compute`` lets one caller compute a missing entry while the
+    others wait for it: threads of a process queue on a lock of their own,
+    and processes (or nodes) on a lock entry added to the backend. A waiter
+    that gives up after ``LOCK_WAIT`` seconds computes the value itself.
+    Values must not be None, which reads as a miss.
+    """
+
+    def __init__(self, namespace, ttl=None, kind=None):
+        self.namespace = namespace
+        self.ttl = ttl or CACHE_TTL
+        self.kind = kind
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.waits = 0
+        self.computed = 0
+        self._lock = threading.Lock()
+        self._computing = {}
+
+    @property
+    def backend(self):
+        return get_backend(self.kind)
+
+    def _key(self, key):
+        return f"{KEY_PREFIX}{self.namespace}:{key}"
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _call(self, method, *args):
+        try:
+            return getattr(self.backend, method)(*args)
+        except (OSError, ValueError) as e:
+            self._count('errors')
+            # Unreachable servers are reported once, by the backend
+            if not isinstance(e, ConnectionError):
+                print(f"Cache {method} failed in {self.namespace}: {e}")
+            return None
+
+    def _read(self, key):
+        data = self._call('get', self._key(key))
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def get(self, key, default=None):
+        value = self._read(key)
+        self._count('misses' if value is None else 'hits')
+        return default if value is None else value
+
+    def set(self, key, value, ttl=None):
+        data = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        self._call('set', self._key(key), data, ttl or self.ttl)
+
+    def delete(self, key):
+        self._call('delete', self._key(key))
+
+    def get_or_compute(self, key, compute, ttl=None):
+        """The cached value of ``key``, or ``compute()``'s result, stored for the next caller."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            entry = self._computing.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                # Another thread of this process may have just stored it
+                value = self._read(key)
+                if value is not None:
+                    return value
+                lock_key = self._key(key) + ':lock'
+                locked = self._call('add', lock_key, b'1', LOCK_TTL)
+                # None: the backend failed, so nobody can be holding the lock either
+                if locked is False:
+                    value = self._wait(key, lock_key)
+                    if value is not None:
+                        return value
+                try:
+                    value = compute()
+                    self._count('computed')
+                    self.set(key, value, ttl)
+                finally:
+                    if locked:
+                        self._call('delete', lock_key)
+                return value
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._computing[key]
+
+    def _wait(self, key, lock_key):
+        """Wait for the holder of ``lock_key`` to store ``key``; None if it does not in time."""
+        self._count('waits')
+        deadline = time.time() + LOCK_WAIT
+        delay = 0.005
+        while time.time() < deadline:
+            time.sleep(delay)
+            delay = min(2 * delay, 0.2)
+            value = self._read(key)
+            if value is not None:
+                return value
+            if self._call('get', lock_key) is None:
+                # The holder failed or gave up
+                return self._read(key)
+        return None
+
+    def stats(self):
+        return {'namespace': self.namespace, 'backend': self.kind or CACHE_BACKEND, 'hits': self.hits,
+                'misses': self.misses, 'errors': self.errors, 'waits': self.waits, 'computed': self.computed}
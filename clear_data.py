@@ -1,18 +1,11 @@
 import os
 import shutil
 import csv
+from utils import CSV_HEADERS
 
 DATA_DIR = 'data'
 UPLOADS_DIR = os.path.join(DATA_DIR, 'uploads')
 
-CSV_HEADERS = {
-    'users.csv': ['id', 'username', 'email', 'password', 'role'],
-    'jobs.csv': ['id', 'hr_id', 'title', 'description', 'skills_required', 'vacancies', 'status'],
-    'resumes.csv': ['id', 'user_id', 'filename', 'content_text', 'upload_date', 'file_path'],
-    'applications.csv': ['id', 'job_id', 'user_id', 'resume_id', 'status', 'hr_notes', 'score', 'eligibility'],
-    'candidate_pool.csv': ['id', 'job_id', 'filename', 'content_text', 'score', 'recommendation', 'justification', 'hr_decision', 'upload_date', 'file_path']
-}
-
 def clear_data():
     print("🧹 Clearing all application data...")
     
@@ -25,6 +18,50 @@ def clear_data():
                 writer.writerow(headers)
             print(f"✅ Cleared {filename}")
 
+    # Applications, candidates and resumes split per job / per user
+    shards_dir = os.path.join(DATA_DIR, 'shards')
+    if os.path.exists(shards_dir):
+        shutil.rmtree(shards_dir)
+        print("✅ Cleared sharded tables")
+
+    # Closed jobs' applications and candidates
+    archive_dir = os.path.join(DATA_DIR, 'archive')
+    if os.path.exists(archive_dir):
+        shutil.rmtree(archive_dir)
+        print("✅ Cleared archived jobs")
+
+    # Derived from the tables, so stale once they are emptied
+    stats_dir = os.path.join(DATA_DIR, 'termstats')
+    if os.path.exists(stats_dir):
+        shutil.rmtree(stats_dir)
+        print("✅ Cleared term statistics")
+
+    cache_dir = os.path.join(DATA_DIR, 'cache')
+    if os.path.exists(cache_dir):
+        shutil.rmtree(cache_dir)
+        print("✅ Cleared cache")
+
+    # Signatures name pool ids, which restart from 1 once the tables are emptied
+    minhash_dir = os.path.join(DATA_DIR, 'minhash')
+    if os.path.exists(minhash_dir):
+        shutil.rmtree(minhash_dir)
+        print("✅ Cleared near-duplicate signatures")
+
+    snapshot_dir = os.path.join(DATA_DIR, 'snapshots')
+    if os.path.exists(snapshot_dir):
+        shutil.rmtree(snapshot_dir)
+        print("✅ Cleared table snapshots")
+
+    screening_dir = os.path.join(DATA_DIR, 'screening')
+    if os.path.exists(screening_dir):
+        shutil.rmtree(screening_dir)
+        print("✅ Cleared screening progress")
+
+    rescore_dir = os.path.join(DATA_DIR, 'rescore')
+    if os.path.exists(rescore_dir):
+        shutil.rmtree(rescore_dir)
+        print("✅ Cleared rescore status")
+
     # Clear uploads
     if os.path.exists(UPLOADS_DIR):
         for item in os.listdir(UPLOADS_DIR):
@@ -0,0 +1,188 @@
+"""Near-duplicate resume detection for bulk screening, using MinHash and LSH.
+
+Each resume gets a MinHash signature over its word 3-shingles; the share
+of equal signature slots estimates the Jaccard similarity of two resumes.
+Signatures are banded (LSH) so candidate duplicates are found by a few
+dict lookups instead of comparing against the whole pool, then confirmed
+on the estimated similarity.
+
+Signatures of a job's pool candidates (group representatives only, so a
+match always points at the root of its group) are appended to
+``data/minhash/<job_id>.bin`` when they are saved; each process keeps an
+index per job and only reads records appended since it last looked.
+"""
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+import utils
+import archive
+from locking import write_lock, atomic_write
+
+INDEX_DIR = 'minhash'
+NUM_PERM = 128
+# 32 bands of 4 rows: a pair at 0.7 similarity shares a band with >99.9% probability,
+# unrelated resumes (similarity near 0) practically never do
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+# Editing ~5% of a resume's words leaves it at about 0.75 similarity on word 3-shingles
+DUPLICATE_THRESHOLD = 0.7
+SHINGLE_SIZE = 3
+
+# One random seed per permutation; fixed so signatures stay comparable across processes and restarts
+_SEEDS = np.random.RandomState(20240601).randint(0, 1 << 63, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+RECORD = np.dtype([('id', '<i8'), ('sig', '<u4', NUM_PERM)])
+
+_TOKEN = re.compile(r'\w+')
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _mix(x):
+    """splitmix64 finalizer; uint64 arithmetic wraps, which is what we want."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xbf58476d1ce4e5b9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+def signature(text):
+    """MinHash signature (NUM_PERM uint32 values) of a document's word shingles."""
+    tokens = _TOKEN.findall(text.lower())
+    token_hashes = np.fromiter(map(zlib.crc32, map(str.encode, tokens)), dtype=np.uint64, count=len(tokens))
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = np.bitwise_xor.reduce(token_hashes, keepdims=True) if len(tokens) else np.zeros(1, np.uint64)
+    else:
+        # Hash each run of SHINGLE_SIZE words from its word hashes, order-sensitively
+        shingles = np.zeros(len(tokens) - SHINGLE_SIZE + 1, dtype=np.uint64)
+        for offset in range(SHINGLE_SIZE):
+            shingles = _mix(shingles ^ token_hashes[offset:len(shingles) + offset])
+    shingles = np.unique(shingles)
+    # One cheap permutation per seed: xor, then multiply by an odd constant to spread into the high bits
+    values = (shingles[None, :] ^ _SEEDS[:, None]) * np.uint64(0x9e3779b97f4a7c15)
+    return (values.min(axis=1) >> np.uint64(32)).astype(np.uint32)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two documents."""
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+def _band_keys(sig):
+    return [(band, sig[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+
+class LSHIndex:
+    def __init__(self):
+        self.signatures = {}
+        self.buckets = {}
+
+    def add(self, key, sig):
+        self.signatures[key] = sig
+        for band_key in _band_keys(sig):
+            self.buckets.setdefault(band_key, []).append(key)
+
+    def query(self, sig, threshold=DUPLICATE_THRESHOLD):
+        """Key of the most similar indexed document at or above ``threshold``, or None."""
+        seen = set()
+        best, best_score = None, threshold
+        for band_key in _band_keys(sig):
+            for key in self.buckets.get(band_key, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                score = similarity(sig, self.signatures[key])
+                if score >= best_score:
+                    best, best_score = key, score
+        return best
+
+
+def _index_path(job_id):
+    return os.path.join(utils.DATA_DIR, INDEX_DIR, f"{job_id}.bin")
+
+
+def _lock_name(job_id):
+    return f"minhash-{job_id}"
+
+
+def add_to_pool_index(job_id, entries):
+    """Record signatures of newly saved pool candidates: an iterable of (candidate_id, signature)."""
+    records = np.array([(int(cid), sig) for cid, sig in entries], dtype=RECORD)
+    if not len(records):
+        return
+    path = _index_path(job_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with write_lock(_lock_name(job_id)):
+        with open(path, 'ab') as f:
+            records.tofile(f)
+
+
+def _build_missing_index(job_id, path):
+    """Index a pool that predates signature files (one-off linear pass over its representatives)."""
+    with write_lock(_lock_name(job_id)):
+        if os.path.exists(path):
+            return
+        records = np.array([(int(c['id']), signature(c['content_text']))
+                            for c in archive.get_candidate_pool(job_id, ('id', 'content_text', 'duplicate_of'))
+                            if c.get('content_text') and not c.get('duplicate_of')], dtype=RECORD)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_write(path, 'wb') as f:
+            records.tofile(f)
+
+
+def pool_index(job_id):
+    """LSH index over a job's pool, caught up with records other processes appended."""
+    path = _index_path(job_id)
+    if not os.path.exists(path):
+        _build_missing_index(job_id, path)
+    key = (utils.DATA_DIR, str(job_id))
+    with _indexes_lock:
+        entry = _indexes.get(key)
+        size = os.path.getsize(path)
+        if entry is None or size < entry['offset']:
+            entry = _indexes[key] = {'offset': 0, 'index': LSHIndex()}
+        if size > entry['offset']:
+            complete = (size - entry['offset']) // RECORD.itemsize * RECORD.itemsize
+            with open(path, 'rb') as f:
+                f.seek(entry['offset'])
+                records = np.frombuffer(f.read(complete), dtype=RECORD)
+            for record in records:
+                entry['index'].add(str(record['id']), record['sig'].copy())
+            entry['offset'] += complete
+        return entry['index']
+
+
+class UploadGrouper:
+    """Clusters an upload into near-duplicate groups as its resumes arrive."""
+
+    def __init__(self, job_id):
+        self.pool = pool_index(job_id)
+        self.batch = LSHIndex()
+
+    def add(self, index, resume):
+        """Sign and classify the resume at position ``index`` of the upload.
+
+        Sets on the resume dict:
+          ``signature``     its MinHash signature (one already there is reused);
+          ``duplicate_of``  the pool candidate id it duplicates, or
+          ``duplicate_of_index``  the index of an earlier resume in this upload.
+        Resumes with neither are group representatives and need scoring.
+        """
+        sig = resume.get('signature')
+        if sig is None:
+            sig = resume['signature'] = signature(resume['content'])
+        existing = self.pool.query(sig)
+        if existing is not None:
+            resume['duplicate_of'] = existing
+            return resume
+        earlier = self.batch.query(sig)
+        if earlier is not None:
+            resume['duplicate_of_index'] = earlier
+            return resume
+        self.batch.add(index, sig)
+        return resume
@@ -0,0 +1,204 @@
+"""Streaming spreadsheet exports of a job's candidate pool and applications.
+
+Rows come from ``utils.snapshot_csv`` (then the job's archive, if it was
+closed and archived) and are encoded as they are read, so an export's
+memory use does not grow with the number of rows. XLSX files are
+written directly as a ZIP stream of SpreadsheetML parts (one sheet,
+inline strings), with no spreadsheet library and nothing held back for
+a shared-strings table.
+"""
+import csv
+import io
+import itertools
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import utils
+import archive
+
+FORMATS = ('csv', 'xlsx')
+TABLES = {'candidates': 'candidate_pool.csv', 'applications': 'applications.csv'}
+DEFAULT_COLUMNS = {
+    'candidates': ['id', 'filename', 'score', 'recommendation', 'justification', 'hr_decision',
+                   'upload_date', 'decision_date', 'duplicate_of'],
+    'applications': ['id', 'username', 'email', 'resume_id', 'status', 'score', 'eligibility',
+                     'applied_date', 'decision_date', 'hr_notes'],
+}
+# Looked up from users.csv rather than stored on the row
+USER_COLUMNS = ('username', 'email')
+NUMERIC_COLUMNS = {'id', 'job_id', 'user_id', 'resume_id', 'score', 'job_version', 'duplicate_of'}
+# Rows encoded per yielded chunk
+CHUNK_ROWS = 500
+# Excel refuses longer cells
+MAX_CELL_CHARS = 32767
+
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def available_columns(kind):
+    columns = list(utils.CSV_HEADERS[TABLES[kind]])
+    if kind == 'applications':
+        columns += USER_COLUMNS
+    return columns
+
+
+def export_rows(job_id, kind, columns, where=None, min_score=None):
+    """A job's rows of one table, holding only ``columns``, filtered by ``where`` and ``min_score``."""
+    where = dict(where or {}, job_id=job_id)
+    joined = [c for c in columns if c in USER_COLUMNS] if kind == 'applications' else []
+    read = [c for c in columns if c not in joined]
+    if joined and 'user_id' not in read:
+        read.append('user_id')
+    if min_score is not None and 'score' not in read:
+        read.append('score')
+    users = {}
+    if joined:
+        users = {u['id']: u for u in utils.iter_csv('users.csv', columns=['id'] + joined)}
+
+    rows = utils.snapshot_csv(TABLES[kind], read, where)
+    if archive.is_archived(job_id):
+        rows = itertools.chain(rows, archive.read_archive(job_id, TABLES[kind], read, where))
+    for row in rows:
+        if min_score is not None and _number(row.get('score')) < min_score:
+            continue
+        if joined:
+            user = users.get(row.get('user_id'), {})
+            for column in joined:
+                row[column] = user.get(column, '')
+        yield [row.get(c) for c in columns]
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('-inf')
+
+
+def _csv_safe(value):
+    # Spreadsheet apps run cells starting with these as formulas
+    if value and value[0] in '=+-@\t\r' and _number(value) == float('-inf'):
+        return "'" + value
+    return value
+
+
+def csv_chunks(columns, rows):
+    """Encode rows as CSV, yielding text about every CHUNK_ROWS rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for n, row in enumerate(rows, 1):
+        writer.writerow([_csv_safe(v or '') for v in row])
+        if n % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _Sink:
+    """Write-only file object that hands the ZIP writer's output back out in chunks."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _cell(ref, column, value):
+    if value is None or value == '':
+        return ''
+    if column in NUMERIC_COLUMNS and _number(value) != float('-inf'):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    text = escape(_XML_ILLEGAL.sub('', value[:MAX_CELL_CHARS]))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _sheet_row(number, columns, letters, values):
+    cells = ''.join(_cell(f"{letter}{number}", column, value)
+                    for letter, column, value in zip(letters, columns, values))
+    return f'<row r="{number}">{cells}</row>'
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>')
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>')
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>')
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>')
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>')
+_SHEET_END = '</sheetData></worksheet>'
+
+
+def xlsx_chunks(columns, rows, sheet_name='Sheet1'):
+    """Encode rows as a one-sheet XLSX workbook, yielding bytes as the ZIP stream is produced."""
+    sink = _Sink()
+    # Excel limits sheet names to 31 characters and a few forbidden symbols
+    name = escape(re.sub(r'[\[\]:*?/\\]', ' ', sheet_name)[:31] or 'Sheet1', {'"': '&quot;'})
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        zf.writestr('_rels/.rels', _ROOT_RELS)
+        zf.writestr('xl/workbook.xml', _WORKBOOK.format(name=name))
+        zf.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        yield sink.drain()
+
+        letters = [_column_letter(i) for i in range(len(columns))]
+        text_columns = [None] * len(columns)  # header cells are text even over numeric columns
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            parts = [_SHEET_START, _sheet_row(1, text_columns, letters, columns)]
+            for number, row in enumerate(rows, 2):
+                parts.append(_sheet_row(number, columns, letters, row))
+                if len(parts) >= CHUNK_ROWS:
+                    sheet.write(''.join(parts).encode('utf-8'))
+                    parts = []
+                    yield sink.drain()
+            parts.append(_SHEET_END)
+            sheet.write(''.join(parts).encode('utf-8'))
+    yield sink.drain()
@@ -0,0 +1,290 @@
+"""Appends to the CSV tables with group-committed durability.
+
+Rows are written straight to the table file with one ``os.write`` on a
+per-process ``O_APPEND`` descriptor. Rows cannot sit in a process-local
+buffer: other workers read the tables and allocate ids from them as soon
+as the table lock is released. What gets batched is making them durable,
+picked with ``RESUME_DURABILITY``:
+
+``none``      (default) the OS writes pages back when it likes, as before.
+``interval``  a background thread fsyncs written tables every
+              ``SYNC_INTERVAL`` seconds, or sooner once ``SYNC_BYTES``
+              are unsynced: a crash loses at most that window.
+``group``     a writer returns only once its rows are fsynced. The wait
+              happens when the thread releases its last table lock, so
+              concurrent writers share one fsync instead of queueing
+              for one each (group commit).
+``always``    fsync every append while still holding the table lock.
+
+At most ``MAX_OPEN_FILES`` descriptors are cached; past that the least
+recently appended-to files with nothing left to sync are closed, so a data
+directory with thousands of shards does not run out of descriptors.
+
+``flush()`` syncs everything written so far, whatever the mode.
+``recover()`` repairs the end of a table after a crash mid-append: a
+torn last row is cut off, unless it is provably whole and only lost its
+newline. Bootstrap runs it on every table.
+"""
+import atexit
+import csv
+import io
+import os
+import threading
+
+import locking
+
+DURABILITY_MODES = ('none', 'interval', 'group', 'always')
+DURABILITY = os.environ.get('RESUME_DURABILITY', 'none')
+SYNC_INTERVAL = float(os.environ.get('RESUME_SYNC_INTERVAL_MS', 50)) / 1000
+SYNC_BYTES = 1024 * 1024
+MAX_OPEN_FILES = int(os.environ.get('RESUME_MAX_OPEN_TABLES', 64))
+
+_local = threading.local()
+_files_lock = threading.Lock()
+_files = {}
+_flusher = None
+_wake = threading.Event()
+
+
+class _TableFile:
+    """Cached append descriptor of one table file and its write/sync counters."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self.ino = None
+        self.cond = threading.Condition()
+        self.written = 0     # appends made through this process
+        self.synced = 0      # appends known to be on disk
+        self.syncing = False
+        self.dirty_bytes = 0
+        self.retired = []
+        self.evicted = False
+
+    def descriptor(self):
+        """The descriptor for the file now at ``path``; tables are replaced by atomic rewrites."""
+        ino = os.stat(self.path).st_ino
+        if self.fd is None or ino != self.ino:
+            if self.fd is not None:
+                # A leader may be fsyncing the old descriptor right now; it closes it afterwards
+                self.retired.append(self.fd)
+                self._close_retired()
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            self.ino = os.fstat(self.fd).st_ino
+        return self.fd
+
+    def _close_retired(self):
+        if not self.syncing:
+            for fd in self.retired:
+                os.close(fd)
+            self.retired = []
+
+
+def _table_file(path):
+    with _files_lock:
+        table = _files.pop(path, None)
+        if table is None:
+            if len(_files) >= MAX_OPEN_FILES:
+                _evict()
+            table = _TableFile(path)
+        # Most recently used last
+        _files[path] = table
+        return table
+
+
+def _evict():
+    """Close the oldest idle descriptors, down to half the limit. Needs ``_files_lock``."""
+    for path, table in list(_files.items()):
+        if len(_files) < MAX_OPEN_FILES // 2:
+            break
+        # Never wait on a writer here: skip files in use
+        if not table.cond.acquire(blocking=False):
+            continue
+        try:
+            if table.syncing or table.retired or (DURABILITY != 'none' and table.synced < table.written):
+                continue
+            if table.fd is not None:
+                os.close(table.fd)
+                table.fd = None
+            table.evicted = True
+            del _files[path]
+        finally:
+            table.cond.release()
+
+
+def _pending():
+    if not hasattr(_local, 'pending'):
+        _local.pending = {}
+    return _local.pending
+
+
+def append(path, data):
+    """Append encoded rows to a table file. The caller holds the table's write lock."""
+    if DURABILITY not in DURABILITY_MODES:
+        raise ValueError(f"RESUME_DURABILITY must be one of {', '.join(DURABILITY_MODES)}")
+    while True:
+        table = _table_file(path)
+        with table.cond:
+            if table.evicted:
+                # Closed between the lookup and here; a fresh entry replaces it
+                continue
+            fd = table.descriptor()
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            table.written += 1
+            ticket = table.written
+            table.dirty_bytes += len(data)
+            dirty_bytes = table.dirty_bytes
+        break
+    if DURABILITY == 'always':
+        _sync(table, ticket)
+    elif DURABILITY == 'group':
+        _pending()[path] = (table, ticket)
+    elif DURABILITY == 'interval':
+        _start_flusher()
+        if dirty_bytes >= SYNC_BYTES:
+            _wake.set()
+
+
+def _sync(table, ticket):
+    """Return once append number ``ticket`` is on disk, fsyncing on behalf of everyone waiting."""
+    with table.cond:
+        while table.synced < ticket:
+            if table.syncing:
+                table.cond.wait()
+                continue
+            # Become the leader: one fsync covers every append made so far
+            table.syncing = True
+            target = table.written
+            fd = table.fd
+            table.dirty_bytes = 0
+            table.cond.release()
+            try:
+                os.fsync(fd)
+            finally:
+                table.cond.acquire()
+                table.syncing = False
+                table._close_retired()
+                table.cond.notify_all()
+            table.synced = max(table.synced, target)
+
+
+def sync():
+    """Wait until this thread's appends are durable (group mode); runs when it releases its last lock."""
+    pending = _pending()
+    while pending:
+        _, (table, ticket) = pending.popitem()
+        _sync(table, ticket)
+
+
+def flush():
+    """fsync every table this process has appended to."""
+    with _files_lock:
+        tables = list(_files.values())
+    for table in tables:
+        with table.cond:
+            ticket = table.written
+        if ticket:
+            _sync(table, ticket)
+
+
+def _start_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _files_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name='groupcommit-flusher', daemon=True)
+            _flusher.start()
+
+
+def _flush_loop():
+    while True:
+        _wake.wait(SYNC_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+        except OSError as e:
+            print(f"Error syncing tables: {e}")
+
+
+def recover(path):
+    """Repair the end of a table after a crash; returns the bytes cut off.
+
+    Rows end at a newline outside quotes (escaped quotes come in pairs).
+    Writers always end a row with CRLF, so bytes after the last one
+    are a torn row. It is kept, and its LF added, only if it is
+    provably whole: it has as many fields as the header and ends in the
+    CR of its line ending. Anywhere else the last field may have been
+    cut short, quoted or not (``"a "`` can be the start of ``"a ""b"``),
+    so the row is cut off, back to the last complete row. A header missing
+    its newline is kept. The caller holds the table's write lock.
+    """
+    if ends_cleanly(path):
+        return 0
+    size = os.path.getsize(path)
+    # Find the end of the last complete row
+    good = offset = parity = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            offset += len(line)
+            parity ^= line.count(b'"') & 1
+            if parity == 0 and line.endswith(b'\n'):
+                good = offset
+        f.seek(good)
+        tail = f.read()
+    if not good:
+        # Only the header, unfinished; there is nothing to cut back to
+        if parity == 0:
+            _end_row(path, tail)
+        return 0
+    if parity == 0 and _is_whole_row(path, tail):
+        _end_row(path, tail)
+        return 0
+    with open(path, 'r+b') as f:
+        f.truncate(good)
+        f.flush()
+        os.fsync(f.fileno())
+    return size - good
+
+
+def _is_whole_row(path, tail):
+    if not tail.endswith(b'\r'):
+        return False
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        width = len(next(csv.reader(f), []))
+    text = tail.rstrip(b'\r').decode('utf-8', errors='replace')
+    return len(next(csv.reader(io.StringIO(text, newline='')), [])) == width
+
+
+def _end_row(path, tail):
+    with open(path, 'r+b') as f:
+        # The crash may have come between a row's \r and its \n
+        f.seek(0, os.SEEK_END)
+        f.write(b'\n' if tail.endswith(b'\r') else b'\r\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def ends_cleanly(path):
+    """Whether a table file holds no torn row at its end (see recover)."""
+    quotes = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            quotes += chunk.count(b'"')
+            last = chunk[-1:]
+    return last == b'\n' and quotes % 2 == 0
+
+
+def _flush_at_exit():
+    if DURABILITY == 'interval':
+        flush()
+
+
+locking.on_release(sync)
+atexit.register(_flush_at_exit)
@@ -0,0 +1,161 @@
+"""A small memcached-protocol server, standing in for memcached where it is not installed.
+
+It speaks the subset of the text protocol the ``memcache`` cache backend
+uses (get, set, add, delete, flush_all, stats, version, quit), honours
+expiry times and drops the least recently used entries beyond
+``--max-bytes``. Point RESUME_CACHE_SERVERS at it to try a cache shared
+by several app nodes, or start one inside a test with ``serve()``.
+
+    python kvserver.py --port 11211 --max-bytes 67108864
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+from cache import LRUCache
+
+MAX_RELATIVE_EXPTIME = 30 * 24 * 3600
+MAX_KEY_LENGTH = 250
+
+
+class Store:
+    """Values with their flags and expiry, bounded by total value size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.lru = LRUCache(maxsize=1 << 30, max_bytes=max_bytes, sizeof=lambda entry: len(entry[2]))
+        # Re-entrant: add and delete look the key up while holding it
+        self.lock = threading.RLock()
+        self.counts = {'cmd_get': 0, 'get_hits': 0, 'get_misses': 0, 'cmd_set': 0}
+
+    def get(self, key):
+        entry = self.lru.get(key)
+        if entry is not None and entry[0] and entry[0] <= time.time():
+            self.lru.pop(key)
+            entry = None
+        with self.lock:
+            self.counts['cmd_get'] += 1
+            self.counts['get_hits' if entry else 'get_misses'] += 1
+        return entry
+
+    def store(self, command, key, flags, exptime, value):
+        if exptime < 0:
+            expires = -1
+        elif exptime == 0:
+            expires = 0
+        elif exptime <= MAX_RELATIVE_EXPTIME:
+            expires = time.time() + exptime
+        else:
+            expires = exptime
+        with self.lock:
+            self.counts['cmd_set'] += 1
+            if command == b'add' and self.get(key) is not None:
+                return False
+            if len(value) > self.max_bytes:
+                return False
+            if expires == -1:
+                self.lru.pop(key)
+            else:
+                self.lru.put(key, (expires, flags, value))
+            return True
+
+    def delete(self, key):
+        with self.lock:
+            found = self.get(key) is not None
+            self.lru.pop(key)
+            return found
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        store = self.server.store
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            parts = line.split()
+            if not parts:
+                continue
+            command = parts[0]
+            if command in (b'get', b'gets'):
+                out = []
+                for key in parts[1:]:
+                    entry = store.get(key)
+                    if entry is not None:
+                        out.append(b'VALUE %s %d %d\r\n%s\r\n' % (key, entry[1], len(entry[2]), entry[2]))
+                out.append(b'END\r\n')
+                self.wfile.write(b''.join(out))
+            elif command in (b'set', b'add'):
+                try:
+                    key, flags, exptime, size = parts[1], int(parts[2]), int(parts[3]), int(parts[4])
+                except (IndexError, ValueError):
+                    self.wfile.write(b'CLIENT_ERROR bad command line format\r\n')
+                    continue
+                data = self.rfile.read(size + 2)
+                if len(data) != size + 2 or not data.endswith(b'\r\n'):
+                    self.wfile.write(b'CLIENT_ERROR bad data chunk\r\n')
+                    return
+                if len(key) > MAX_KEY_LENGTH:
+                    self.wfile.write(b'CLIENT_ERROR key too long\r\n')
+                    continue
+                stored = store.store(command, key, flags, exptime, data[:-2])
+                if parts[-1] != b'noreply':
+                    self.wfile.write(b'STORED\r\n' if stored else b'NOT_STORED\r\n')
+            elif command == b'delete' and len(parts) > 1:
+                found = store.delete(parts[1])
+                if parts[-1] != b'noreply':
+                    self.wfile.write(b'DELETED\r\n' if found else b'NOT_FOUND\r\n')
+            elif command == b'flush_all':
+                store.lru.clear()
+                if parts[-1] != b'noreply':
+                    self.wfile.write(b'OK\r\n')
+            elif command == b'stats':
+                with store.lock:
+                    counts = dict(store.counts, curr_items=len(store.lru), bytes=store.lru._bytes)
+                self.wfile.write(b''.join(b'STAT %s %d\r\n' % (k.encode('ascii'), v) for k, v in counts.items())
+                                 + b'END\r\n')
+            elif command == b'version':
+                self.wfile.write(b'VERSION 1.6.0-kvserver\r\n')
+            elif command == b'quit':
+                return
+            else:
+                self.wfile.write(b'ERROR\r\n')
+
+
+class Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    # Every worker thread of every app node may connect at once
+    request_queue_size = 1024
+
+
+def make_server(host, port, max_bytes):
+    server = Server((host, port), Handler)
+    server.store = Store(max_bytes)
+    return server
+
+
+def serve(host='127.0.0.1', port=0, max_bytes=64 * 1024 * 1024):
+    """Start a server on a background thread and return it; ``server.server_address`` has the port."""
+    server = make_server(host, port, max_bytes)
+    threading.Thread(target=server.serve_forever, name='kvserver', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for a memcached server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11211)
+    parser.add_argument('--max-bytes', type=int, default=64 * 1024 * 1024)
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, args.max_bytes)
+    print(f"Serving the memcached protocol on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,373 @@
+"""Drive a mixed candidate/HR workload through the Flask routes and report per-route latency.
+
+Usage: python load_test.py [--candidates 40] [--hr 4] [--jobs 20] [--duration 60] [--warmup 5]
+                           [--client-processes 2] [--server-processes 1] [--think-ms 0]
+                           [--bulk-size 20] [--json results.json] [--url URL --data-dir DIR]
+
+Seeds a throwaway data directory with synthetic candidates, HR users and
+jobs, starts the app on a free local port (threaded, or forked into
+``--server-processes`` workers) and runs every virtual user as its own
+HTTP client with a cookie session. Candidates log in and upload a resume,
+then keep loading their dashboard, checking eligibility, applying and
+uploading new resumes; HR users load their dashboard and screening results
+and bulk-upload ZIPs of resumes. Requests finished during the warmup are
+not counted. Everything runs offline on one box.
+
+To measure another deployment (say gunicorn), start it on a data directory,
+pass its address with --url and the directory with --data-dir; the seed
+data is written there directly.
+"""
+import argparse
+import http.client
+import io
+import json
+import logging
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from urllib.parse import urlencode, urlsplit
+
+PASSWORD = 'loadtest'
+# (action, weight) per virtual user role
+CANDIDATE_MIX = [('user_dashboard', 30), ('check_eligibility', 35), ('apply_job', 20), ('upload_resume', 15)]
+HR_MIX = [('hr_dashboard', 50), ('screening_results', 35), ('bulk_upload', 15)]
+
+SKILLS = ['python', 'java', 'javascript', 'sql', 'react', 'flask', 'django', 'docker', 'kubernetes', 'aws',
+          'azure', 'machine', 'learning', 'tensorflow', 'data', 'analysis', 'cloud', 'devops', 'postgresql',
+          'mongodb', 'spark', 'kafka', 'terraform', 'linux', 'golang', 'rust', 'scala', 'graphql', 'redis']
+FILLER = ['team', 'project', 'delivered', 'customer', 'platform', 'service', 'improved', 'reduced', 'latency',
+          'built', 'designed', 'led', 'managed', 'developed', 'implemented', 'analyzed', 'achieved', 'weekly',
+          'release', 'pipeline', 'migration', 'stakeholders', 'roadmap', 'testing', 'monitoring', 'on-call']
+SECTIONS = ['Education: university degree in computer science.', 'Experience:', 'Skills:', 'Projects:',
+            'Contact: email phone address.']
+
+
+# --- SYNTHETIC DATA ---
+def resume_text(rng, words=400):
+    parts = [f"Candidate {rng.randrange(10 ** 6)} cand{rng.randrange(10 ** 6)}@example.com "
+             f"555-{rng.randrange(100, 999)}-{rng.randrange(1000, 9999)}"]
+    for section in SECTIONS:
+        parts.append(section)
+        parts.append(' '.join(rng.choice(SKILLS if rng.random() < 0.3 else FILLER)
+                              for _ in range(words // len(SECTIONS))))
+    return '\n'.join(parts)
+
+
+def job_row(rng, job_id, hr_id):
+    skills = rng.sample(SKILLS, 5)
+    description = ' '.join(rng.choice(SKILLS + FILLER) for _ in range(60))
+    return {'id': job_id, 'hr_id': hr_id, 'title': f"{skills[0].title()} Engineer {job_id}",
+            'description': description, 'skills_required': ', '.join(skills), 'vacancies': rng.randint(1, 5),
+            'status': 'Open', 'version': 1, 'closed_date': ''}
+
+
+def seed(data_dir, candidates, hr_users, jobs, rng):
+    """Write synthetic users and jobs straight into the tables; returns the accounts and job ids."""
+    import utils
+    from werkzeug.security import generate_password_hash
+
+    utils.DATA_DIR = data_dir
+    utils.bootstrap_data()
+    # One hash for every account: hashing is deliberately slow and not what is being measured
+    hashed = generate_password_hash(PASSWORD)
+    run = uuid.uuid4().hex[:6]
+    first_user = utils.get_next_id('users.csv')
+    users = []
+    for i in range(candidates + hr_users):
+        role = 'user' if i < candidates else 'hr'
+        users.append({'id': first_user + i, 'username': f"load-{role}-{i}", 'password': hashed, 'role': role,
+                      'email': f"{role}{i}-{run}@load.test"})
+    utils.append_csv_rows('users.csv', utils.CSV_HEADERS['users.csv'], users)
+
+    hr_ids = [u['id'] for u in users if u['role'] == 'hr']
+    first_job = utils.get_next_id('jobs.csv')
+    job_rows = [job_row(rng, first_job + i, hr_ids[i % len(hr_ids)]) for i in range(jobs)]
+    utils.append_csv_rows('jobs.csv', utils.CSV_HEADERS['jobs.csv'], job_rows)
+
+    accounts = [{'email': u['email'], 'role': u['role'], 'id': str(u['id']),
+                 'jobs': [str(j['id']) for j in job_rows if u['role'] == 'hr' and j['hr_id'] == u['id']]}
+                for u in users]
+    return accounts, [str(j['id']) for j in job_rows]
+
+
+# --- SERVER ---
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _serve(data_dir, port, processes):
+    from werkzeug.serving import run_simple
+    import app as appmod
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    application = appmod.create_app({'DATA_DIR': data_dir})
+    run_simple('127.0.0.1', port, application, threaded=processes == 1, processes=processes,
+               use_reloader=False, use_debugger=False)
+
+
+def _wait_for(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request('GET', '/login')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    sys.exit(f"Server on {host}:{port} did not come up within {timeout}s")
+
+
+# --- CLIENT ---
+class Session:
+    """One virtual user's HTTP connection and session cookie."""
+
+    def __init__(self, host, port):
+        self.conn = http.client.HTTPConnection(host, port, timeout=120)
+        self.cookies = {}
+
+    def request(self, method, path, body=None, content_type=None):
+        headers = {}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f"{k}={v}" for k, v in self.cookies.items())
+        if content_type:
+            headers['Content-Type'] = content_type
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            # The dev server closes connections after each response; retry once on a fresh one
+            self.conn.close()
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+        data = response.read()
+        for header, value in response.getheaders():
+            if header.lower() == 'set-cookie':
+                name, _, rest = value.partition('=')
+                self.cookies[name.strip()] = rest.split(';', 1)[0]
+        if response.getheader('Connection', '').lower() == 'close':
+            self.conn.close()
+        return response.status, response.getheader('Location', ''), data
+
+    def post_form(self, path, fields):
+        return self.request('POST', path, urlencode(fields), 'application/x-www-form-urlencoded')
+
+    def post_files(self, path, field, filename, payload):
+        boundary = uuid.uuid4().hex
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+                f"Content-Type: application/octet-stream\r\n\r\n").encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+        return self.request('POST', path, body, f"multipart/form-data; boundary={boundary}")
+
+
+def _ok(status, location):
+    # A redirect to the login page means the session was lost
+    return status < 400 and '/login' not in location
+
+
+class VirtualUser:
+    def __init__(self, account, job_ids, host, port, rng, bulk_size):
+        self.account = account
+        self.job_ids = job_ids
+        self.session = Session(host, port)
+        self.rng = rng
+        self.bulk_size = bulk_size
+        self.resume_id = None
+
+    def login(self):
+        return self.session.post_form('/login', {'email': self.account['email'], 'password': PASSWORD})
+
+    def user_dashboard(self):
+        status, location, body = self.session.request('GET', '/user/dashboard')
+        match = re.search(rb'const resumeId = "(\d+)"', body)
+        if match:
+            self.resume_id = match.group(1).decode()
+        return status, location, body
+
+    def upload_resume(self):
+        text = resume_text(self.rng).encode()
+        return self.session.post_files('/user/upload_resume', 'resume', f"cv-{self.rng.randrange(10 ** 6)}.txt", text)
+
+    def check_eligibility(self):
+        return self.session.post_form(f"/user/check_eligibility/{self.rng.choice(self.job_ids)}",
+                                      {'resume_id': self.resume_id})
+
+    def apply_job(self):
+        return self.session.post_form(f"/user/apply/{self.rng.choice(self.job_ids)}", {'resume_id': self.resume_id})
+
+    def hr_dashboard(self):
+        return self.session.request('GET', '/hr/dashboard')
+
+    def screening_results(self):
+        return self.session.request('GET', f"/hr/screening_results/{self.rng.choice(self.account['jobs'])}")
+
+    def bulk_upload(self):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for i in range(self.bulk_size):
+                zf.writestr(f"bulk-{i}.txt", resume_text(self.rng))
+        return self.session.post_files(f"/hr/bulk_upload/{self.rng.choice(self.account['jobs'])}",
+                                       'resume_zip', 'batch.zip', buf.getvalue())
+
+
+def _timed(records, route, action):
+    start = time.perf_counter()
+    try:
+        status, location, _ = action()
+        ok = _ok(status, location)
+    except Exception:
+        ok = False
+    end = time.perf_counter()
+    records.append((route, ok, end - start, end))
+    return ok
+
+
+def _run_user(user, deadline, think, records):
+    mix = CANDIDATE_MIX if user.account['role'] == 'user' else HR_MIX
+    if not _timed(records, 'login', user.login):
+        return
+    if user.account['role'] == 'user':
+        _timed(records, 'upload_resume', user.upload_resume)
+        _timed(records, 'user_dashboard', user.user_dashboard)
+    elif not user.account['jobs']:
+        mix = [('hr_dashboard', 1)]
+    actions, weights = zip(*mix)
+    while time.perf_counter() < deadline:
+        action = user.rng.choices(actions, weights)[0]
+        if action in ('check_eligibility', 'apply_job') and not user.resume_id:
+            action = 'user_dashboard'
+        _timed(records, action, getattr(user, action))
+        if think:
+            time.sleep(user.rng.expovariate(1 / think))
+
+
+def _client_process(spec):
+    """Run a share of the virtual users on threads; returns their request records."""
+    accounts, job_ids, host, port, deadline_in, think, bulk_size, seed_value = spec
+    deadline = time.perf_counter() + deadline_in
+    records = []
+    threads = []
+    for i, account in enumerate(accounts):
+        user = VirtualUser(account, job_ids, host, port, random.Random(seed_value * 100003 + i), bulk_size)
+        thread = threading.Thread(target=_run_user, args=(user, deadline, think, records), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    # perf_counter is per process: hand back times relative to this process's deadline
+    return [(route, ok, latency, end - deadline) for route, ok, latency, end in records]
+
+
+# --- REPORT ---
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(records, measured_seconds):
+    by_route = {}
+    for route, ok, latency, _ in records:
+        by_route.setdefault(route, []).append((ok, latency))
+    by_route['ALL'] = [(ok, latency) for _, ok, latency, _ in records]
+    summary = {}
+    for route, samples in by_route.items():
+        latencies = sorted(latency for _, latency in samples)
+        errors = sum(1 for ok, _ in samples if not ok)
+        summary[route] = {
+            'requests': len(samples),
+            'errors': errors,
+            'error_rate': errors / len(samples) if samples else 0.0,
+            'throughput_rps': len(samples) / measured_seconds if measured_seconds else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+        }
+    return summary
+
+
+def print_summary(summary):
+    print(f"{'route':<20}{'reqs':>8}{'err%':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for route in sorted(summary, key=lambda r: (r == 'ALL', r)):
+        s = summary[route]
+        print(f"{route:<20}{s['requests']:>8}{s['error_rate'] * 100:>7.1f}%{s['throughput_rps']:>9.1f}"
+              f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}{s['max_ms']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--candidates', type=int, default=40, help='concurrent candidate clients')
+    parser.add_argument('--hr', type=int, default=4, help='concurrent HR clients')
+    parser.add_argument('--jobs', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=60, help='seconds of measured load')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds of load before measuring')
+    parser.add_argument('--think-ms', type=float, default=0, help='mean pause between a client\'s requests')
+    parser.add_argument('--bulk-size', type=int, default=20, help='resumes per HR bulk upload')
+    parser.add_argument('--client-processes', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--server-processes', type=int, default=1, help='forked server workers (1 = threaded)')
+    parser.add_argument('--url', help='target an already running server instead of starting one')
+    parser.add_argument('--data-dir', help='data directory of the --url server (seed data is written there)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+    if args.url and not args.data_dir:
+        parser.error('--url needs --data-dir to seed users and jobs')
+    if args.hr < 1 or args.candidates < 0:
+        parser.error('need at least one HR client')
+
+    rng = random.Random(args.seed)
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='resume-load-')
+    server = None
+    try:
+        accounts, job_ids = seed(data_dir, args.candidates, args.hr, args.jobs, rng)
+        if args.url:
+            parts = urlsplit(args.url)
+            host, port = parts.hostname, parts.port or 80
+        else:
+            host, port = '127.0.0.1', _free_port()
+            server = multiprocessing.Process(target=_serve, args=(data_dir, port, args.server_processes))
+            server.start()
+        _wait_for(host, port)
+        print(f"{args.candidates} candidates + {args.hr} HR clients on {args.client_processes} processes "
+              f"against http://{host}:{port} for {args.warmup:g}s warmup + {args.duration:g}s")
+
+        rng.shuffle(accounts)
+        shares = [accounts[i::args.client_processes] for i in range(args.client_processes)]
+        total = args.warmup + args.duration
+        specs = [(share, job_ids, host, port, total, args.think_ms / 1000, args.bulk_size, args.seed + i)
+                 for i, share in enumerate(shares) if share]
+        with multiprocessing.Pool(len(specs)) as pool:
+            results = pool.map(_client_process, specs)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    # Keep requests that finished inside the measured window (times are relative to the deadline)
+    records = [r for share in results for r in share if -args.duration <= r[3] <= 0]
+    late = sum(1 for share in results for r in share if r[3] > 0)
+    summary = summarize(records, args.duration)
+    print_summary(summary)
+    if late:
+        print(f"({late} requests finished after the deadline and are not counted)")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'routes': summary}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Cross-process reader-writer locks for the CSV tables.
+
+Each table gets a lock file under ``data/locks``. Readers take a shared
+``flock`` and writers an exclusive one, so any number of worker processes
+can read concurrently while writes to a table are serialized. Locks are
+re-entrant per thread: a thread holding a table's write lock can call
+helpers such as ``load_csv`` that take the read lock.
+
+On platforms without ``fcntl`` (Windows) this falls back to a
+process-local lock, which only protects a single worker process.
+"""
+import os
+import tempfile
+import threading
+from contextlib import contextmanager, ExitStack
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_DIR = 'locks'
+
+_local = threading.local()
+_fallback_locks = {}
+_fallback_guard = threading.Lock()
+_release_hooks = []
+
+
+def _held():
+    if not hasattr(_local, 'held'):
+        _local.held = {}
+    return _local.held
+
+
+def on_release(hook):
+    """Call ``hook()`` whenever a thread releases the last table lock it holds."""
+    _release_hooks.append(hook)
+
+
+def _released():
+    if not _held():
+        for hook in _release_hooks:
+            hook()
+
+
+def _default_data_dir():
+    return 'data'
+
+
+_data_dir = _default_data_dir
+
+
+def set_data_dir(resolver):
+    """Keep lock files under ``resolver()``/locks; called at every lock, so the directory can change."""
+    global _data_dir
+    _data_dir = resolver
+
+
+def _lock_path(name):
+    # Shard names contain a directory ('shards/applications/12.csv'); mirror it under locks/
+    path = os.path.join(_data_dir(), LOCK_DIR, f"{name}.lock")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+@contextmanager
+def _table_lock(name, exclusive):
+    held = _held()
+    state = held.get(name)
+    if state is not None:
+        if exclusive and not state['exclusive']:
+            raise RuntimeError(f"Cannot upgrade read lock on {name} to a write lock")
+        state['depth'] += 1
+        try:
+            yield
+        finally:
+            state['depth'] -= 1
+        return
+
+    if fcntl is None:
+        with _fallback_guard:
+            lock = _fallback_locks.setdefault(name, threading.RLock())
+        with lock:
+            held[name] = {'exclusive': exclusive, 'depth': 1}
+            try:
+                yield
+            finally:
+                del held[name]
+        _released()
+        return
+
+    fd = os.open(_lock_path(name), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        held[name] = {'exclusive': exclusive, 'depth': 1}
+        try:
+            yield
+        finally:
+            del held[name]
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+    _released()
+
+
+def read_lock(name):
+    """Shared lock on a table; many readers may hold it at once."""
+    return _table_lock(name, exclusive=False)
+
+
+@contextmanager
+def write_lock(*names):
+    """Exclusive lock on one or more tables, acquired in a fixed order to avoid deadlocks."""
+    with ExitStack() as stack:
+        for name in sorted(set(names)):
+            stack.enter_context(_table_lock(name, exclusive=True))
+        yield
+
+
+def holds_write_lock(name):
+    state = _held().get(name)
+    return bool(state and state['exclusive'])
+
+
+def try_lock(name):
+    """Take an exclusive lock on ``name`` without waiting; returns a handle for ``unlock``, or None if it is held.
+
+    Unlike table locks these are not re-entrant: a second try_lock of the same
+    name fails even in the same thread, which makes them usable as counted slots.
+    """
+    if fcntl is None:
+        with _fallback_guard:
+            lock = _fallback_locks.setdefault(name, threading.Lock())
+        return lock if lock.acquire(blocking=False) else None
+    fd = os.open(_lock_path(name), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def unlock(handle):
+    if fcntl is None:
+        handle.release()
+    else:
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        os.close(handle)
+
+
+@contextmanager
+def atomic_write(path, mode='w', **open_kwargs):
+    """Write to a temp file next to ``path`` and rename it into place on success.
+
+    Readers either see the old file or the complete new one, never a torn write.
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, **open_kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,108 @@
+"""Rank every open job for one resume in a single pass.
+
+The open jobs' keyword sets are extracted once per version of jobs.csv,
+along with an inverted index from keyword to the jobs that ask for it. A
+resume is tokenized once (``utils.resume_document``). In keyword mode each
+job's match count then comes from walking the postings of the resume's
+words that any job wants, rather than from one eligibility check per job.
+Weighted modes score each job from the same token counts.
+
+Rankings are cached per resume and jobs.csv generation (and term-stats
+generation under a weighted mode). Only the top ``limit`` jobs get the
+detailed breakdown, from the same score cache check_eligibility uses.
+"""
+import threading
+from array import array
+
+import utils
+import termstats
+import scorecache
+from cache import LRUCache
+
+DEFAULT_LIMIT = 10
+
+_index_lock = threading.Lock()
+_index = {'key': None}
+_rankings = LRUCache(maxsize=2048)
+
+
+class JobIndex:
+    """Open jobs with their keyword sets, plus keyword -> positions of the jobs wanting it."""
+
+    def __init__(self, jobs):
+        self.jobs = [j for j in jobs if j.get('status', 'Open') == 'Open']
+        self.keywords = [utils.job_keywords(utils.job_description_text(j)) for j in self.jobs]
+        self.postings = {}
+        for position, keywords in enumerate(self.keywords):
+            for word in keywords:
+                self.postings.setdefault(word, []).append(position)
+
+
+def job_index():
+    """The JobIndex for the current jobs.csv (its ``key`` names that version), rebuilt when the table changes."""
+    key = (utils.DATA_DIR, utils.table_generation('jobs.csv'))
+    with _index_lock:
+        if _index['key'] != key:
+            index = JobIndex(utils.load_jobs())
+            index.key = key
+            _index.update(key=key, index=index)
+        return _index['index']
+
+
+def _match_counts(doc, index):
+    counts = [0] * len(index.jobs)
+    words = doc.token_set
+    # Walk whichever side is smaller: the resume's distinct words or the keywords jobs ask for
+    if len(words) < len(index.postings):
+        hits = (index.postings[w] for w in words if w in index.postings)
+    else:
+        hits = (positions for w, positions in index.postings.items() if w in words)
+    for positions in hits:
+        for position in positions:
+            counts[position] += 1
+    return counts
+
+
+def rank_jobs(doc, index, mode=None):
+    """Positions of the jobs in ``index``, best match first."""
+    mode = mode or utils.SCORING_MODE
+    if mode == 'keyword':
+        counts = _match_counts(doc, index)
+        scores = [counts[i] / len(kw) * 100 if kw else 0 for i, kw in enumerate(index.keywords)]
+    else:
+        scores = [termstats.weighted_match(doc.token_counts, doc.token_total, kw, mode)[0] if kw else 0
+                  for kw in index.keywords]
+    # Ties go to the newer posting
+    order = sorted(range(len(scores)), key=lambda i: (-scores[i], -int(index.jobs[i]['id'])))
+    # 4 bytes a job, so cached rankings stay small with many jobs
+    return array('i', order)
+
+
+def recommend_jobs(resume, limit=DEFAULT_LIMIT):
+    """Top ``limit`` open jobs (all if None) for a stored resume row, with check_eligibility's breakdown."""
+    mode = utils.SCORING_MODE
+    index = job_index()
+    doc = utils.resume_document(resume)
+    key = (index.key, str(resume['id']), mode, termstats.generation() if mode != 'keyword' else None)
+    cached = _rankings.get(key)
+    # Ids can be reused once a resume is deleted, so the text has to match too
+    if cached is None or cached[0] != doc.text:
+        cached = (doc.text, rank_jobs(doc, index, mode))
+        _rankings.put(key, cached)
+    ranking = cached[1]
+
+    results = []
+    for position in ranking[:limit]:
+        job = index.jobs[position]
+        score, details = scorecache.job_score(resume, job, mode)
+        results.append({
+            'job_id': job['id'],
+            'job_title': job['title'],
+            'score': score,
+            'eligibility_level': details.get('eligibility_level', 'Low'),
+            'recommendation': details.get('recommendation', details.get('message', '')),
+            'missing_technical': details.get('missing_technical', []),
+            'matched_count': details.get('matched_count', 0),
+            'total_keywords': details.get('total_keywords', 0),
+        })
+    return results
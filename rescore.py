@@ -0,0 +1,245 @@
+"""Background rescoring of a job's applications and pool candidates after the job is edited.
+
+Scores are frozen when a resume is applied or screened. ``update_job``
+bumps the job's version, and ``schedule(old_job)`` then brings every row
+of that job up to the new version in a daemon thread:
+
+* If the job's keyword set did not change (say only vacancies were
+  edited) rows just get the new ``job_version``.
+* Otherwise each resume is only searched for the added and removed
+  keywords (plus the technical keywords the justification mentions).
+  The stored score is round(100 * matched / keywords), so the previous
+  match count is recovered from it and adjusted by the diff instead of
+  re-tokenizing the whole resume. Rows scored against an older version,
+  in another scoring mode (rows record theirs in ``scoring_mode``), or
+  against a job with too many keywords to invert the score exactly, are
+  rescored in full, as is everything under a weighted scoring mode.
+
+Scores are computed without holding any lock; each table (or shard of
+one) is then rewritten once under its write lock, skipping rows whose version moved
+on in the meantime.
+
+Status goes to ``data/rescore/<job_id>.json``, so every worker can report
+it and it survives a restart. A run holds the job's ``rescore-<job_id>``
+slot lock, one worker at a time; a status still "running" once nobody
+holds the lock belongs to a worker that died, and reads as "interrupted".
+"""
+import json
+import os
+import re
+import threading
+import time
+
+import utils
+import archive
+import shards
+from cache import fragment_cache
+from locking import atomic_write, try_lock, unlock
+
+# round(100 * m / k) is one-to-one in m only while k <= 100
+MAX_INVERTIBLE_KEYWORDS = 100
+HR_NOTE_SEPARATOR = ' | HR: '
+STATUS_DIR = 'rescore'
+LOCK_POLL = 0.2
+
+_lock = threading.Lock()
+_queues = {}
+
+
+def _status_path(job_id):
+    return os.path.join(utils.DATA_DIR, STATUS_DIR, f"{job_id}.json")
+
+
+def _lock_name(job_id):
+    return f"rescore-{job_id}"
+
+
+def rescore_status(job_id):
+    """Progress of the latest rescore of a job: state, version, rows checked/rescored/changed."""
+    try:
+        with open(_status_path(job_id), encoding='utf-8') as f:
+            status = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {'state': 'idle'}
+    if status.get('state') == 'running':
+        handle = try_lock(_lock_name(job_id))
+        if handle is not None:
+            unlock(handle)
+            status['state'] = 'interrupted'
+    return status
+
+
+def _publish(job_id, status):
+    path = _status_path(job_id)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_write(path, encoding='utf-8') as f:
+            json.dump(status, f)
+    except OSError as e:
+        print(f"Error saving rescore status: {e}")
+
+
+def schedule(old_job):
+    """Rescore the job's rows in the background; edits made while a run is in progress are queued."""
+    job_id = str(old_job['id'])
+    with _lock:
+        if job_id in _queues:
+            _queues[job_id].append(old_job)
+            return
+        _queues[job_id] = [old_job]
+    threading.Thread(target=_run, args=(job_id,), name=f"rescore-job-{job_id}", daemon=True).start()
+
+
+def _run(job_id):
+    while True:
+        with _lock:
+            queue = _queues[job_id]
+            if not queue:
+                del _queues[job_id]
+                return
+            old_job = queue.pop(0)
+        # Another worker may be rescoring this job; it rewrites the same rows
+        handle = try_lock(_lock_name(job_id))
+        while handle is None:
+            time.sleep(LOCK_POLL)
+            handle = try_lock(_lock_name(job_id))
+        try:
+            _publish(job_id, {'state': 'running'})
+            try:
+                stats = rescore_job(job_id, old_job)
+                status = dict(stats, state='done') if stats else {'state': 'done'}
+            except Exception as e:
+                print(f"Error rescoring job {job_id}: {e}")
+                status = {'state': 'failed', 'error': str(e)}
+            _publish(job_id, status)
+        finally:
+            unlock(handle)
+
+
+class _JobScorer:
+    """Scores resumes against the current job, using the keyword diff from ``old_job`` where it can."""
+
+    def __init__(self, job, old_job=None):
+        self.description = utils.job_description_text(job)
+        self.keywords = utils.job_keywords(self.description)
+        self.tech = {w for w in self.keywords if utils.is_tech_keyword(w)}
+        self.old_version = utils.job_version(old_job) if old_job else None
+        self.old_keywords = utils.job_keywords(utils.job_description_text(old_job)) if old_job else None
+
+        if self.old_keywords is not None:
+            self.added = self.keywords - self.old_keywords
+            self.removed = self.old_keywords - self.keywords
+            wanted = self.added | self.removed | self.tech
+            self.pattern = re.compile(r'\b(?:%s)\b' % '|'.join(
+                re.escape(w) for w in sorted(wanted, key=len, reverse=True))) if wanted else None
+
+    def is_current(self, row):
+        """True when the row was scored against an identical keyword set."""
+        return self.old_keywords == self.keywords and _row_version(row) == self.old_version
+
+    def score(self, row, text):
+        """(score, exact percentage, missing technical keywords) for one row's resume text."""
+        if not self.keywords:
+            return 0, 0.0, []
+        if (utils.SCORING_MODE == 'keyword' and row.get('scoring_mode') == 'keyword' and self.old_keywords
+                and _row_version(row) == self.old_version and len(self.old_keywords) <= MAX_INVERTIBLE_KEYWORDS
+                and row['score'] != ''):
+            hits = set(self.pattern.findall(text.lower())) if self.pattern else set()
+            matched = (round(float(row['score']) * len(self.old_keywords) / 100)
+                       - len(self.removed & hits) + len(self.added & hits))
+            # Listed as check_job_satisfaction lists them in keyword mode
+            missing_tech = sorted(w for w in self.keywords if w in self.tech and w not in hits)[:5]
+        else:
+            _, details = utils.check_job_satisfaction(text, self.description, detailed=True)
+            matched = details['matched_count']
+            missing_tech = details['missing_technical']
+        exact = matched / len(self.keywords) * 100
+        return round(exact), exact, missing_tech
+
+
+def _row_version(row):
+    return int(row.get('job_version') or 1)
+
+
+def _pending_rows(filename, job_id, version):
+    return [r for r in utils.iter_csv(filename, where={'job_id': job_id}) if _row_version(r) != version]
+
+
+def _apply_updates(filename, updates):
+    """Write computed fields back in one rewrite, skipping rows changed by a newer rescore."""
+    if not updates:
+        return 0
+    written = []
+    names = shards.files_holding(filename, updates)
+    with shards.lock(*names):
+        for name in names:
+            rows = utils.load_csv(name)
+            changed = False
+            for row in rows:
+                update = updates.get(row['id'])
+                if update is None or _row_version(row) != update['_from_version']:
+                    continue
+                fields = {k: v for k, v in update.items() if not k.startswith('_')}
+                if '_justification' in update:
+                    # Keep notes HR appended to the justification, including ones added while we computed
+                    _, sep, notes = row.get('justification', '').partition(HR_NOTE_SEPARATOR)
+                    fields['justification'] = update['_justification'] + (sep + notes if sep else '')
+                row.update(fields)
+                written.append(row['id'])
+                changed = True
+            if changed:
+                utils.rewrite_csv(name, rows)
+    for row_id in written:
+        fragment_cache.invalidate(filename, row_id)
+    return len(written)
+
+
+def rescore_job(job_id, old_job=None):
+    """Bring all of a job's applications and pool candidates up to its current version."""
+    job = utils.get_job_by_id(job_id)
+    if not job:
+        return None
+    version = utils.job_version(job)
+    # Rows of an archived job are brought back to be rescored; the next sweep archives them again
+    archive.restore_job(job_id)
+    scorer = _JobScorer(job, old_job)
+    stats = {'version': version, 'checked': 0, 'rescored': 0, 'changed': 0}
+
+    apps = _pending_rows('applications.csv', job_id, version)
+    resume_ids = {a['resume_id'] for a in apps}
+    texts = {r['id']: r['content_text']
+             for r in utils.iter_csv('resumes.csv', ('id', 'content_text'), where={'id': resume_ids})}
+    app_updates = {}
+    for app in apps:
+        update = {'job_version': version, '_from_version': _row_version(app)}
+        if not scorer.is_current(app):
+            score, exact, _ = scorer.score(app, texts.get(app['resume_id'], ''))
+            update['scoring_mode'] = utils.SCORING_MODE
+            stats['rescored'] += 1
+            eligibility = utils.eligibility_level(exact)
+            if str(score) != app['score'] or eligibility != app['eligibility']:
+                update.update(score=score, eligibility=eligibility)
+                stats['changed'] += 1
+        app_updates[app['id']] = update
+    stats['checked'] += len(apps)
+
+    candidates = _pending_rows('candidate_pool.csv', job_id, version)
+    pool_updates = {}
+    for candidate in candidates:
+        update = {'job_version': version, '_from_version': _row_version(candidate)}
+        if not scorer.is_current(candidate):
+            score, _, missing_tech = scorer.score(candidate, candidate['content_text'])
+            update['scoring_mode'] = utils.SCORING_MODE
+            stats['rescored'] += 1
+            # Unchanged scores keep their recommendation, including "top N" picks made at screening time
+            if str(score) != candidate['score']:
+                recommendation, justification = utils.screening_recommendation(
+                    score, {'missing_technical': missing_tech})
+                update.update(score=score, recommendation=recommendation, _justification=justification)
+                stats['changed'] += 1
+        pool_updates[candidate['id']] = update
+    stats['checked'] += len(candidates)
+
+    _apply_updates('applications.csv', app_updates)
+    _apply_updates('candidate_pool.csv', pool_updates)
+    return stats
@@ -0,0 +1,149 @@
+"""Priority classes for CPU-heavy work, so bulk screening cannot starve interactive requests.
+
+Interactive requests (dashboards, eligibility checks, applying) run in the
+web worker as before. Bulk work, such as screening a ZIP of resumes, goes
+through ``run_bulk``: once admitted it runs in a separate process at a
+low CPU priority (``BULK_NICE``), so the kernel gives interactive requests
+most of a contended CPU. The web worker thread just waits for the result,
+without holding the GIL. Bulk functions should compute and return
+results, leaving table writes to the caller: a low-priority process
+holding a lock that interactive requests wait on would stall them. The
+exception is a single short append, as streaming screening makes for
+each batch of scored resumes; the lock is held for one write.
+
+Admission is box-wide. It uses flock'd slot files under ``data/locks``, so
+it holds across gunicorn workers, and a crashed worker frees its slots.
+* Each tenant (HR user) may have ``MAX_BULK_PER_TENANT`` bulk jobs
+  admitted at a time, so one user cannot take every slot.
+* At most ``MAX_BULK_JOBS`` bulk jobs run at once, and ``MAX_BULK_QUEUE``
+  more wait for a run slot.
+* A job beyond that, or one that waited ``BULK_QUEUE_TIMEOUT`` seconds,
+  is rejected with ``Busy``.
+"""
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager, ExitStack
+
+import utils
+from locking import try_lock, unlock
+
+MAX_BULK_JOBS = int(os.environ.get('RESUME_MAX_BULK_JOBS', max(1, (os.cpu_count() or 1) // 2)))
+MAX_BULK_PER_TENANT = int(os.environ.get('RESUME_MAX_BULK_PER_TENANT', 1))
+MAX_BULK_QUEUE = int(os.environ.get('RESUME_MAX_BULK_QUEUE', 4))
+BULK_QUEUE_TIMEOUT = float(os.environ.get('RESUME_BULK_QUEUE_TIMEOUT', 30))
+# Against one busy interactive worker, nice 10 gets bulk work ~10% of a contended core (19 would get
+# ~1.5%, which stalls a large upload for minutes under sustained load)
+BULK_NICE = int(os.environ.get('RESUME_BULK_NICE', 10))
+# Run bulk work in this process instead (tests, platforms without process pools)
+BULK_IN_PROCESS = os.environ.get('RESUME_BULK_IN_PROCESS') == '1'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class Busy(Exception):
+    """A bulk job was not admitted; the message can be shown to the user."""
+
+
+def _take_slot(prefix, count):
+    for i in random.sample(range(count), count):
+        handle = try_lock(f"{prefix}-{i}")
+        if handle is not None:
+            return handle
+    return None
+
+
+@contextmanager
+def bulk_slot(tenant):
+    """Admit one bulk job for ``tenant`` and wait for a run slot, or raise Busy."""
+    with ExitStack() as stack:
+        handle = _take_slot(f"bulk-tenant-{tenant}", MAX_BULK_PER_TENANT)
+        if handle is None:
+            raise Busy('You already have a bulk screening in progress. Try again when it has finished.')
+        stack.callback(unlock, handle)
+
+        handle = _take_slot('bulk-admit', MAX_BULK_JOBS + MAX_BULK_QUEUE)
+        if handle is None:
+            raise Busy('The server is busy screening other uploads. Please try again in a minute.')
+        stack.callback(unlock, handle)
+
+        deadline = time.monotonic() + BULK_QUEUE_TIMEOUT
+        while True:
+            handle = _take_slot('bulk-run', MAX_BULK_JOBS)
+            if handle is not None:
+                stack.callback(unlock, handle)
+                break
+            if time.monotonic() >= deadline:
+                raise Busy('The server is busy screening other uploads. Please try again in a minute.')
+            time.sleep(0.1 + random.random() * 0.2)
+        yield
+
+
+def _init_worker(parent_pid):
+    if hasattr(os, 'nice'):
+        os.nice(BULK_NICE)
+    threading.Thread(target=_exit_with_parent, args=(parent_pid,), daemon=True).start()
+
+
+def _exit_with_parent(parent_pid):
+    # A killed web worker never closes the pool's queues, which would leave this process waiting forever
+    while True:
+        time.sleep(1)
+        try:
+            os.kill(parent_pid, 0)
+        except ProcessLookupError:
+            os._exit(0)
+        except PermissionError:
+            pass
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Not fork: forking a threaded web worker can copy locks held by other threads. Like any
+            # multiprocessing code this needs the entry script behind `if __name__ == '__main__'`.
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context('spawn')
+            _executor = ProcessPoolExecutor(max_workers=MAX_BULK_JOBS, mp_context=context,
+                                            initializer=_init_worker, initargs=(os.getpid(),))
+        return _executor
+
+
+def _reset_executor(broken):
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False)
+
+
+def _call(data_dir, scoring_mode, fn, args):
+    utils.DATA_DIR = data_dir
+    utils.SCORING_MODE = scoring_mode
+    return fn(*args)
+
+
+def run_bulk(tenant, fn, *args):
+    """Run ``fn(*args)`` as bulk work for ``tenant`` and return its result; raises Busy if not admitted.
+
+    ``fn`` and its arguments must be picklable (a module-level function and plain data).
+    """
+    with bulk_slot(tenant):
+        if BULK_IN_PROCESS:
+            return fn(*args)
+        executor = _get_executor()
+        try:
+            return executor.submit(_call, utils.DATA_DIR, utils.SCORING_MODE, fn, args).result()
+        except BrokenProcessPool:
+            # The worker died (killed, out of memory); start a fresh pool for the next job
+            _reset_executor(executor)
+            raise
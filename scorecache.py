@@ -0,0 +1,67 @@
+"""Memoized resume-vs-job scores.
+
+A candidate checks eligibility for a job, applies moments later and often
+re-checks, and each of those scored the pair from scratch. ``job_score``
+remembers the detailed result of ``check_job_satisfaction`` in an LRU keyed
+by resume id, job id, checksums of the resume text and of the job text,
+and the scoring mode (plus the term-stats generation under a weighted
+mode). Editing a job changes its checksum, so stale scores are never
+served; they just age out. A hit costs two checksums and a dict lookup,
+without tokenizing the resume.
+
+When ``RESUME_CACHE_BACKEND`` is shared (``disk`` or ``memcache``), scores
+missing from the LRU are looked up there before being computed, so workers
+and app nodes reuse each other's scores and a restarted worker starts
+warm. ``RESUME_SCORE_CACHE_PERSIST=1`` shares them through the ``disk``
+backend even when the rest of the app caches in memory.
+"""
+import os
+import zlib
+
+import utils
+import termstats
+from cache import LRUCache, Cache, CACHE_BACKEND
+
+CACHE_SIZE = int(os.environ.get('RESUME_SCORE_CACHE_SIZE', 8192))
+PERSIST = os.environ.get('RESUME_SCORE_CACHE_PERSIST') == '1'
+SHARED_KIND = 'disk' if PERSIST and CACHE_BACKEND == 'memory' else None
+
+_scores = LRUCache(maxsize=CACHE_SIZE)
+_shared = Cache('scores', kind=SHARED_KIND)
+
+
+def _checksum(text):
+    return zlib.crc32(text.encode('utf-8'))
+
+
+def score_key(resume, job, mode):
+    """Cache key of one resume row against one job row; changes when either text does."""
+    text = resume.get('content_text') or ''
+    generation = termstats.generation() if mode != 'keyword' else None
+    return (f"{resume['id']}:{_checksum(text):x}:{job['id']}:{_checksum(utils.job_description_text(job)):x}:"
+            f"{mode}:{generation}")
+
+
+def _shared_enabled():
+    return (SHARED_KIND or CACHE_BACKEND) != 'memory'
+
+
+def job_score(resume, job, mode=None):
+    """check_job_satisfaction(resume, job, detailed=True) for stored rows, memoized."""
+    mode = mode or utils.SCORING_MODE
+    key = score_key(resume, job, mode)
+    cached = _scores.get((utils.DATA_DIR, key))
+    if cached is None:
+        def compute():
+            return utils.check_job_satisfaction(utils.resume_document(resume), utils.job_description_text(job),
+                                                detailed=True, mode=mode)
+        # The in-process LRU is the memory tier already; only a shared backend adds anything
+        cached = tuple(_shared.get_or_compute(key, compute)) if _shared_enabled() else compute()
+        _scores.put((utils.DATA_DIR, key), cached)
+    score, details = cached
+    # Callers get their own dict; the lists inside are shared and must not be modified
+    return score, dict(details)
+
+
+def stats():
+    return {'entries': len(_scores), 'hits': _scores.hits, 'misses': _scores.misses, 'shared': _shared.stats()}
@@ -0,0 +1,276 @@
+"""Streaming bulk screening, so HR sees the leading candidates while an upload is still being scored.
+
+``screen_stream`` takes parsed resumes from an iterator and scores each
+one as it arrives, rather than scoring and sorting a whole upload before
+saving any of it. The best ``vacancies + REVIEW_MARGIN``
+stay in a heap, text included, because auto-selecting the top
+``vacancies`` may still change their recommendation. Everything else is
+appended to the job's pool in small batches and its text released:
+resumes that cannot make that cut, ones pushed out of it, and
+near-duplicates. Memory grows with that K, not with the upload; per
+resume only a MinHash signature and a few fields are kept, to find
+near-duplicates.
+
+``screen_stream_jobs`` screens one upload against several jobs (all of an
+HR user's open jobs, say) in the same pass: parsing, tokenizing, MinHash
+signing and copying into uploads happen once per resume, and each job only
+matches the resume's tokens against keywords it extracted up front. The
+other jobs' rows get their own hard link to the stored file, so dropping
+one job's files leaves the rest, and are marked ``copy_of`` the first
+job's row, so term stats count the resume once.
+
+Every ``PUBLISH_INTERVAL`` seconds the provisional ranking is written to
+``data/screening/<job_id>.json``, which the upload page polls.
+
+Unlike most bulk work, this writes tables from the bulk process. Each
+write is one append to this job's pool shard, so only requests for the
+same job can wait on it, and only briefly.
+"""
+import heapq
+import json
+import os
+import time
+
+import utils
+import archive
+import termstats
+from locking import atomic_write
+
+PROGRESS_DIR = 'screening'
+REVIEW_MARGIN = int(os.environ.get('RESUME_SCREEN_REVIEW_MARGIN', 20))
+PUBLISH_INTERVAL = 1.0
+FLUSH_ROWS = 50
+ID_BLOCK = 16
+AUTO_SELECT_SCORE = 60
+
+
+def _progress_path(job_id):
+    return os.path.join(utils.DATA_DIR, PROGRESS_DIR, f"{job_id}.json")
+
+
+def progress(job_id):
+    """The latest provisional ranking published for a job's upload, or None."""
+    try:
+        with open(_progress_path(job_id), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class StreamScreener:
+    """One upload being screened for one job."""
+
+    def __init__(self, job):
+        self.job_id = str(job['id'])
+        self.keywords = utils.job_keywords(utils.job_description_text(job))
+        self.version = utils.job_version(job)
+        self.vacancies = int(job.get('vacancies', 1))
+        self.k = self.vacancies + REVIEW_MARGIN
+        # ((score, -batch index), candidate): the weakest leader on top, later uploads losing ties
+        self.heap = []
+        # numpy comes with dedupe; importing it up front would slow every app start by ~75ms
+        import dedupe
+        self.grouper = dedupe.UploadGrouper(self.job_id)
+        self.representatives = {}   # batch index -> (pool id, filename, score, recommendation)
+        self.pool = None
+        self.pending = []
+        self.ids = iter(())
+        self.processed = self.saved = self.duplicates = 0
+        self.started = self.published = time.time()
+
+    def _next_id(self):
+        # Ids are reserved on arrival: duplicates may point at a leader that is saved last
+        for new_id in self.ids:
+            return new_id
+        first = utils.get_next_id('candidate_pool.csv', self.job_id, ID_BLOCK)
+        self.ids = iter(range(first + 1, first + ID_BLOCK))
+        return first
+
+    def _pool_candidate(self, candidate_id):
+        if candidate_id is None:
+            return None
+        if self.pool is None:
+            self.pool = {c['id']: c for c in archive.get_candidate_pool(
+                self.job_id, columns=('id', 'filename', 'score', 'recommendation', 'job_version', 'scoring_mode'))}
+        return self.pool.get(candidate_id)
+
+    def add(self, index, resume):
+        """Score the resume at position ``index`` of the upload and rank or save it.
+
+        A ``document``, ``signature`` or stored ``file_path`` already on the
+        resume is reused rather than computed again; a ``copy_of`` is kept
+        on the row. Returns the row's pool id.
+        """
+        self.grouper.add(index, resume)
+        document = resume.get('document') or utils.ResumeDocument(resume['content'])
+        candidate = {
+            'id': self._next_id(),
+            'job_version': self.version,
+            'filename': resume['filename'],
+            'content': resume['content'],
+            'document': document,
+            # The parser deletes its copy once it moves on
+            'file_path': resume.get('file_path') or utils.store_upload(resume),
+            'signature': resume['signature'],
+            'batch_index': index,
+            'copy_of': resume.get('copy_of', ''),
+        }
+        original = self._pool_candidate(resume.get('duplicate_of'))
+        if original and str(original.get('job_version') or 1) == str(self.version):
+            candidate.update(duplicate_of=original['id'], score=int(float(original['score'] or 0)),
+                             scoring_mode=original.get('scoring_mode'), recommendation=original['recommendation'],
+                             justification=f"Near-duplicate of {original['filename']}; score carried over.")
+        elif 'duplicate_of_index' in resume:
+            pool_id, filename, score, recommendation = self.representatives[resume['duplicate_of_index']]
+            candidate.update(duplicate_of=pool_id, score=score, recommendation=recommendation,
+                             justification=f"Near-duplicate of {filename}; score carried over.")
+        else:
+            score, details = utils.match_keywords(document, self.keywords, detailed=True)
+            recommendation, justification = utils.screening_recommendation(score, details)
+            candidate.update(score=score, recommendation=recommendation, justification=justification)
+            self.representatives[index] = (candidate['id'], candidate['filename'], score, recommendation)
+
+        self.processed += 1
+        if 'duplicate_of' in candidate:
+            # Extra versions of one resume don't take a slot
+            self.duplicates += 1
+            self._save(candidate)
+        else:
+            self._rank(candidate)
+        if time.time() - self.published >= PUBLISH_INTERVAL:
+            self.flush()
+            self.publish('running')
+        return candidate['id']
+
+    def _rank(self, candidate):
+        entry = ((candidate['score'], -candidate['batch_index']), candidate)
+        if len(self.heap) < self.k:
+            candidate.pop('document')
+            heapq.heappush(self.heap, entry)
+        elif entry[0] > self.heap[0][0]:
+            # Leaders keep only their text; term stats tokenize it again once they are saved
+            candidate.pop('document')
+            self._save(heapq.heapreplace(self.heap, entry)[1])
+        else:
+            self._save(candidate)
+
+    def _save(self, candidate):
+        self.pending.append(candidate)
+        if len(self.pending) >= FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        """Append the candidates waiting to be saved to the pool."""
+        if not self.pending:
+            return
+        import dedupe
+        pending, self.pending = self.pending, []
+        rows = [utils._pool_row(self.job_id, c, c['id']) for c in pending]
+        utils.append_csv_rows('candidate_pool.csv', utils.CSV_HEADERS['candidate_pool.csv'], rows)
+        termstats.add_documents(c.get('document') or c['content'] for c in pending if termstats.in_corpus(c))
+        dedupe.add_to_pool_index(self.job_id, [(c['id'], c['signature']) for c in pending
+                                               if not c.get('duplicate_of') and c.get('signature') is not None])
+        self.saved += len(rows)
+
+    def leaders(self):
+        """Ranked candidates in the heap, with the auto-selection they would get if the upload ended now."""
+        ranked = [candidate for _, candidate in sorted(self.heap, reverse=True)]
+        selected = [c for c in ranked[:self.vacancies] if c['score'] >= AUTO_SELECT_SCORE]
+        return ranked, selected
+
+    def publish(self, state, error=None):
+        ranked, selected = self.leaders()
+        selected = {id(c) for c in selected}
+        report = {
+            'state': state,
+            'processed': self.processed,
+            'saved': self.saved,
+            'duplicates': self.duplicates,
+            'vacancies': self.vacancies,
+            'elapsed': round(time.time() - self.started, 1),
+            'leaders': [{'filename': c['filename'], 'score': c['score'],
+                         'recommendation': 'Select' if id(c) in selected else c['recommendation']}
+                        for c in ranked],
+        }
+        if error:
+            report['error'] = error
+        path = _progress_path(self.job_id)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomic_write(path, encoding='utf-8') as f:
+                json.dump(report, f)
+        except OSError as e:
+            print(f"Error publishing screening progress: {e}")
+        self.published = time.time()
+
+    def finish(self, state='done', error=None):
+        """Auto-select the top ``vacancies`` and save the leaders; the provisional ranking becomes final."""
+        ranked, selected = self.leaders()
+        for candidate in selected:
+            if candidate['recommendation'] != 'Select':
+                candidate['recommendation'] = 'Select'
+                candidate['justification'] = (f"Top {self.vacancies} candidate ({candidate['score']}%). "
+                                              "Meets requirements.")
+        self.publish(state, error)
+        self.heap = []
+        self.pending.extend(ranked)
+        self.flush()
+
+
+def screen_stream_jobs(job_ids, resumes):
+    """Screen parsed resumes against several jobs at once; returns {job_id: (saved, near-duplicates)}.
+
+    Each resume is tokenized, signed and copied into uploads once, then
+    scored against every job's keywords and saved to every job's pool, as
+    if the upload had been made to each job in turn, except that term stats
+    count it once (see the module docstring).
+    """
+    import dedupe
+    screeners = [StreamScreener(job) for job in filter(None, map(utils.get_job_by_id, job_ids))]
+    if not screeners:
+        return {}
+    for screener in screeners:
+        screener.publish('running')
+    try:
+        for index, resume in enumerate(resumes):
+            resume['document'] = utils.ResumeDocument(resume['content'])
+            resume['signature'] = dedupe.signature(resume['content'])
+            file_path = utils.store_upload(resume)
+            # Each job marks its own duplicates on its copy of the resume
+            first_id = screeners[0].add(index, dict(resume, file_path=file_path))
+            for screener in screeners[1:]:
+                screener.add(index, dict(resume, file_path=utils.link_upload(file_path, resume['filename']),
+                                         copy_of=first_id))
+    except Exception as e:
+        for screener in screeners:
+            screener.finish('failed', str(e))
+        raise
+    for screener in screeners:
+        screener.finish()
+    return {screener.job_id: (screener.saved, screener.duplicates) for screener in screeners}
+
+
+def screen_stream(job_id, resumes):
+    """Screen parsed resumes as they arrive, saving them to the job's pool; returns (saved, near-duplicates).
+
+    ``resumes`` is any iterable of dicts with ``filename``, ``content`` and
+    optionally ``original_path``, as utils.iter_parsed_resumes yields them.
+    If it raises, the resumes screened so far are still saved.
+    """
+    return screen_stream_jobs([job_id], resumes).get(str(job_id), (0, 0))
+
+
+def open_job_ids(hr_id):
+    """Ids of an HR user's open jobs."""
+    return [job['id'] for job in utils.load_jobs()
+            if str(job['hr_id']) == str(hr_id) and job.get('status', 'Open') == 'Open']
+
+
+def screen_zip(job_id, zip_file):
+    """Parse and screen a ZIP of resumes for a job, saving them as they are scored."""
+    return screen_stream(job_id, utils.iter_parsed_resumes(zip_file))
+
+
+def screen_zip_for_jobs(job_ids, zip_file):
+    """Parse a ZIP of resumes once and screen it against several jobs, saving to each job's pool."""
+    return screen_stream_jobs(job_ids, utils.iter_parsed_resumes(zip_file))
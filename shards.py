@@ -0,0 +1,374 @@
+"""Per-job and per-user shards of the large tables.
+
+``applications.csv`` and ``candidate_pool.csv`` are split by job_id, and
+``resumes.csv`` by user_id, into ``data/shards/<table>/<key>.csv``. Each
+shard is an ordinary table file with its own lock. A job's HR views and
+writes touch only that job's file, and writes to different jobs no longer
+queue on one lock. The table functions in utils route by the shard key
+(or, for row ids, through the id directory), so callers keep using the
+table name. Code that rewrites rows locks and rewrites just the shards
+holding them.
+
+Next to each table's shard directory:
+
+* ``<table>.ids`` is the id directory: one ``id,key`` line for every row
+  id ever issued, appended when the id is reserved. It names the shard a
+  row lives in, so a lookup by id opens one file, and its highest id is
+  where the next allocation starts.
+* ``<table>.gen`` grows by a byte on every write to any shard: a cheap
+  change token for the whole table.
+
+A shard writer holds the table's read lock and the shard's write lock
+(``lock``). Whole-table operations (resharding, archiving, rebuilding the
+term stats) take the table's write lock, which waits for all of them.
+
+``python shards.py`` moves flat tables into shards (bootstrap does this
+too) and rebuilds the id directories; ``--flatten`` goes back to single
+files.
+"""
+import argparse
+import csv
+import os
+import shutil
+import threading
+from array import array
+from contextlib import contextmanager, ExitStack
+
+import utils
+import groupcommit
+import archive
+from locking import read_lock, write_lock, atomic_write
+
+SHARD_DIR = 'shards'
+SHARD_KEYS = {'applications.csv': 'job_id', 'candidate_pool.csv': 'job_id', 'resumes.csv': 'user_id'}
+
+_directories = {}
+_directories_lock = threading.Lock()
+
+
+def is_sharded(filename):
+    return filename in SHARD_KEYS
+
+
+def table_of(name):
+    """The table a shard name belongs to; other names are returned unchanged."""
+    if name.startswith(SHARD_DIR + '/'):
+        return name.split('/')[1] + '.csv'
+    return name
+
+
+def _stem(table):
+    return table[:-len('.csv')]
+
+
+def _file_key(key):
+    key = str(key)
+    # Keys are numeric ids; anything else is hex-encoded to stay a safe file name
+    return key if key.isdigit() else '_' + key.encode('utf-8').hex()
+
+
+def _key_order(file_key):
+    return (0, int(file_key), '') if file_key.isdigit() else (1, 0, file_key)
+
+
+def shard_name(table, key):
+    return f"{SHARD_DIR}/{_stem(table)}/{_file_key(key)}.csv"
+
+
+def _shard_dir(table):
+    return os.path.join(utils.DATA_DIR, SHARD_DIR, _stem(table))
+
+
+def _meta_path(table, suffix):
+    return os.path.join(utils.DATA_DIR, SHARD_DIR, _stem(table) + suffix)
+
+
+def list_shards(table):
+    """Names of a table's shards, in key order."""
+    try:
+        names = os.listdir(_shard_dir(table))
+    except FileNotFoundError:
+        return []
+    # atomic_write's temp files start with a dot
+    keys = [n[:-len('.csv')] for n in names if n.endswith('.csv') and not n.startswith('.')]
+    return [f"{SHARD_DIR}/{_stem(table)}/{k}.csv" for k in sorted(keys, key=_key_order)]
+
+
+def _values(wanted):
+    return {str(v) for v in wanted} if isinstance(wanted, (set, frozenset, list, tuple)) else {str(wanted)}
+
+
+def files_for(table, where=None):
+    """The shards a query on ``table`` has to read: one per shard key or row id it names, else all."""
+    where = where or {}
+    key = SHARD_KEYS[table]
+    if where.get(key) is not None:
+        keys = {_file_key(v) for v in _values(where[key])}
+    elif where.get('id') is not None:
+        keys = {_file_key(k) for k in keys_for_ids(table, _values(where['id']))}
+    else:
+        return list_shards(table)
+    return [f"{SHARD_DIR}/{_stem(table)}/{k}.csv" for k in sorted(keys, key=_key_order)]
+
+
+def files_holding(table, row_ids):
+    """The files to rewrite to change these rows: their shards, or an unsharded table itself."""
+    if not is_sharded(table):
+        return [table]
+    return files_for(table, {'id': set(row_ids)})
+
+
+@contextmanager
+def lock(*names):
+    """Write locks on tables and shards; a shard's table is read-locked, so whole-table writers wait.
+
+    Everything is acquired in name order (tables sort before shards), so
+    callers may mix tables and shards of several tables in one call.
+    """
+    writes = set(names)
+    reads = {table_of(n) for n in names} - writes
+    with ExitStack() as stack:
+        for name in sorted(writes | reads):
+            stack.enter_context(write_lock(name) if name in writes else read_lock(name))
+        yield
+
+
+def touch(table):
+    """Record a write to one of the table's shards in its change token."""
+    fd = os.open(_meta_path(table, '.gen'), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, b'.')
+    finally:
+        os.close(fd)
+
+
+def generation(table):
+    try:
+        st = os.stat(_meta_path(table, '.gen'))
+    except FileNotFoundError:
+        return '0'
+    return f"s{st.st_ino:x}-{st.st_size:x}"
+
+
+def drop(name):
+    """Delete a shard. The caller holds its lock."""
+    try:
+        os.remove(os.path.join(utils.DATA_DIR, name))
+    except FileNotFoundError:
+        return
+    touch(table_of(name))
+
+
+# --- ID DIRECTORY ---
+class _Directory:
+    """A process's copy of one table's id directory, caught up from the file as it grows."""
+
+    def __init__(self, ino):
+        self.ino = ino
+        self.offset = 0
+        self.keys = array('q')   # by id: numeric shard key, or -1
+        self.other = {}          # ids with a non-numeric key, or beyond the array
+        self.highest = 0
+
+    def add(self, row_id, key):
+        self.highest = max(self.highest, row_id)
+        if key.isdigit() and 0 <= row_id < len(self.keys) + 1000000:
+            if row_id >= len(self.keys):
+                self.keys.extend([-1] * (row_id + 1 - len(self.keys)))
+            self.keys[row_id] = int(key)
+        else:
+            self.other[row_id] = key
+
+    def get(self, row_id):
+        if 0 <= row_id < len(self.keys) and self.keys[row_id] >= 0:
+            return str(self.keys[row_id])
+        return self.other.get(row_id)
+
+
+def _directory(table):
+    """The table's id directory with every complete line read."""
+    path = _meta_path(table, '.ids')
+    key = (utils.DATA_DIR, table)
+    with _directories_lock:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            _directories.pop(key, None)
+            return _Directory(None)
+        directory = _directories.get(key)
+        if directory is None or directory.ino != st.st_ino or directory.offset > st.st_size:
+            directory = _directories[key] = _Directory(st.st_ino)
+        if directory.offset < st.st_size:
+            with open(path, 'rb') as f:
+                f.seek(directory.offset)
+                data = f.read(st.st_size - directory.offset)
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].decode('utf-8').splitlines():
+                row_id, _, shard_key = line.partition(',')
+                try:
+                    directory.add(int(row_id), shard_key)
+                except ValueError:
+                    continue
+            directory.offset += end
+        return directory
+
+
+def keys_for_ids(table, row_ids):
+    """Shard keys of the rows with these ids; ids never issued have no row and no key."""
+    directory = _directory(table)
+    keys = set()
+    for row_id in row_ids:
+        try:
+            shard_key = directory.get(int(row_id))
+        except ValueError:
+            continue
+        if shard_key is not None:
+            keys.add(shard_key)
+    return keys
+
+
+def reserve_ids(table, key, count=1):
+    """Issue ``count`` consecutive new ids for rows going into ``key``'s shard; returns the first."""
+    with write_lock(_stem(table) + '.ids'):
+        directory = _directory(table)
+        first = max(directory.highest, archive.max_archived_id(table) if table in archive.TABLES else 0) + 1
+        lines = ''.join(f"{row_id},{key}\n" for row_id in range(first, first + count))
+        # Same durability as the rows: an id that reached disk without its entry could be issued twice
+        groupcommit.append(_meta_path(table, '.ids'), lines.encode('utf-8'))
+        for row_id in range(first, first + count):
+            directory.add(row_id, str(key))
+        directory.offset += len(lines.encode('utf-8'))
+    return first
+
+
+# --- LAYOUT ---
+def ensure(table):
+    """Create a table's shard layout, moving a flat table into shards first if one is there."""
+    os.makedirs(_shard_dir(table), exist_ok=True)
+    if os.path.exists(os.path.join(utils.DATA_DIR, table)):
+        moved = reshard(table)
+        print(f"Moved {moved} rows of {table} into {len(list_shards(table))} shards")
+    for suffix in ('.ids', '.gen'):
+        if not os.path.exists(_meta_path(table, suffix)):
+            with write_lock(table):
+                if not os.path.exists(_meta_path(table, suffix)):
+                    # A lost id directory is rebuilt from the shards
+                    rebuild_directory(table) if suffix == '.ids' else touch(table)
+    for name in list_shards(table):
+        # Most shards need nothing; only lock the ones that do
+        if not _schema_current(name):
+            with lock(name):
+                utils._ensure_csv_schema(name)
+
+
+def _schema_current(name):
+    path = os.path.join(utils.DATA_DIR, name)
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            header = next(csv.reader(f), [])
+        return all(h in header for h in utils.CSV_HEADERS[table_of(name)]) and groupcommit.ends_cleanly(path)
+    except FileNotFoundError:
+        return True
+
+
+def _write_shard(name, rows):
+    path = os.path.join(utils.DATA_DIR, name)
+    with atomic_write(path, newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=utils.CSV_HEADERS[table_of(name)], extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def reshard(table):
+    """Split the flat table file into shards, replacing any existing shards; returns the rows moved.
+
+    The flat file is removed last, so an interrupted run is simply run again.
+    """
+    path = os.path.join(utils.DATA_DIR, table)
+    key = SHARD_KEYS[table]
+    with write_lock(table):
+        if not os.path.exists(path):
+            # Another process migrated it while we waited for the lock
+            return 0
+        groups = {}
+        rows = 0
+        for row in utils.decode_csv_rows(_read_text(path), None, None):
+            groups.setdefault(_file_key(row.get(key) or ''), []).append(row)
+            rows += 1
+        os.makedirs(_shard_dir(table), exist_ok=True)
+        for name in list_shards(table):
+            if name.split('/')[-1][:-len('.csv')] not in groups:
+                os.remove(os.path.join(utils.DATA_DIR, name))
+        for file_key, shard_rows in groups.items():
+            _write_shard(f"{SHARD_DIR}/{_stem(table)}/{file_key}.csv", shard_rows)
+        rebuild_directory(table)
+        touch(table)
+        os.remove(path)
+    return rows
+
+
+def flatten(table):
+    """Merge a table's shards back into one flat file, ordered by id; returns the rows written."""
+    path = os.path.join(utils.DATA_DIR, table)
+    with write_lock(table):
+        rows = list(utils.iter_csv(table))
+        rows.sort(key=lambda r: int(r['id']) if str(r.get('id') or '').isdigit() else 0)
+        with atomic_write(path, newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=utils.CSV_HEADERS[table], extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+        shutil.rmtree(_shard_dir(table))
+        for suffix in ('.ids', '.gen'):
+            if os.path.exists(_meta_path(table, suffix)):
+                os.remove(_meta_path(table, suffix))
+    return len(rows)
+
+
+def rebuild_directory(table):
+    """Rewrite the id directory from the shards. The caller holds the table's write lock."""
+    key = SHARD_KEYS[table]
+    entries = []
+    for name in list_shards(table):
+        for row in utils.iter_csv(name, ('id', key)):
+            if str(row['id'] or '').isdigit():
+                entries.append((int(row['id']), row[key] or ''))
+    if table in archive.TABLES:
+        # Archived rows keep their ids; a write to one looks its job up here to restore it
+        for job_id in archive.archived_jobs():
+            for row in archive.read_archive(job_id, table, ('id',)):
+                if str(row['id'] or '').isdigit():
+                    entries.append((int(row['id']), job_id))
+    entries.sort()
+    with atomic_write(_meta_path(table, '.ids'), encoding='utf-8') as f:
+        f.writelines(f"{row_id},{shard_key}\n" for row_id, shard_key in entries)
+    return len(entries)
+
+
+def _read_text(path):
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from f
+    except FileNotFoundError:
+        return
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move the large tables into per-job and per-user shards.')
+    parser.add_argument('--data-dir', default=os.environ.get('RESUME_DATA_DIR', utils.DATA_DIR))
+    parser.add_argument('--flatten', action='store_true', help='merge the shards back into single CSV files')
+    args = parser.parse_args()
+    utils.DATA_DIR = args.data_dir
+    for table in SHARD_KEYS:
+        if args.flatten:
+            if os.path.isdir(_shard_dir(table)):
+                print(f"{table}: {flatten(table)} rows merged into one file")
+        elif os.path.exists(os.path.join(utils.DATA_DIR, table)):
+            rows = reshard(table)
+            print(f"{table}: {rows} rows moved into {len(list_shards(table))} shards")
+        elif os.path.isdir(_shard_dir(table)):
+            with write_lock(table):
+                print(f"{table}: id directory rebuilt with {rebuild_directory(table)} ids")
+
+
+if __name__ == '__main__':
+    main()
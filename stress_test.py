@@ -0,0 +1,165 @@
+"""Hammer the CSV tables from many processes and check nothing was lost or torn.
+
+Usage: python stress_test.py [--workers 8] [--ops 50] [--readers 2]
+
+Runs against a throwaway data directory. Each writer process applies to
+its own jobs, then repeatedly rewrites the notes of its applications with
+update_application_status / bulk_update_applications. At the end every
+application must exist exactly once with the notes its owner wrote last.
+Reader processes continuously parse the table and fail on a torn file.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import termstats
+import utils
+import shards
+import archive
+
+
+def _writer(data_dir, worker, ops, results):
+    utils.DATA_DIR = data_dir
+    rng = random.Random(worker)
+    last_notes = {}
+    job_base = worker * 100000
+
+    for i in range(ops):
+        job_id = job_base + i
+        utils.save_application(job_id, worker, i, rng.randint(0, 100), 'Low')
+        # Re-applying must be rejected even under contention
+        assert not utils.save_application(job_id, worker, i, 0, 'Low')
+
+        mine = [a for a in utils.load_csv('applications.csv') if a['user_id'] == str(worker)]
+        target = rng.choice(mine)
+        notes = f"w{worker}-op{i}"
+        if rng.random() < 0.5:
+            archive.update_application_status(target['id'], 'Selected', notes)
+            last_notes[target['id']] = notes
+        else:
+            archive.bulk_update_applications([target['id']], 'Rejected', notes)
+            last_notes[target['id']] = None  # bulk appends a timestamped note
+
+        utils.save_candidate_to_pool(job_id, {
+            'filename': f"w{worker}-{i}.txt",
+            'content': f"worker {worker} op {i}\nmulti-line, \"quoted\" text",
+            'score': 50,
+            'recommendation': 'Review',
+            'justification': notes,
+        })
+    results.put((worker, last_notes))
+
+
+def _reader(data_dir, stop, errors):
+    utils.DATA_DIR = data_dir
+    expected = utils.CSV_HEADERS['applications.csv']
+    reads = 0
+    while not stop.is_set():
+        for name in shards.list_shards('applications.csv'):
+            path = os.path.join(data_dir, name)
+            with utils.read_lock(name), open(path, newline='', encoding='utf-8') as f:
+                rows = list(csv.reader(f))
+            if rows[0] != expected or any(len(r) != len(expected) for r in rows[1:]):
+                errors.put(f"torn read of {name} after {reads} reads")
+                return
+        reads += 1
+
+
+def check_integrity(data_dir, workers, ops, notes_by_worker):
+    utils.DATA_DIR = data_dir
+    problems = []
+    apps = utils.load_csv('applications.csv')
+    ids = [a['id'] for a in apps]
+    if len(apps) != workers * ops:
+        problems.append(f"expected {workers * ops} applications, found {len(apps)}")
+    if len(set(ids)) != len(ids):
+        problems.append(f"{len(ids) - len(set(ids))} duplicate application ids")
+    if len({(a['job_id'], a['user_id']) for a in apps}) != len(apps):
+        problems.append("duplicate (job, user) applications")
+
+    by_id = {a['id']: a for a in apps}
+    for worker, last_notes in notes_by_worker.items():
+        for app_id, notes in last_notes.items():
+            app = by_id.get(app_id)
+            if app is None:
+                problems.append(f"application {app_id} lost")
+            elif notes is not None and app['hr_notes'] != notes:
+                problems.append(f"lost update on application {app_id}: {app['hr_notes']!r} != {notes!r}")
+
+    pool = utils.load_csv('candidate_pool.csv')
+    if len(pool) != workers * ops:
+        problems.append(f"expected {workers * ops} pool candidates, found {len(pool)}")
+    if len({c['id'] for c in pool}) != len(pool):
+        problems.append("duplicate candidate ids")
+
+    stats = termstats.get_stats()
+    if stats.docs != len(pool):
+        problems.append(f"term stats count {stats.docs} documents, pool has {len(pool)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=50)
+    parser.add_argument('--readers', type=int, default=2)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='resume-stress-')
+    try:
+        utils.DATA_DIR = data_dir
+        for name in utils.CSV_HEADERS:
+            utils.ensure_csv_schema(name)
+
+        results = multiprocessing.Queue()
+        errors = multiprocessing.Queue()
+        stop = multiprocessing.Event()
+        readers = [multiprocessing.Process(target=_reader, args=(data_dir, stop, errors))
+                   for _ in range(args.readers)]
+        writers = [multiprocessing.Process(target=_writer, args=(data_dir, w, args.ops, results))
+                   for w in range(1, args.workers + 1)]
+
+        start = time.time()
+        for p in readers + writers:
+            p.start()
+        notes_by_worker = {}
+        while len(notes_by_worker) < len(writers):
+            try:
+                worker, last_notes = results.get(timeout=1)
+                notes_by_worker[worker] = last_notes
+            except queue.Empty:
+                if not any(p.is_alive() for p in writers):
+                    break
+        for p in writers:
+            p.join()
+        elapsed = time.time() - start
+        stop.set()
+        for p in readers:
+            p.join()
+
+        problems = check_integrity(data_dir, args.workers, args.ops, notes_by_worker)
+        while not errors.empty():
+            problems.append(errors.get())
+        if any(p.exitcode for p in writers):
+            problems.append("a writer process crashed")
+
+        total_ops = args.workers * args.ops * 4
+        print(f"{args.workers} writers x {args.ops} ops ({total_ops} table writes) in {elapsed:.1f}s")
+        if problems:
+            for problem in problems:
+                print(f"❌ {problem}")
+            sys.exit(1)
+        print("✅ No lost updates, duplicate ids or torn reads")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""Binary snapshots of the tables, memory-mapped read-only by every worker.
+
+Looking a row up by id used to parse the whole CSV. Instead each table
+gets a snapshot under ``data/snapshots``: every cell at a fixed position
+in a string pool plus a sorted id index. Workers map it read-only, so they
+all share the same page-cache pages, and a lookup is a binary search that
+decodes only the cells of the row it returns. A worker that starts against
+an existing snapshot maps it without parsing any CSV.
+
+Snapshots are derived data and are never written by the table writers. A
+snapshot names the CSV file it was built from (inode, size and the bytes
+just before that size). Rows appended since are read from the end of the
+CSV. The first reader that finds the snapshot stale rebuilds it: after a
+rewrite, or once the rows appended since grow past ``REBUILD_BYTES`` and
+1/32 of the table. Each worker keeps those appended rows it has parsed,
+so memory per worker stays bounded by that tail.
+
+A sharded table is snapshotted per shard, and a lookup by id maps only the
+shard the id directory names. Each worker keeps the ``MAX_MAPS`` most
+recently used mappings.
+
+Layout of ``<table>.snap``, in native byte order with 8-byte integers:
+
+    header  magic, source inode, source size, columns, rows, ids, tail
+            length, then up to TAIL bytes of the source before its size
+    ends    (rows + 1) x columns cell end offsets into the pool; the first
+            row holds the column names, and ``-1 - end`` marks a missing field
+    ids     the rows' integer ids, ascending
+    slots   the row number of each of those ids
+    pool    every cell's UTF-8 bytes, back to back
+"""
+import bisect
+import csv
+import mmap
+import os
+import struct
+import threading
+from array import array
+
+import utils
+import shards
+from cache import LRUCache
+from locking import read_lock, atomic_write
+
+SNAPSHOT_DIR = 'snapshots'
+MAGIC = b'RSNAP001'
+HEADER = struct.Struct('=8s6q')
+TAIL = 64
+REBUILD_BYTES = 1024 * 1024
+# One per shard of a sharded table, so bounded well below the kernel's mapping limit
+MAX_MAPS = 1024
+
+_maps = LRUCache(maxsize=MAX_MAPS)
+
+
+class Snapshot:
+    """One mapped snapshot file."""
+
+    def __init__(self, buffer):
+        magic, self.ino, self.size, self.ncols, self.nrows, nids, tail_len = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError('not a table snapshot')
+        view = memoryview(buffer)
+        offset = HEADER.size
+        self.tail = bytes(view[offset:offset + tail_len])
+        offset += TAIL
+        cells = (self.nrows + 1) * self.ncols
+        self.ends = view[offset:offset + 8 * cells].cast('q')
+        offset += 8 * cells
+        self.ids = view[offset:offset + 8 * nids].cast('q')
+        offset += 8 * nids
+        self.slots = view[offset:offset + 8 * nids].cast('q')
+        offset += 8 * nids
+        self.pool = view[offset:]
+        self.columns = [self._cell(0, j) for j in range(self.ncols)]
+        self.id_column = self.columns.index('id') if 'id' in self.columns else None
+        self.checked = None
+        # Rows appended to the table after it was snapshotted, parsed as lookups need them
+        self.tail_lock = threading.Lock()
+        self.tail_end = self.size
+        self.tail_rows = {}
+
+    def _cell(self, row, column):
+        k = row * self.ncols + column
+        end = self.ends[k]
+        if end < 0:
+            return None
+        start = self.ends[k - 1] if k else 0
+        if start < 0:
+            start = -1 - start
+        return str(self.pool[start:end], 'utf-8')
+
+    def row(self, number):
+        """Row ``number`` (0-based, header excluded) as a dict, like iter_csv yields it."""
+        return {name: self._cell(number + 1, j) for j, name in enumerate(self.columns)}
+
+    def find_appended(self, path, row_id):
+        """The first row with id ``row_id`` among those appended after the snapshot. Needs the read lock."""
+        with self.tail_lock:
+            size = os.path.getsize(path)
+            if self.tail_end < size:
+                with open(path, 'rb') as f:
+                    f.seek(self.tail_end)
+                    for row in csv.reader(utils._lines_until(f, size - self.tail_end)):
+                        if len(row) > self.id_column:
+                            self.tail_rows.setdefault(row[self.id_column], row)
+                self.tail_end = size
+            row = self.tail_rows.get(row_id)
+        if row is None:
+            return None
+        return {name: row[j] if j < len(row) else None for j, name in enumerate(self.columns)}
+
+    def find(self, row_id):
+        """The first row whose id is exactly the string ``row_id``, or None."""
+        try:
+            wanted = int(row_id)
+        except ValueError:
+            # Only integer ids are indexed; tables never hold others, so a scan will do
+            for number in range(self.nrows):
+                if self._cell(number + 1, self.id_column) == row_id:
+                    return self.row(number)
+            return None
+        i = bisect.bisect_left(self.ids, wanted)
+        while i < len(self.ids) and self.ids[i] == wanted:
+            number = self.slots[i]
+            # int() accepts ' 7' and '07'; the old string comparison did not
+            if self._cell(number + 1, self.id_column) == row_id:
+                return self.row(number)
+            i += 1
+        return None
+
+
+def _paths(filename):
+    return (os.path.join(utils.DATA_DIR, filename),
+            os.path.join(utils.DATA_DIR, SNAPSHOT_DIR, filename + '.snap'))
+
+
+def _covers(snap, path, st):
+    """Whether ``snap`` is still a prefix of the table file ``st`` describes, small enough a tail aside."""
+    if snap.ino != st.st_ino or snap.size > st.st_size:
+        return False
+    if st.st_size - snap.size > max(REBUILD_BYTES, snap.size // 32):
+        return False
+    checked = (st.st_ino, st.st_size, st.st_mtime_ns)
+    if snap.checked == checked:
+        return True
+    # An in-place rewrite keeps the inode; the bytes at the old end would differ
+    with open(path, 'rb') as f:
+        f.seek(snap.size - len(snap.tail))
+        if f.read(len(snap.tail)) != snap.tail:
+            return False
+    snap.checked = checked
+    return True
+
+
+def _load(snap_path):
+    try:
+        with open(snap_path, 'rb') as f:
+            return Snapshot(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    except (FileNotFoundError, ValueError, struct.error):
+        return None
+
+
+def build(filename):
+    """Write a fresh snapshot of a table and return it mapped."""
+    path, snap_path = _paths(filename)
+    os.makedirs(os.path.dirname(snap_path), exist_ok=True)
+    pool = bytearray()
+    ends = array('q')
+    ids = []
+    with read_lock(filename), open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        ino = os.fstat(f.fileno()).st_ino
+        reader = csv.reader(utils._lines_until(f, size))
+        header = next(reader, None) or []
+        width = len(header)
+        id_column = header.index('id') if 'id' in header else None
+
+        def put(values):
+            for j in range(width):
+                if j < len(values):
+                    pool.extend(values[j].encode('utf-8'))
+                    ends.append(len(pool))
+                else:
+                    ends.append(-1 - len(pool))
+
+        put(header)
+        rows = 0
+        for row in reader:
+            if not row:
+                continue
+            put(row)
+            if id_column is not None and id_column < len(row):
+                try:
+                    ids.append((int(row[id_column]), rows))
+                except ValueError:
+                    pass
+            rows += 1
+        f.seek(max(0, size - TAIL))
+        tail = f.read(size - f.tell())
+    ids.sort()
+    with atomic_write(snap_path, 'w+b') as out:
+        out.write(HEADER.pack(MAGIC, ino, size, width, rows, len(ids), len(tail)))
+        out.write(tail.ljust(TAIL, b'\0'))
+        out.write(ends.tobytes())
+        out.write(array('q', (i for i, _ in ids)).tobytes())
+        out.write(array('q', (r for _, r in ids)).tobytes())
+        out.write(pool)
+        out.flush()
+        # Map the file we wrote, not whatever a concurrent rebuild renames into place
+        snap = Snapshot(mmap.mmap(out.fileno(), 0, access=mmap.ACCESS_READ))
+    return snap
+
+
+def snapshot(filename):
+    """A snapshot covering the table as it is now, short of a small tail; None if the table is missing.
+
+    The caller holds the table's read lock, so the table cannot change before it reads the tail.
+    """
+    path, snap_path = _paths(filename)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (utils.DATA_DIR, filename)
+    snap = _maps.get(key)
+    if snap is not None and _covers(snap, path, st):
+        return snap
+    # Another worker may have rebuilt it already
+    snap = _load(snap_path)
+    if snap is None or not _covers(snap, path, st):
+        snap = build(filename)
+    _maps.put(key, snap)
+    return snap
+
+
+def get_row(filename, row_id):
+    """The first row of a table with id ``row_id`` (compared as a string, like iter_csv's ``where``), or None."""
+    row_id = str(row_id)
+    if shards.is_sharded(filename):
+        for name in shards.files_for(filename, {'id': row_id}):
+            row = get_row(name, row_id)
+            if row is not None:
+                return row
+        return None
+    with read_lock(filename):
+        snap = snapshot(filename)
+        if snap is None or snap.id_column is None:
+            return None
+        row = snap.find(row_id)
+        if row is None:
+            row = snap.find_appended(_paths(filename)[0], row_id)
+        return row
+
+
+def clear():
+    """Drop this process's mappings; the next lookup maps the files again."""
+    _maps.clear()
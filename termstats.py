@@ -0,0 +1,270 @@
+"""Document frequencies of terms across stored resumes and pool candidates.
+
+Weighted scoring (TF-IDF / BM25) needs to know how common each job
+keyword is in the corpus. Instead of rescanning every resume, the stats
+are maintained incrementally under ``data/termstats``:
+
+* ``snapshot.pkl`` holds the document count, total token count and a
+  term -> document frequency map as of the last compaction;
+* ``deltas.log`` gets one line per inserted (``+``) or removed (``-``)
+  document: its length and its distinct terms.
+
+Each process keeps the stats in memory and only reads log lines appended
+since it last looked, so a lookup costs O(keywords). The log is folded
+into the snapshot once it grows past ``COMPACT_BYTES``. Everything here
+is derived data; ``rebuild()`` recomputes it from the tables.
+
+A resume screened against several jobs at once is one document: only the
+first job's pool row counts, the other jobs' rows are ``copy_of`` it
+(``in_corpus``).
+
+Weighted scoring reads the snapshot alone (``scoring_stats``), not the
+deltas logged since, and cached scores are keyed on it (``generation``),
+so an insert does not invalidate every cached score. The log is folded in,
+publishing new IDFs, once the document count has moved by ``REFRESH_SHARE``
+or the snapshot is ``REFRESH_INTERVAL`` seconds old.
+"""
+import math
+import os
+import pickle
+import re
+import threading
+import time
+
+import utils
+from locking import read_lock, write_lock, atomic_write
+
+STATS_DIR = 'termstats'
+# Not ordered by name ('shards/...' sorts first). Writers may take it while holding
+# table or shard locks because no holder waits for another lock, except rebuild: it
+# write-locks the source tables first, shutting out their shard writers, then reads shards
+LOCK_NAME = 'termstats'
+COMPACT_BYTES = 8 * 1024 * 1024
+REFRESH_SHARE = 0.05
+REFRESH_INTERVAL = int(os.environ.get('RESUME_IDF_REFRESH_SECONDS', 300))
+SOURCES = ('resumes.csv', 'candidate_pool.csv')
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r'\b\w+\b')
+
+_cache_lock = threading.Lock()
+_cache = {'key': None, 'offset': 0, 'stats': None}
+_published = {'key': None, 'stats': None}
+
+
+class TermStats:
+    def __init__(self, docs=0, total_length=0, df=None):
+        self.docs = docs
+        self.total_length = total_length
+        self.df = df if df is not None else {}
+
+    def apply(self, line):
+        head, _, terms = line.partition('\t')
+        step = 1 if head[0] == '+' else -1
+        self.docs += step
+        self.total_length += step * int(head[1:])
+        df = self.df
+        for term in terms.split():
+            count = df.get(term, 0) + step
+            if count > 0:
+                df[term] = count
+            else:
+                df.pop(term, None)
+
+    @property
+    def avg_length(self):
+        return self.total_length / self.docs if self.docs > 0 else 0.0
+
+    def idf(self, term):
+        """BM25-style IDF; always positive, highest for terms few documents contain."""
+        df = self.df.get(term, 0)
+        return math.log(1 + (self.docs - df + 0.5) / (df + 0.5))
+
+
+def document_terms(tokens):
+    """Distinct terms worth indexing: the same filter job keywords go through."""
+    return {t for t in tokens if len(t) > 3 and t not in utils.JD_STOPWORDS}
+
+
+def in_corpus(row):
+    """Whether a resume or pool row is counted; another job's copy of an upload is not."""
+    return not row.get('copy_of')
+
+
+def _paths():
+    directory = os.path.join(utils.DATA_DIR, STATS_DIR)
+    return directory, os.path.join(directory, 'snapshot.pkl'), os.path.join(directory, 'deltas.log')
+
+
+def _delta_line(sign, text):
+    # A ResumeDocument was tokenized with the same pattern already
+    if isinstance(text, utils.ResumeDocument):
+        total, tokens = text.token_total, text.token_counts
+    else:
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        total = len(tokens)
+    return f"{sign}{total}\t{' '.join(sorted(document_terms(tokens)))}\n"
+
+
+def _append(line):
+    directory, snapshot_path, log_path = _paths()
+    os.makedirs(directory, exist_ok=True)
+    with write_lock(LOCK_NAME):
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(line)
+            size = f.tell()
+        if size > COMPACT_BYTES or _needs_refresh(snapshot_path):
+            _compact(snapshot_path, log_path)
+
+
+def _needs_refresh(snapshot_path):
+    """Whether the deltas logged since the snapshot should reach weighted scoring now. Needs the lock."""
+    try:
+        age = time.time() - os.stat(snapshot_path).st_mtime
+    except FileNotFoundError:
+        return True
+    published = scoring_stats().docs
+    return age >= REFRESH_INTERVAL or abs(get_stats().docs - published) > published * REFRESH_SHARE
+
+
+def add_document(text):
+    """Count a newly stored resume or pool candidate. Cheap enough to call inside a table write lock."""
+    _append(_delta_line('+', text))
+
+
+def add_documents(texts):
+    """Count many new documents (texts or utils.ResumeDocuments) with a single append."""
+    lines = ''.join(_delta_line('+', text) for text in texts)
+    if lines:
+        _append(lines)
+
+
+def remove_document(text):
+    """Uncount a document that left the corpus; pass the same text that was added."""
+    _append(_delta_line('-', text))
+
+
+def _load_snapshot(snapshot_path):
+    try:
+        with open(snapshot_path, 'rb') as f:
+            docs, total_length, df = pickle.load(f)
+        return TermStats(docs, total_length, df)
+    except FileNotFoundError:
+        return TermStats()
+
+
+def _replay(stats, log_path, offset=0):
+    """Apply complete log lines after ``offset``; returns the new offset."""
+    try:
+        with open(log_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return offset
+    end = data.rfind(b'\n') + 1
+    for line in data[:end].decode('utf-8').splitlines():
+        if line:
+            stats.apply(line)
+    return offset + end
+
+
+def _write_snapshot(snapshot_path, log_path, stats):
+    with atomic_write(snapshot_path, 'wb') as f:
+        pickle.dump((stats.docs, stats.total_length, stats.df), f, protocol=pickle.HIGHEST_PROTOCOL)
+    # A new snapshot inode tells other processes to reload before they read the emptied log
+    open(log_path, 'w').close()
+
+
+def _compact(snapshot_path, log_path):
+    stats = _load_snapshot(snapshot_path)
+    _replay(stats, log_path)
+    _write_snapshot(snapshot_path, log_path, stats)
+
+
+def rebuild():
+    """Recompute the stats from every stored resume and pool candidate."""
+    directory, snapshot_path, log_path = _paths()
+    os.makedirs(directory, exist_ok=True)
+    stats = TermStats()
+    with write_lock(LOCK_NAME, *SOURCES):
+        for filename in SOURCES:
+            for row in filter(in_corpus, utils.load_csv(filename)):
+                stats.apply(_delta_line('+', row.get('content_text') or ''))
+        _write_snapshot(snapshot_path, log_path, stats)
+    return stats
+
+
+def ensure_stats():
+    """Build the stats on first start against existing data."""
+    if not os.path.exists(_paths()[1]):
+        rebuild()
+
+
+def _file_key(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def generation():
+    """Change token for the stats weighted scoring uses; differs after every compaction."""
+    return _file_key(_paths()[1])
+
+
+def scoring_stats():
+    """The stats as of the last snapshot, which weighted scoring uses (see the module docstring)."""
+    snapshot_path = _paths()[1]
+    with _cache_lock:
+        key = (utils.DATA_DIR, _file_key(snapshot_path))
+        if _published['key'] != key:
+            _published.update(key=key, stats=_load_snapshot(snapshot_path))
+        return _published['stats']
+
+
+def get_stats():
+    """Current stats, catching up on deltas other processes logged since the last call."""
+    _, snapshot_path, log_path = _paths()
+    with _cache_lock:
+        snapshot_key = (utils.DATA_DIR, _file_key(snapshot_path))
+        log_size = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        if _cache['key'] == snapshot_key and _cache['offset'] == log_size:
+            return _cache['stats']
+        with read_lock(LOCK_NAME):
+            snapshot_key = (utils.DATA_DIR, _file_key(snapshot_path))
+            if _cache['key'] != snapshot_key or _cache['offset'] > log_size:
+                _cache.update(key=snapshot_key, offset=0, stats=_load_snapshot(snapshot_path))
+            _cache['offset'] = _replay(_cache['stats'], log_path, _cache['offset'])
+        return _cache['stats']
+
+
+def weighted_match(token_counts, token_total, keywords, mode):
+    """Share (0-100) of the job's keyword weight a resume covers, plus the per-keyword weights.
+
+    The resume is given by its term counts and total token count (see
+    utils.ResumeDocument).
+
+    ``tfidf`` weighs each keyword the resume contains by its IDF. ``bm25``
+    also credits repeated mentions, with saturation and resume length
+    normalization; the score is relative to a resume that saturates every
+    keyword.
+    """
+    stats = scoring_stats()
+    weights = {k: stats.idf(k) for k in keywords}
+    total = sum(weights.values())
+    if not total:
+        return 0.0, weights
+
+    if mode == 'tfidf':
+        gained = sum(w for k, w in weights.items() if k in token_counts)
+        return gained / total * 100, weights
+
+    avg_length = stats.avg_length or token_total or 1
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * token_total / avg_length)
+    counts = {k: token_counts[k] for k in weights if k in token_counts}
+    gained = sum(weights[k] * tf * (BM25_K1 + 1) / (tf + norm) for k, tf in counts.items())
+    return gained / (total * (BM25_K1 + 1)) * 100, weights
@@ -0,0 +1,39 @@
+import io
+import json
+
+import utils
+from app import app
+
+BOUNDARY = 'resumeboundary'
+
+
+def _multipart(parts):
+    body = b''
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else '')
+        body += f'--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n'.encode() + data + b'\r\n'
+    return body + f'--{BOUNDARY}--\r\n'.encode()
+
+
+def test_multipart_results_stream_before_the_body_is_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setitem(app.config, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setitem(app.config, 'API_TOKENS', ['secret'])
+    body = _multipart([
+        ('job_description', None, b'python sql developer'),
+        ('resume_text', None, b'python developer'),
+        ('resumes', 'cv.txt', b'sql ' * 100000),
+    ])
+    stream = io.BytesIO(body)
+    response = app.test_client().post(
+        '/api/score', input_stream=stream, buffered=False,
+        headers={'Authorization': 'Bearer secret', 'Content-Length': str(len(body)),
+                 'Content-Type': f'multipart/form-data; boundary={BOUNDARY}'})
+    lines = iter(response.response)
+    first = json.loads(next(lines))
+    assert (first['index'], first['id']) == (0, None) and 'error' not in first
+    # Scored while most of the upload was still unread
+    assert stream.tell() < len(body)
+    rest = [json.loads(line) for line in lines]
+    assert rest[0]['id'] == 'cv.txt'
+    assert rest[-1] == {'done': True, 'scored': 2, 'errors': 0}
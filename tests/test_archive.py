@@ -0,0 +1,46 @@
+import os
+
+import archive
+import shards
+import utils
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'DATA_DIR', str(tmp_path))
+    utils.bootstrap_data()
+    for n in range(3):
+        utils.save_job(1, f'Job {n}', 'python developer', 'python', 1)
+    jobs = [j['id'] for j in utils.load_jobs()]
+    for job_id in jobs:
+        for user_id in ('7', '8'):
+            utils.save_application(job_id, user_id, '1', 50)
+    return jobs
+
+
+def _app_ids(user_id):
+    return sorted(a['id'] for a in archive.iter_user_applications(user_id))
+
+
+def test_user_history_reads_only_that_users_archives(tmp_path, monkeypatch):
+    jobs = _setup(tmp_path, monkeypatch)
+    before = _app_ids('7')
+    archive.archive_jobs(jobs[:2])
+    assert _app_ids('7') == before
+    assert archive._user_jobs('7') == set(jobs[:2])
+    archive.restore_job(jobs[0])
+    assert archive._user_jobs('7') == {jobs[1]}
+    archive.delete_job_archive(jobs[1])
+    assert not os.path.exists(archive._user_path('7'))
+
+
+def test_write_to_archived_row_restores_its_job(tmp_path, monkeypatch):
+    jobs = _setup(tmp_path, monkeypatch)
+    app = next(a for a in utils.iter_csv('applications.csv', where={'job_id': jobs[1]}))
+    archive.archive_jobs(jobs)
+    # A lost id directory is rebuilt with the archived rows in it
+    with utils.write_lock('applications.csv'):
+        shards.rebuild_directory('applications.csv')
+    assert archive.update_application_status(app['id'], 'Selected', '')
+    assert not archive.is_archived(jobs[1])
+    assert archive.is_archived(jobs[0]) and archive.is_archived(jobs[2])
+    assert next(utils.iter_csv('applications.csv', where={'id': app['id']}))['status'] == 'Selected'
@@ -0,0 +1,83 @@
+import csv
+import io
+import os
+
+import groupcommit
+import utils
+
+HEADER = ['id', 'name', 'content_text']
+ROWS = [
+    ['1', 'alice', 'plain text'],
+    ['2', 'bob', 'He said "hi"\r\nthen, on a new line, "bye"'],
+    ['3', 'carol', ''],
+    ['4', 'dave', 'multi\nline\nwith "quotes" and, commas'],
+]
+
+
+def _table(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+def _read(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def test_header_without_newline_is_kept(tmp_path):
+    path = tmp_path / 'users.csv'
+    path.write_bytes(b'id,username,password')
+    assert groupcommit.recover(str(path)) == 0
+    assert path.read_bytes() == b'id,username,password\r\n'
+
+
+def test_last_row_that_lost_only_its_newline_is_kept(tmp_path):
+    path = tmp_path / 't.csv'
+    path.write_bytes(_table(ROWS)[:-1])
+    assert groupcommit.recover(str(path)) == 0
+    assert _read(path) == [HEADER] + ROWS
+
+
+def test_row_torn_inside_an_unquoted_field_is_cut(tmp_path):
+    path = tmp_path / 'applications.csv'
+    complete = b'id,job_id,user_id,status\r\n4,3,7,Applied\r\n'
+    path.write_bytes(complete + b'5,3,7,App')
+    assert groupcommit.recover(str(path)) == len(b'5,3,7,App')
+    assert path.read_bytes() == complete
+
+
+def test_every_cut_leaves_an_appendable_table(tmp_path):
+    """Cut the table at every byte, as a crash mid-append could, and recover it."""
+    data = _table(ROWS)
+    header_size = len(_table([]))
+    # Where each row's \r ends it; a cut there or later leaves the row whole
+    row_ends = [len(_table(ROWS[:i + 1])) - 1 for i in range(len(ROWS))]
+    path = tmp_path / 't.csv'
+    for cut in range(1, len(data) + 1):
+        path.write_bytes(data[:cut])
+        groupcommit.recover(str(path))
+        assert groupcommit.ends_cleanly(str(path)), cut
+        # Never cut into the header
+        assert os.path.getsize(path) >= min(cut, header_size), cut
+        with open(path, 'ab') as f:
+            f.write(_table([['9', 'new', 'appended']])[header_size:])
+        rows = _read(path)
+        assert [] not in rows, cut
+        if cut >= header_size:
+            assert rows[0] == HEADER, cut
+        assert rows[-1] == ['9', 'new', 'appended'], cut
+        # Only original rows survive, and every whole one does
+        kept = rows[1:-1]
+        assert kept == ROWS[:len(kept)], cut
+        assert len(kept) >= sum(end <= cut for end in row_ends), cut
+
+
+def test_bootstrap_keeps_header_only_users_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'DATA_DIR', str(tmp_path))
+    header = ','.join(utils.CSV_HEADERS['users.csv']).encode('utf-8')
+    (tmp_path / 'users.csv').write_bytes(header)
+    utils.bootstrap_data()
+    assert [u['username'] for u in utils.load_users()] == ['Admin']
@@ -0,0 +1,64 @@
+import rescore
+import utils
+from locking import try_lock, unlock
+
+
+def test_status_is_shared_through_the_data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'DATA_DIR', str(tmp_path))
+    assert rescore.rescore_status(7) == {'state': 'idle'}
+    rescore._publish('7', {'state': 'done', 'version': 2})
+    assert rescore.rescore_status(7) == {'state': 'done', 'version': 2}
+
+
+def test_running_status_without_a_runner_reads_interrupted(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'DATA_DIR', str(tmp_path))
+    rescore._publish('7', {'state': 'running'})
+    handle = try_lock(rescore._lock_name('7'))
+    try:
+        assert rescore.rescore_status(7)['state'] == 'running'
+    finally:
+        unlock(handle)
+    # The worker that held the lock is gone
+    assert rescore.rescore_status(7)['state'] == 'interrupted'
+
+
+def _job_and_rows(tmp_path, monkeypatch, scoring_mode):
+    monkeypatch.setattr(utils, 'DATA_DIR', str(tmp_path))
+    utils.bootstrap_data()
+    utils.save_job(1, 'Dev', 'python flask django docker kubernetes aws developer', 'python', 1)
+    job = utils.load_jobs()[0]
+    text = 'developer with python'
+    score, details = utils.check_job_satisfaction(text, utils.job_description_text(job), detailed=True)
+    recommendation, justification = utils.screening_recommendation(score, details)
+    utils.save_candidate_to_pool(job['id'], {'filename': 'a.txt', 'content': text, 'score': score,
+                                             'recommendation': recommendation, 'justification': justification,
+                                             'job_version': 1, 'scoring_mode': scoring_mode})
+    return job, text
+
+
+def _edit_and_rescore(job):
+    old_job, _ = utils.update_job(job['id'], job['title'], job['description'] + ' terraform golang rust',
+                                  job['skills_required'], job['vacancies'])
+    rescore.rescore_job(job['id'], old_job)
+    new_job = utils.get_job_by_id(job['id'])
+    return new_job, next(utils.iter_csv('candidate_pool.csv'))
+
+
+def test_fast_path_justifies_like_a_fresh_score(tmp_path, monkeypatch):
+    job, text = _job_and_rows(tmp_path, monkeypatch, 'keyword')
+    new_job, row = _edit_and_rescore(job)
+    score, details = utils.check_job_satisfaction(text, utils.job_description_text(new_job), detailed=True)
+    assert row['score'] == str(score)
+    assert row['justification'] == utils.screening_recommendation(score, details)[1]
+
+
+def test_rows_scored_in_another_mode_are_rescored_in_full(tmp_path, monkeypatch):
+    job, text = _job_and_rows(tmp_path, monkeypatch, 'bm25')
+    # A weighted score cannot be inverted into a keyword match count
+    rows = utils.load_csv('candidate_pool.csv')
+    rows[0]['score'] = '93'
+    utils.rewrite_csv(utils.shards.shard_name('candidate_pool.csv', job['id']), rows)
+    new_job, row = _edit_and_rescore(job)
+    score, _ = utils.check_job_satisfaction(text, utils.job_description_text(new_job), detailed=True)
+    assert row['score'] == str(score)
+    assert row['scoring_mode'] == 'keyword'
@@ -0,0 +1,28 @@
+import os
+
+import screening
+import termstats
+import utils
+
+
+def test_upload_screened_for_several_jobs_is_stored_and_counted_per_upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'DATA_DIR', str(tmp_path / 'data'))
+    utils.bootstrap_data()
+    for title in ('Backend', 'Data'):
+        utils.save_job(1, title, 'python developer', 'python sql', 1)
+    jobs = [j['id'] for j in utils.load_jobs()]
+    original = tmp_path / 'cv.txt'
+    original.write_text('python developer with sql experience')
+    docs = termstats.get_stats().docs
+
+    screening.screen_stream_jobs(jobs, iter([{'filename': 'cv.txt', 'content': original.read_text(),
+                                              'original_path': str(original)}]))
+
+    rows = [next(utils.iter_csv('candidate_pool.csv', where={'job_id': job_id})) for job_id in jobs]
+    assert rows[0]['copy_of'] == '' and rows[1]['copy_of'] == rows[0]['id']
+    # Each job's row has its own file, so removing one leaves the other
+    assert rows[0]['file_path'] != rows[1]['file_path']
+    os.remove(rows[0]['file_path'])
+    assert open(rows[1]['file_path']).read() == 'python developer with sql experience'
+    assert termstats.get_stats().docs == docs + 1
+    assert termstats.rebuild().docs == docs + 1
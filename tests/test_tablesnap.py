@@ -0,0 +1,27 @@
+import io
+
+import tablesnap
+import utils
+from werkzeug.datastructures import FileStorage
+
+
+def test_resume_lookup_reads_the_users_shard(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'DATA_DIR', str(tmp_path))
+    tablesnap.clear()
+    utils.bootstrap_data()
+    ids = {}
+    for user_id in (1, 2, 3):
+        for n in range(3):
+            text = f'user {user_id} resume {n}\nwith "quotes", commas'
+            utils.save_resume(user_id, f'r{n}.txt', FileStorage(io.BytesIO(text.encode('utf-8')), f'r{n}.txt'))
+    for row in utils.iter_csv('resumes.csv'):
+        ids[row['id']] = row
+    assert len(ids) == 9
+    for resume_id, row in ids.items():
+        assert utils.get_resume_by_id(resume_id) == row
+        assert utils.get_resume_by_id(int(resume_id)) == row
+    # Rows appended after the shard was snapshotted are found too
+    utils.save_resume(2, 'late.txt', FileStorage(io.BytesIO(b'late'), 'late.txt'))
+    late = [r for r in utils.iter_csv('resumes.csv', where={'user_id': '2'}) if r['filename'] == 'late.txt'][0]
+    assert utils.get_resume_by_id(late['id']) == late
+    assert utils.get_resume_by_id(999) is None
@@ -0,0 +1,30 @@
+import termstats
+import utils
+
+
+def test_inserts_reach_scoring_in_steps(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'DATA_DIR', str(tmp_path))
+    termstats.rebuild()
+    termstats.add_documents(f'python developer resume number{i}' for i in range(100))
+    generation = termstats.generation()
+    assert termstats.scoring_stats().docs == termstats.get_stats().docs == 100
+
+    # Under 5% more documents: scores cached against this generation stay valid
+    for i in range(5):
+        termstats.add_document(f'java developer resume extra{i}')
+    assert termstats.generation() == generation
+    assert termstats.scoring_stats().docs == 100
+    assert termstats.get_stats().docs == 105
+
+    termstats.add_document('java developer resume extra5')
+    assert termstats.generation() != generation
+    assert termstats.scoring_stats().docs == termstats.get_stats().docs == 106
+
+
+def test_old_snapshot_is_refreshed_on_next_insert(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(termstats, 'REFRESH_INTERVAL', 0)
+    termstats.rebuild()
+    termstats.add_documents(f'resume number{i}' for i in range(100))
+    termstats.add_document('one more resume')
+    assert termstats.scoring_stats().docs == 101
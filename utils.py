@@ -1,67 +1,302 @@
 import csv
 import os
+import re
 import uuid
 import io
+import json
+import hashlib
+import shutil
+import tempfile
+import zipfile
+import threading
+import heapq
+from collections import Counter
 from datetime import datetime
-import pypdf
-import docx
+from werkzeug.security import generate_password_hash, check_password_hash
+from locking import read_lock, write_lock, atomic_write, set_data_dir
+from cache import fragment_cache, Cache, LRUCache
+import termstats
+import groupcommit
+import tablesnap
+import shards
 
 DATA_DIR = 'data'
+# Read at every lock: callers point DATA_DIR elsewhere at runtime
+set_data_dir(lambda: DATA_DIR)
+# 'keyword' counts matched job keywords equally; 'tfidf' and 'bm25' weigh them by corpus rarity
+SCORING_MODES = ('keyword', 'tfidf', 'bm25')
+SCORING_MODE = 'keyword'
+
+CSV_HEADERS = {
+    'users.csv': ['id', 'username', 'password', 'role', 'email'],
+    'jobs.csv': ['id', 'hr_id', 'title', 'description', 'skills_required', 'vacancies', 'status', 'version',
+                 'closed_date'],
+    'resumes.csv': ['id', 'user_id', 'filename', 'content_text', 'upload_date', 'file_path'],
+    'applications.csv': ['id', 'job_id', 'user_id', 'resume_id', 'status', 'hr_notes', 'score', 'eligibility',
+                         'applied_date', 'decision_date', 'job_version', 'scoring_mode'],
+    'candidate_pool.csv': ['id', 'job_id', 'filename', 'content_text', 'score', 'recommendation', 'justification',
+                           'hr_decision', 'upload_date', 'file_path', 'decision_date', 'job_version', 'duplicate_of',
+                           'scoring_mode', 'copy_of']
+}
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+# (DATA_DIR, table) -> (inode, size, last bytes before size, highest id in the first size bytes)
+_id_marks = {}
+_id_marks_lock = threading.Lock()
+ID_MARK_TAIL = 64
+
+def get_next_id(filename, shard=None, count=1):
+    """One more than the highest id in the table.
+
+    Only the rows appended since the previous call in this process are
+    parsed; a rewritten file (new inode, shrunk, or different bytes at the
+    old end) is scanned again from the start. Callers hold the table's
+    write lock until the row is appended. For a sharded table, ``count``
+    ids are reserved for rows going to the ``shard`` key's shard instead,
+    and the first is returned.
+    """
+    if shards.is_sharded(filename):
+        if shard is None:
+            raise ValueError(f"{filename} is sharded: say which shard the new rows go to")
+        return shards.reserve_ids(filename, shard, count)
 
-def get_next_id(filename):
     path = os.path.join(DATA_DIR, filename)
     if not os.path.exists(path):
         return 1
-    with open(path, 'r', newline='', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        data = list(reader)
-        if len(data) <= 1:
-            return 1
-        # Find the last row with a valid ID
-        for row in reversed(data[1:]):  # Skip header, start from bottom
-            if row and row[0] and row[0].strip():  # Check if ID exists and is not empty
+    key = (DATA_DIR, filename)
+    with read_lock(filename), open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        with _id_marks_lock:
+            mark = _id_marks.get(key)
+        start, table_highest = 0, 0
+        if mark and mark[0] == st.st_ino and mark[1] <= st.st_size:
+            f.seek(max(0, mark[1] - len(mark[2])))
+            if f.read(len(mark[2])) == mark[2]:
+                start, table_highest = mark[1], mark[3]
+        f.seek(start)
+        reader = csv.reader(_lines_until(f, st.st_size - start))
+        if start == 0:
+            next(reader, None)
+        for row in reader:
+            if row and row[0].strip():
                 try:
-                    return int(row[0]) + 1
+                    table_highest = max(table_highest, int(row[0]))
                 except ValueError:
                     continue
-        return 1
+        f.seek(max(0, st.st_size - ID_MARK_TAIL))
+        tail = f.read(st.st_size - f.tell())
+    with _id_marks_lock:
+        _id_marks[key] = (st.st_ino, st.st_size, tail, table_highest)
+    return table_highest + 1
 
 def load_csv(filename):
+    return list(iter_csv(filename))
+
+def iter_csv(filename, columns=None, where=None):
+    """Stream a table's rows as dicts holding only ``columns`` (default: every column).
+
+    ``where`` maps column names to the value a row must have, or to a set
+    of accepted values; other rows are skipped before any dict is built
+    for them. Missing fields read as None. The table's read lock is held
+    until the generator is exhausted or closed, so consume it promptly and
+    never write the same table while iterating. A sharded table is read one
+    shard at a time, only the shards ``where`` can match if it names their
+    key or row ids.
+    """
+    if shards.is_sharded(filename):
+        for name in shards.files_for(filename, where):
+            yield from iter_csv(name, columns, where)
+        return
     path = os.path.join(DATA_DIR, filename)
     if not os.path.exists(path):
-        return []
+        return
+    with read_lock(filename), open(path, 'r', newline='', encoding='utf-8') as f:
+        yield from decode_csv_rows(f, columns, where)
+
+def snapshot_csv(filename, columns=None, where=None):
+    """Like iter_csv, but only holds the read lock while pinning the table's current contents.
+
+    Rewrites replace the file and appends land past the size recorded
+    here, so the rows can be consumed at any pace (say, streamed to a slow
+    client) without holding up writers.
+    """
+    if shards.is_sharded(filename):
+        for name in shards.files_for(filename, where):
+            yield from snapshot_csv(name, columns, where)
+        return
+    path = os.path.join(DATA_DIR, filename)
+    try:
+        with read_lock(filename):
+            f = open(path, 'rb')
+            size = os.fstat(f.fileno()).st_size
+    except FileNotFoundError:
+        return
+    with f:
+        yield from decode_csv_rows(_lines_until(f, size), columns, where)
+
+def _lines_until(f, size):
+    read = 0
+    for line in f:
+        if read >= size:
+            return
+        read += len(line)
+        yield line.decode('utf-8')
+
+def decode_csv_rows(lines, columns, where):
+    """Rows of CSV text (any iterable of lines, header first) as dicts; see iter_csv for the arguments."""
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if not header:
+        return
+    width = len(header)
+    position = {name: i for i, name in enumerate(header)}
+    names = header if columns is None else list(columns)
+    indices = [position.get(name) for name in names]
+    complete = None not in indices
+    tests = []
+    for name, wanted in (where or {}).items():
+        accepted = wanted if isinstance(wanted, (set, frozenset)) else {wanted}
+        tests.append((position.get(name, width), {str(v) for v in accepted}))
+    for row in reader:
+        if not row:
+            continue
+        if tests and any((row[i] if i < len(row) else None) not in accepted for i, accepted in tests):
+            continue
+        if columns is None and len(row) == width:
+            yield dict(zip(header, row))
+        elif complete and len(row) >= width:
+            yield {name: row[i] for name, i in zip(names, indices)}
+        else:
+            yield {name: row[i] if i is not None and i < len(row) else None for name, i in zip(names, indices)}
+
+def listing_columns(filename):
+    """Every column of a table except the resume text, for pages that only list rows."""
+    return [c for c in CSV_HEADERS[filename] if c != 'content_text']
+
+def table_generation(filename):
+    """Cheap change token for a table, shared by all processes.
+
+    Appends change the size and atomic rewrites change the inode, so the
+    token differs after every write without reading the file.
+    """
+    if shards.is_sharded(filename):
+        return shards.generation(filename)
+    try:
+        st = os.stat(os.path.join(DATA_DIR, filename))
+    except FileNotFoundError:
+        return '0'
+    return f"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"
+
+def rewrite_csv(filename, rows):
+    """Atomically replace a table's (or a shard's) contents. Callers must hold its write lock."""
+    if shards.is_sharded(filename):
+        raise ValueError(f"{filename} is sharded: rewrite the shards holding the rows")
+    table = shards.table_of(filename)
+    path = os.path.join(DATA_DIR, filename)
+    with atomic_write(path, newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_HEADERS[table], extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    if table != filename:
+        shards.touch(table)
+
+def ensure_csv_schema(filename):
+    """Create the CSV if missing, or rewrite it when its header lacks newer columns."""
+    if shards.is_sharded(filename):
+        shards.ensure(filename)
+        return
+    with write_lock(filename):
+        _ensure_csv_schema(filename)
+
+def _ensure_csv_schema(filename):
+    path = os.path.join(DATA_DIR, filename)
+    headers = CSV_HEADERS[shards.table_of(filename)]
+    if not os.path.exists(path):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(headers)
+        return
     with open(path, 'r', newline='', encoding='utf-8') as f:
-        reader = list(csv.DictReader(f))
-        return reader
+        current = next(csv.reader(f), [])
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+    if size:
+        # A row cut short by a crash would get the next append glued onto it
+        torn = groupcommit.recover(path)
+        if torn:
+            print(f"Removed {torn} bytes of a partially written row from {filename}")
+    if all(h in current for h in headers):
+        return
+    rewrite_csv(filename, load_csv(filename))
+
+_bootstrap_lock = threading.Lock()
+_bootstrapped = set()
+
+def bootstrap_data():
+    """Create the data directories, table files and default admin. Runs once per process and data dir."""
+    if DATA_DIR in _bootstrapped:
+        return
+    with _bootstrap_lock:
+        if DATA_DIR in _bootstrapped:
+            return
+        os.makedirs(os.path.join(DATA_DIR, 'uploads'), exist_ok=True)
+        # Initialize CSVs if not exist (and migrate headers of older data files)
+        for csv_name in CSV_HEADERS:
+            ensure_csv_schema(csv_name)
+        # Re-check the admin every start in case it was manually deleted from the csv
+        initialize_admin()
+        termstats.ensure_stats()
+        _bootstrapped.add(DATA_DIR)
 
 def append_csv(filename, fieldnames, row_dict):
-    path = os.path.join(DATA_DIR, filename)
-    with open(path, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writerow(row_dict)
+    append_csv_rows(filename, fieldnames, [row_dict])
 
-from werkzeug.security import generate_password_hash, check_password_hash
+def append_csv_rows(filename, fieldnames, rows):
+    """Append rows in a single write per file; durability follows groupcommit.DURABILITY.
+
+    Rows of a sharded table go to the shards their key names.
+    """
+    if shards.is_sharded(filename):
+        key = shards.SHARD_KEYS[filename]
+        groups = {}
+        for row in rows:
+            groups.setdefault(shards.shard_name(filename, row.get(key) or ''), []).append(row)
+        for name, group in groups.items():
+            append_csv_rows(name, fieldnames, group)
+        return
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, fieldnames=fieldnames).writerows(rows)
+    table = shards.table_of(filename)
+    path = os.path.join(DATA_DIR, filename)
+    with shards.lock(filename):
+        if table != filename and not os.path.exists(path):
+            _ensure_csv_schema(filename)
+        groupcommit.append(path, buffer.getvalue().encode('utf-8'))
+        if table != filename:
+            shards.touch(table)
 
 # --- USER MANAGEMENT ---
 def load_users():
     return load_csv('users.csv')
 
 def save_user(username, password, role, email):
-    # Check if email already exists
-    users = load_users()
-    if any(u['email'] == email for u in users):
-        return False
-
-    new_id = get_next_id('users.csv')
     hashed_password = generate_password_hash(password)
-    
-    append_csv('users.csv', ['id', 'username', 'password', 'role', 'email'], {
-        'id': new_id,
-        'username': username,
-        'password': hashed_password,
-        'role': role,
-        'email': email
-    })
+
+    with write_lock('users.csv'):
+        # Check if email already exists
+        users = load_users()
+        if any(u['email'] == email for u in users):
+            return False
+
+        new_id = get_next_id('users.csv')
+        append_csv('users.csv', CSV_HEADERS['users.csv'], {
+            'id': new_id,
+            'username': username,
+            'password': hashed_password,
+            'role': role,
+            'email': email
+        })
     return True
 
 def authenticate_user(email, password):
@@ -73,24 +308,22 @@ def authenticate_user(email, password):
     return None
 
 def initialize_admin():
-    users = load_users()
-    # Check if admin exists
-    if not any(u['role'] == 'admin' for u in users):
-        print("Initializing default admin...")
-        save_user('Admin', 'admin123', 'admin', 'admin@resume.com')
+    with write_lock('users.csv'):
+        users = load_users()
+        # Check if admin exists
+        if not any(u['role'] == 'admin' for u in users):
+            print("Initializing default admin...")
+            save_user('Admin', 'admin123', 'admin', 'admin@resume.com')
 
 def delete_user(user_id):
-    users = load_csv('users.csv')
-    new_users = [u for u in users if str(u['id']) != str(user_id) and u['role'] != 'admin'] # Prevent admin deletion
-    
-    if len(users) == len(new_users):
-        return False
-        
-    path = os.path.join(DATA_DIR, 'users.csv')
-    with open(path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['id', 'username', 'password', 'role', 'email'])
-        writer.writeheader()
-        writer.writerows(new_users)
+    with write_lock('users.csv'):
+        users = load_csv('users.csv')
+        new_users = [u for u in users if str(u['id']) != str(user_id) and u['role'] != 'admin'] # Prevent admin deletion
+
+        if len(users) == len(new_users):
+            return False
+
+        rewrite_csv('users.csv', new_users)
     return True
 
 # --- JOB MANAGEMENT ---
@@ -98,72 +331,85 @@ def load_jobs():
     return load_csv('jobs.csv')
 
 def get_job_by_id(job_id):
-    jobs = load_jobs()
-    for job in jobs:
-        if str(job['id']) == str(job_id):
-            return job
-    return None
+    return tablesnap.get_row('jobs.csv', job_id)
 
 def save_job(hr_id, title, description, skills, vacancies):
-    new_id = get_next_id('jobs.csv')
-    append_csv('jobs.csv', ['id', 'hr_id', 'title', 'description', 'skills_required', 'vacancies', 'status'], {
-        'id': new_id,
-        'hr_id': hr_id,
-        'title': title,
-        'description': description,
-        'skills_required': skills,
-        'vacancies': vacancies,
-        'status': 'Open'
-    })
+    with write_lock('jobs.csv'):
+        new_id = get_next_id('jobs.csv')
+        append_csv('jobs.csv', CSV_HEADERS['jobs.csv'], {
+            'id': new_id,
+            'hr_id': hr_id,
+            'title': title,
+            'description': description,
+            'skills_required': skills,
+            'vacancies': vacancies,
+            'status': 'Open',
+            'version': 1
+        })
     return True
 
+def job_version(job):
+    """Jobs created before versioning count as version 1."""
+    return int(job.get('version') or 1)
+
+def update_job(job_id, title, description, skills, vacancies):
+    """Edit a job and bump its version. Returns (old_job, new_job), or None if it does not exist."""
+    with write_lock('jobs.csv'):
+        jobs = load_jobs()
+        for job in jobs:
+            if str(job['id']) == str(job_id):
+                break
+        else:
+            return None
+        old_job = dict(job)
+        job.update({
+            'title': title,
+            'description': description,
+            'skills_required': skills,
+            'vacancies': vacancies,
+            'version': job_version(old_job) + 1
+        })
+        rewrite_csv('jobs.csv', jobs)
+    return old_job, job
+
 def delete_job(job_id):
-    jobs = load_jobs()
-    new_jobs = [j for j in jobs if str(j['id']) != str(job_id)]
-    
-    if len(jobs) == len(new_jobs):
-        return False
-        
-    path = os.path.join(DATA_DIR, 'jobs.csv')
-    with open(path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['id', 'hr_id', 'title', 'description', 'skills_required', 'vacancies', 'status'])
-        writer.writeheader()
-        writer.writerows(new_jobs)
-        
-    # Also delete associated applications
-    apps = load_csv('applications.csv')
-    new_apps = [a for a in apps if str(a['job_id']) != str(job_id)]
-    
-    path_apps = os.path.join(DATA_DIR, 'applications.csv')
-    with open(path_apps, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['id', 'job_id', 'user_id', 'resume_id', 'status', 'hr_notes', 'score'])
-        writer.writeheader()
-        writer.writerows(new_apps)
-        
+    """Delete a job and its hot applications (archive.delete_job drops archived ones too)."""
+    applications = shards.shard_name('applications.csv', job_id)
+    with shards.lock('jobs.csv', applications):
+        jobs = load_jobs()
+        new_jobs = [j for j in jobs if str(j['id']) != str(job_id)]
+
+        if len(jobs) == len(new_jobs):
+            return False
+
+        rewrite_csv('jobs.csv', new_jobs)
+
+        # Also delete associated applications
+        shards.drop(applications)
+
     return True
 
 def update_job_status(job_id, new_status):
-    jobs = load_jobs()
-    updated = False
-    new_jobs = []
-    
-    for job in jobs:
-        if str(job['id']) == str(job_id):
-            job['status'] = new_status
-            updated = True
-        new_jobs.append(job)
-        
-    if updated:
-        path = os.path.join(DATA_DIR, 'jobs.csv')
-        with open(path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=['id', 'hr_id', 'title', 'description', 'skills_required', 'vacancies', 'status'])
-            writer.writeheader()
-            writer.writerows(new_jobs)
-            
+    with write_lock('jobs.csv'):
+        jobs = load_jobs()
+        updated = False
+        new_jobs = []
+
+        for job in jobs:
+            if str(job['id']) == str(job_id):
+                job['status'] = new_status
+                job['closed_date'] = _now() if new_status == 'Closed' else ''
+                updated = True
+            new_jobs.append(job)
+
+        if updated:
+            rewrite_csv('jobs.csv', new_jobs)
+
     return updated
 
 # --- RESUME START ---
 def extract_text_from_pdf(file_stream):
+    import pypdf  # heavy; only needed when a PDF is actually parsed
     try:
         file_stream.seek(0)
         reader = pypdf.PdfReader(file_stream)
@@ -176,6 +422,7 @@ def extract_text_from_pdf(file_stream):
         return ""
 
 def extract_text_from_docx(file_stream):
+    import docx
     try:
         if isinstance(file_stream, (str, bytes, os.PathLike)):
             doc = docx.Document(file_stream)
@@ -188,25 +435,33 @@ def extract_text_from_docx(file_stream):
         print(f"Error reading DOCX: {e}")
         return ""
 
+RESUME_EXTENSIONS = {'pdf', 'docx', 'doc', 'txt'}
+
+def file_extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+# Parsed text of PDF and Word files by content, so re-uploads skip the parser on every worker and node
+_texts = Cache('text')
+
+def extract_text(filename, file_stream):
+    """Extract resume text from a binary stream, picking the parser by file extension."""
+    ext = file_extension(filename)
+    if ext in ('pdf', 'docx', 'doc'):
+        file_stream.seek(0)
+        data = file_stream.read()
+        parse = extract_text_from_pdf if ext == 'pdf' else extract_text_from_docx
+        key = f"{ext}:{hashlib.sha1(data).hexdigest()}"
+        return _texts.get_or_compute(key, lambda: parse(io.BytesIO(data)))
+    # Assume text/plain or try utf-8
+    try:
+        file_stream.seek(0)
+        return file_stream.read().decode('utf-8', errors='ignore')
+    except:
+        return "Could not parse file content."
+
 def save_resume(user_id, filename, file_storage):
-    new_id = get_next_id('resumes.csv')
-    
-    # Extract text based on extension
-    ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-    content_text = ""
-    
-    if ext == 'pdf':
-        content_text = extract_text_from_pdf(file_storage)
-    elif ext in ['docx', 'doc']:
-        content_text = extract_text_from_docx(file_storage)
-    else:
-        # Assume text/plain or try utf-8
-        try:
-            file_storage.seek(0)
-            content_text = file_storage.read().decode('utf-8', errors='ignore')
-        except:
-            content_text = "Could not parse file content."
-            
+    content_text = extract_text(filename, file_storage)
+
     # Save the original file for proper rendering
     uploads_dir = os.path.join(DATA_DIR, 'uploads')
     os.makedirs(uploads_dir, exist_ok=True)
@@ -221,80 +476,119 @@ def save_resume(user_id, filename, file_storage):
     # If binary read moved cursor, reset might be needed, but pypdf/docx usually handle stream.
     # However, saving the raw file might be useful in a real app, but here we only save text to CSV.
     
-    append_csv('resumes.csv', ['id', 'user_id', 'filename', 'content_text', 'upload_date', 'file_path'], {
-        'id': new_id,
-        'user_id': user_id,
-        'filename': filename,
-        'content_text': content_text.replace('\r', ''), # Clean up for CSV, keep \n
-        'upload_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'file_path': file_path
-    })
+    with shards.lock(shards.shard_name('resumes.csv', user_id)):
+        new_id = get_next_id('resumes.csv', user_id)
+        append_csv('resumes.csv', CSV_HEADERS['resumes.csv'], {
+            'id': new_id,
+            'user_id': user_id,
+            'filename': filename,
+            'content_text': content_text.replace('\r', ''), # Clean up for CSV, keep \n
+            'upload_date': _now(),
+            'file_path': file_path
+        })
+        termstats.add_document(content_text)
     return new_id
 
-def get_user_resumes(user_id):
-    resumes = load_csv('resumes.csv')
-    return [r for r in resumes if str(r['user_id']) == str(user_id)]
+def get_user_resumes(user_id, columns=None):
+    return list(iter_csv('resumes.csv', columns, where={'user_id': user_id}))
 
 def get_user_resume(user_id):
-    resumes = load_csv('resumes.csv')
-    user_resumes = [r for r in resumes if str(r['user_id']) == str(user_id)]
-    if user_resumes:
-        return user_resumes[-1]
-    return None
+    """The user's latest resume, text included."""
+    latest = None
+    for r in iter_csv('resumes.csv', where={'user_id': user_id}):
+        latest = r
+    return latest
 
 def get_resume_by_id(resume_id):
-    resumes = load_csv('resumes.csv')
-    for r in resumes:
-        if str(r['id']) == str(resume_id):
-            return r
-    return None
+    return tablesnap.get_row('resumes.csv', resume_id)
 
 # --- APPLICATION MANAGEMENT ---
-def save_application(job_id, user_id, resume_id, score, eligibility='Low'):
-    new_id = get_next_id('applications.csv')
-    # Check if already applied
-    existing = load_csv('applications.csv')
-    for app in existing:
-        if str(app['job_id']) == str(job_id) and str(app['user_id']) == str(user_id):
-            return False 
-
-    append_csv('applications.csv', ['id', 'job_id', 'user_id', 'resume_id', 'status', 'hr_notes', 'score', 'eligibility'], {
-        'id': new_id,
-        'job_id': job_id,
-        'user_id': user_id,
-        'resume_id': resume_id,
-        'status': 'Applied',
-        'hr_notes': '',
-        'score': score,
-        'eligibility': eligibility
-    })
-    return True
+def save_application(job_id, user_id, resume_id, score, eligibility='Low', job_version=1, scoring_mode=None):
+    with shards.lock(shards.shard_name('applications.csv', job_id)):
+        # Check if already applied
+        for _ in iter_csv('applications.csv', columns=(), where={'job_id': job_id, 'user_id': user_id}):
+            return False
+        new_id = get_next_id('applications.csv', job_id)
 
-def get_user_applications(user_id):
-    apps = load_csv('applications.csv')
-    jobs = {j['id']: j['title'] for j in load_jobs()}
-    user_apps = []
-    for app in apps:
-        if str(app['user_id']) == str(user_id):
-            app['job_title'] = jobs.get(app['job_id'], 'Unknown Job')
-            user_apps.append(app)
-    return user_apps
+        append_csv('applications.csv', CSV_HEADERS['applications.csv'], {
+            'id': new_id,
+            'job_id': job_id,
+            'user_id': user_id,
+            'resume_id': resume_id,
+            'status': 'Applied',
+            'hr_notes': '',
+            'score': score,
+            'eligibility': eligibility,
+            'applied_date': _now(),
+            'decision_date': '',
+            'job_version': job_version,
+            'scoring_mode': scoring_mode or SCORING_MODE
+        })
+    return True
 
 # --- AI SIMULATION ---
+TOKEN_PATTERN = re.compile(r'\b\w+\b')
+# Simple email regex
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+# Simple phone regex (very basic)
+PHONE_PATTERN = re.compile(r'\b\d{10}\b|\b\d{3}[-.]?\d{3}[-.]?\d{4}\b')
 
-# --- AI SIMULATION ---
-def class_based_compatibility(resume_text, job_skills):
+class ResumeDocument:
+    """A resume parsed once, in the form every analyzer reads it.
+
+    The analysis and scoring functions accept either raw text or one of
+    these, so a resume scored against many jobs is lowercased and
+    tokenized only once.
+    """
+    __slots__ = ('text', 'lower', 'token_counts', 'token_total', 'emails', 'phones', 'word_count')
+
+    def __init__(self, text):
+        self.text = text
+        self.lower = text.lower()
+        tokens = TOKEN_PATTERN.findall(self.lower)
+        self.token_counts = Counter(tokens)
+        self.token_total = len(tokens)
+        self.emails = EMAIL_PATTERN.findall(text)
+        self.phones = PHONE_PATTERN.findall(text)
+        self.word_count = len(text.split())
+
+    @property
+    def token_set(self):
+        return self.token_counts.keys()
+
+    @property
+    def nbytes(self):
+        """Rough memory footprint, for bounding the document cache."""
+        return 2 * len(self.text) + 100 * len(self.token_counts)
+
+def as_document(resume):
+    """Parse raw resume text; documents pass through unchanged."""
+    return resume if isinstance(resume, ResumeDocument) else ResumeDocument(resume or '')
+
+_documents = LRUCache(maxsize=256, max_bytes=64 * 1024 * 1024, sizeof=lambda doc: doc.nbytes)
+
+def resume_document(resume):
+    """Parsed document of a stored resume row, cached by resume id."""
+    text = resume.get('content_text') or ''
+    key = (DATA_DIR, str(resume['id']))
+    doc = _documents.get(key)
+    # Ids can be reused once a resume is deleted, so the text has to match too
+    if doc is None or doc.text != text:
+        doc = ResumeDocument(text)
+        _documents.put(key, doc)
+    return doc
+
+def class_based_compatibility(resume, job_skills):
     if not job_skills: return 0, []
-    resume_text = resume_text.lower()
+    resume_text = as_document(resume).lower
     skills = [s.strip().lower() for s in job_skills.split(',')]
     matched = [s for s in skills if s in resume_text]
     score = (len(matched) / len(skills)) * 100 if skills else 0
     return round(score, 2), matched
 
-import re
-
-def deep_resume_analysis(text):
-    text_lower = text.lower()
+def deep_resume_analysis(resume):
+    doc = as_document(resume)
+    text_lower = doc.lower
     score = 100
     suggestions = []
     
@@ -319,15 +613,11 @@ def deep_resume_analysis(text):
         suggestions.append("Structure: All key sections detected. Good job!")
 
     # 2. Contact Info Check (Regex)
-    # Simple email regex
-    email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-    if not re.search(email_pattern, text):
+    if not doc.emails:
         suggestions.append("Critical: No email address found. Recruiters cannot contact you.")
         score -= 20
         
-    # Simple phone regex (very basic)
-    phone_pattern = r'\b\d{10}\b|\b\d{3}[-.]?\d{3}[-.]?\d{4}\b'
-    if not re.search(phone_pattern, text):
+    if not doc.phones:
         suggestions.append("Warning: No clear phone number found.")
         score -= 5
 
@@ -343,7 +633,7 @@ def deep_resume_analysis(text):
         suggestions.append(f"Language: Good use of action verbs ({len(found_verbs)} found).")
         
     # 4. Content Length (Rough approximation)
-    word_count = len(text.split())
+    word_count = doc.word_count
     if word_count < 200:
         suggestions.append("Length: Resume seems too short. Elaborate on your experiences.")
         score -= 10
@@ -354,51 +644,72 @@ def deep_resume_analysis(text):
 
     return max(0, score), suggestions
 
-def basic_resume_analysis(text):
+def basic_resume_analysis(resume):
     # Wrapper to maintain backward compatibility if needed, or just redirect
-    return deep_resume_analysis(text)
+    return deep_resume_analysis(resume)
 
-def check_job_satisfaction(resume_text, job_description, detailed=False):
-    """Enhanced job satisfaction check with skill categorization and recommendations."""
-    resume_lower = resume_text.lower()
-    jd_lower = job_description.lower()
-    
-    # Extract words from JD and resume
-    jd_words = re.findall(r'\b\w+\b', jd_lower)
-    resume_words = set(re.findall(r'\b\w+\b', resume_lower))
-    
-    # Expanded stopwords
-    common_stopwords = {
-        'and', 'the', 'to', 'of', 'in', 'a', 'for', 'with', 'on', 'is', 'at', 'an', 'or', 'be', 'as', 'are', 'will',
-        'this', 'that', 'from', 'have', 'has', 'had', 'but', 'they', 'their', 'what', 'which', 'who', 'when',
-        'where', 'how', 'all', 'each', 'other', 'some', 'such', 'into', 'than', 'them', 'these', 'those',
-        'would', 'should', 'could', 'been', 'being', 'were', 'was', 'can', 'may', 'must', 'shall', 'years'
-    }
-    
-    # Extract important keywords (filtering stopwords and short words)
-    important_keywords = [w for w in jd_words if w not in common_stopwords and len(w) > 3]
-    unique_keywords = set(important_keywords)
-    
-    # Technical skill indicators
-    tech_indicators = {
-        'python', 'java', 'javascript', 'c++', 'sql', 'html', 'css', 'react', 'angular', 'vue',
-        'django', 'flask', 'spring', 'nodejs', 'aws', 'azure', 'docker', 'kubernetes', 'git',
-        'machine', 'learning', 'tensorflow', 'pytorch', 'data', 'analysis', 'science',
-        'cloud', 'devops', 'api', 'rest', 'database', 'mongodb', 'postgresql', 'mysql'
-    }
+# Expanded stopwords
+JD_STOPWORDS = {
+    'and', 'the', 'to', 'of', 'in', 'a', 'for', 'with', 'on', 'is', 'at', 'an', 'or', 'be', 'as', 'are', 'will',
+    'this', 'that', 'from', 'have', 'has', 'had', 'but', 'they', 'their', 'what', 'which', 'who', 'when',
+    'where', 'how', 'all', 'each', 'other', 'some', 'such', 'into', 'than', 'them', 'these', 'those',
+    'would', 'should', 'could', 'been', 'being', 'were', 'was', 'can', 'may', 'must', 'shall', 'years'
+}
+
+# Technical skill indicators
+TECH_INDICATORS = {
+    'python', 'java', 'javascript', 'c++', 'sql', 'html', 'css', 'react', 'angular', 'vue',
+    'django', 'flask', 'spring', 'nodejs', 'aws', 'azure', 'docker', 'kubernetes', 'git',
+    'machine', 'learning', 'tensorflow', 'pytorch', 'data', 'analysis', 'science',
+    'cloud', 'devops', 'api', 'rest', 'database', 'mongodb', 'postgresql', 'mysql'
+}
+
+def job_keywords(job_description):
+    """The set of keywords a job description is matched on (stopwords and short words dropped)."""
+    jd_words = TOKEN_PATTERN.findall(job_description.lower())
+    return set(w for w in jd_words if w not in JD_STOPWORDS and len(w) > 3)
+
+def is_tech_keyword(word):
+    return word in TECH_INDICATORS or any(tech in word for tech in TECH_INDICATORS)
+
+def eligibility_level(score):
+    return "High" if score >= 70 else "Medium" if score >= 40 else "Low"
+
+def check_job_satisfaction(resume, job_description, detailed=False, mode=None):
+    """Enhanced job satisfaction check with skill categorization and recommendations.
+
+    ``resume`` is the resume text or its ResumeDocument. ``mode`` is one
+    of SCORING_MODES and defaults to SCORING_MODE.
+    """
+    return match_keywords(as_document(resume), job_keywords(job_description), detailed, mode)
+
+def match_keywords(doc, unique_keywords, detailed=False, mode=None):
+    """check_job_satisfaction for a ResumeDocument and an already extracted job keyword set."""
+    mode = mode or SCORING_MODE
+    if mode not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode: {mode}")
+    resume_words = doc.token_set
     
     # Categorize keywords
     matched = [w for w in unique_keywords if w in resume_words]
-    missing = [w for w in unique_keywords if w not in resume_words]
+    # Sorted, so every process reports the same top gaps (and shared caches agree)
+    missing = sorted(w for w in unique_keywords if w not in resume_words)
+    
+    weights = None
+    if mode != 'keyword' and unique_keywords:
+        score, weights = termstats.weighted_match(doc.token_counts, doc.token_total, unique_keywords, mode)
+        # Report the rarest, most telling gaps first
+        missing.sort(key=lambda w: weights[w], reverse=True)
     
     # Identify technical skills vs general keywords
-    missing_tech = [w for w in missing if w in tech_indicators or any(tech in w for tech in tech_indicators)]
+    missing_tech = [w for w in missing if is_tech_keyword(w)]
     missing_general = [w for w in missing if w not in missing_tech]
     
     if not unique_keywords:
         return 0, {"missing_keywords": [], "message": "Job Description too short to analyze."}
     
-    score = (len(matched) / len(unique_keywords)) * 100
+    if weights is None:
+        score = (len(matched) / len(unique_keywords)) * 100
     
     if detailed:
         # Return detailed breakdown
@@ -408,7 +719,7 @@ def check_job_satisfaction(resume_text, job_description, detailed=False):
             "missing_technical": missing_tech[:5],  # Top 5 technical skills
             "missing_general": missing_general[:5],   # Top 5 general keywords
             "all_missing": sorted(list(missing))[:10],
-            "eligibility_level": "High" if score >= 70 else "Medium" if score >= 40 else "Low",
+            "eligibility_level": eligibility_level(score),
             "recommendation": _get_recommendation(score, missing_tech)
         }
     else:
@@ -431,210 +742,124 @@ def _get_recommendation(score, missing_tech_skills):
         return "This position requires skills you may not have yet. Consider gaining experience in the key areas mentioned."
 
 # --- ADMIN UTILS ---
-def get_system_stats():
-    users = load_users()
-    jobs = load_jobs()
-    apps = load_csv('applications.csv')
-    return {
-        'users': len(users),
-        'jobs': len(jobs),
-        'apps': len(apps),
-        'user_list': users
-    }
-    
 def get_all_jobs():
     return load_jobs()
 
 # --- HR UTILS ---
-def get_hr_jobs_with_applications(hr_id):
-    jobs = load_jobs()
-    my_jobs = {j['id']: j for j in jobs if str(j['hr_id']) == str(hr_id)}
-    
-    if not my_jobs:
-        return {}
-        
-    apps = load_csv('applications.csv')
-    users = {u['id']: u['username'] for u in load_users()}
-    
-    result = {}
-    for jid, job in my_jobs.items():
-        result[jid] = {
-            'title': job['title'],
-            'vacancies': job['vacancies'],
-            'status': job['status'],
-            'apps': []
-        }
-    
-    for app in apps:
-        if app['job_id'] in result:
-            app['username'] = users.get(app['user_id'], 'Unknown')
-            result[app['job_id']]['apps'].append(app)
-            
-    # Sort applications by score
-    for jid in result:
-        result[jid]['apps'].sort(key=lambda x: float(x.get('score', 0) or 0), reverse=True)
-        
-    return result
-
 def update_application_status(app_id, status, notes):
-    apps = load_csv('applications.csv')
+    """Update a hot application; archive.update_application_status restores an archived one first."""
+    names = shards.files_holding('applications.csv', [app_id])
     updated = False
-    new_apps = []
-    
-    fieldnames = ['id', 'job_id', 'user_id', 'resume_id', 'status', 'hr_notes', 'score', 'eligibility']
-    
-    for app in apps:
-        if str(app['id']) == str(app_id):
-            app['status'] = status
-            app['hr_notes'] = notes
-            updated = True
-        new_apps.append(app)
-        
-    if updated:
-        path = os.path.join(DATA_DIR, 'applications.csv')
-        with open(path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(new_apps)
+    with shards.lock(*names):
+        for name in names:
+            apps = load_csv(name)
+            new_apps = []
+
+            for app in apps:
+                if str(app['id']) == str(app_id):
+                    app['status'] = status
+                    app['hr_notes'] = notes
+                    app['decision_date'] = _now()
+                    updated = True
+                new_apps.append(app)
+
+            if updated:
+                rewrite_csv(name, new_apps)
+                fragment_cache.invalidate('applications.csv', app_id)
+                break
     return updated
 
 def bulk_update_applications(app_ids, status, justification):
-    apps = load_csv('applications.csv')
-    updated_count = 0
-    new_apps = []
-    fieldnames = ['id', 'job_id', 'user_id', 'resume_id', 'status', 'hr_notes', 'score', 'eligibility']
-    
     # Ensure app_ids is a set of strings for easy lookup
     target_ids = set(str(aid) for aid in app_ids)
-    
-    for app in apps:
-        if str(app['id']) in target_ids:
-            app['status'] = status
-            # Append new justification to existing notes or set it
-            current_notes = app.get('hr_notes', '')
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
-            app['hr_notes'] = f"{current_notes} | [{timestamp}] {status}: {justification}".strip(" |")
-            updated_count += 1
-        new_apps.append(app)
-        
-    if updated_count > 0:
-        path = os.path.join(DATA_DIR, 'applications.csv')
-        with open(path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(new_apps)
-            
+    names = shards.files_holding('applications.csv', target_ids)
+    updated_count = 0
+    with shards.lock(*names):
+        for name in names:
+            apps = load_csv(name)
+            shard_count = 0
+            new_apps = []
+
+            for app in apps:
+                if str(app['id']) in target_ids:
+                    app['status'] = status
+                    # Append new justification to existing notes or set it
+                    current_notes = app.get('hr_notes', '')
+                    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
+                    app['hr_notes'] = f"{current_notes} | [{timestamp}] {status}: {justification}".strip(" |")
+                    app['decision_date'] = _now()
+                    shard_count += 1
+                new_apps.append(app)
+
+            if shard_count > 0:
+                rewrite_csv(name, new_apps)
+                updated_count += shard_count
+
+        if updated_count > 0:
+            for app_id in target_ids:
+                fragment_cache.invalidate('applications.csv', app_id)
+
     return updated_count
 
 # --- BULK RESUME SCREENING ---
-import zipfile
-import tempfile
-import shutil
+def iter_parsed_resumes(zip_file):
+    """Parse a ZIP's resumes one at a time, yielding {'filename', 'content', 'original_path'} dicts.
 
-def extract_and_parse_resumes(zip_file):
-    """Extract resumes from ZIP and parse each one."""
-    resumes_data = []
-    
-    # Create temporary directory
-    temp_dir = tempfile.mkdtemp()
-    
-    try:
-        # Extract ZIP
-        with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-        
-        # Parse each file
-        for root, dirs, files in os.walk(temp_dir):
-            for filename in files:
-                if filename.startswith('.'):
-                    continue  # Skip hidden files
-                    
-                filepath = os.path.join(root, filename)
-                ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-                
-                content_text = ""
-                
-                try:
-                    if ext == 'pdf':
-                        with open(filepath, 'rb') as f:
-                            content_text = extract_text_from_pdf(f)
-                    elif ext in ['docx', 'doc']:
-                        content_text = extract_text_from_docx(filepath)
-                    elif ext == 'txt':
-                        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                            content_text = f.read()
-                    else:
-                        continue  # Skip unsupported formats
-                    
-                    if content_text.strip():
-                        resumes_data.append({
-                            'filename': filename,
-                            'content': content_text,
-                            'original_path': filepath
-                        })
-                except Exception as e:
-                    print(f"Error parsing {filename}: {e}")
-                    continue
-    
-    finally:
-        # Clean up temp directory
-        shutil.rmtree(temp_dir, ignore_errors=True)
-    
-    return resumes_data
+    Only the resume being handed out is extracted; its ``original_path`` is
+    deleted once the next one is requested, so copy the file before that.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir, zipfile.ZipFile(zip_file, 'r') as zip_ref:
+        for member in zip_ref.infolist():
+            filename = os.path.basename(member.filename)
+            if member.is_dir() or filename.startswith('.') or file_extension(filename) not in RESUME_EXTENSIONS:
+                continue
+            filepath = None
+            try:
+                filepath = zip_ref.extract(member, temp_dir)
+                with open(filepath, 'rb') as f:
+                    content_text = extract_text(filename, f)
+            except Exception as e:
+                print(f"Error parsing {filename}: {e}")
+                content_text = ''
+            if content_text.strip():
+                yield {'filename': filename, 'content': content_text, 'original_path': filepath}
+            if filepath and os.path.exists(filepath):
+                os.remove(filepath)
 
-def screen_candidates(job_id, resumes_data):
-    """Screen candidates and generate recommendations."""
-    job = get_job_by_id(job_id)
-    if not job:
-        return []
-    
-    job_description = f"{job['title']} {job['description']} {job['skills_required']}"
-    vacancies = int(job.get('vacancies', 1))
-    
-    # Score each resume
-    scored_candidates = []
-    for resume in resumes_data:
-        score, details = check_job_satisfaction(resume['content'], job_description, detailed=True)
-        
-        # Determine recommendation
-        if score >= 70:
-            recommendation = "Select"
-            justification = f"Strong match ({score}%). Candidate possesses most required skills."
-        elif score >= 50:
-            recommendation = "Review"
-            justification = f"Moderate match ({score}%). Consider for interview to assess fit."
-        else:
-            recommendation = "Reject"
-            missing_skills = ', '.join(details.get('missing_technical', [])[:3])
-            justification = f"Low match ({score}%). Missing key skills: {missing_skills or 'multiple areas'}."
-        
-        scored_candidates.append({
-            'filename': resume['filename'],
-            'content': resume['content'],
-            'score': score,
-            'recommendation': recommendation,
-            'justification': justification,
-            'details': details,
-            'original_path': resume.get('original_path')
-        })
-    
-    # Sort by score descending
-    scored_candidates.sort(key=lambda x: x['score'], reverse=True)
-    
-    # Auto-select top candidates based on vacancies
-    for i, candidate in enumerate(scored_candidates):
-        if i < vacancies and candidate['score'] >= 60:
-            if candidate['recommendation'] != 'Select':
-                candidate['recommendation'] = 'Select'
-                candidate['justification'] = f"Top {vacancies} candidate ({candidate['score']}%). Meets requirements."
-    
-    return scored_candidates
+def job_description_text(job):
+    """The text a job is scored against: title, description and required skills."""
+    return f"{job['title']} {job['description']} {job['skills_required']}"
 
-def save_candidate_to_pool(job_id, candidate_data):
-    """Save screened candidate to candidate pool."""
-    new_id = get_next_id('candidate_pool.csv')
-    
-    # Save file to uploads
+def screening_recommendation(score, details):
+    """Map a match score to a Select/Review/Reject recommendation and its justification."""
+    if score >= 70:
+        return "Select", f"Strong match ({score}%). Candidate possesses most required skills."
+    if score >= 50:
+        return "Review", f"Moderate match ({score}%). Consider for interview to assess fit."
+    missing_skills = ', '.join(details.get('missing_technical', [])[:3])
+    return "Reject", f"Low match ({score}%). Missing key skills: {missing_skills or 'multiple areas'}."
+
+def score_resume(resume, job_description):
+    """Full scoring of one resume (text or ResumeDocument): job match, screening recommendation and resume quality."""
+    doc = as_document(resume)
+    score, details = check_job_satisfaction(doc, job_description, detailed=True)
+    recommendation, justification = screening_recommendation(score, details)
+    quality, suggestions = deep_resume_analysis(doc)
+    return {
+        'score': score,
+        'eligibility': details.get('eligibility_level', 'Low'),
+        'recommendation': recommendation,
+        'justification': justification,
+        'matched_count': details.get('matched_count', 0),
+        'total_keywords': details.get('total_keywords', 0),
+        'missing_technical': details.get('missing_technical', []),
+        'missing_general': details.get('missing_general', []),
+        'resume_quality': quality,
+        'suggestions': suggestions,
+    }
+
+def store_upload(candidate_data):
+    """Copy a parsed resume's file from its temporary path into uploads; returns the new path."""
     uploads_dir = os.path.join(DATA_DIR, 'uploads')
     os.makedirs(uploads_dir, exist_ok=True)
     
@@ -644,70 +869,214 @@ def save_candidate_to_pool(job_id, candidate_data):
     # Copy from temp to permanent
     if candidate_data.get('original_path') and os.path.exists(candidate_data['original_path']):
         shutil.copy(candidate_data['original_path'], file_path)
+    return file_path
+
+def link_upload(file_path, filename):
+    """Give another row its own path to a stored upload (a hard link, or a copy); returns the new path."""
+    new_path = os.path.join(os.path.dirname(file_path), f"{uuid.uuid4()}_{filename}")
+    if os.path.exists(file_path):
+        try:
+            os.link(file_path, new_path)
+        except OSError:
+            shutil.copy(file_path, new_path)
+    return new_path
+
+def _pool_row(job_id, candidate_data, new_id):
+    """Build a candidate's candidate_pool row, copying its file into uploads unless already stored."""
+    file_path = candidate_data.get('file_path') or store_upload(candidate_data)
     
-    append_csv('candidate_pool.csv', 
-               ['id', 'job_id', 'filename', 'content_text', 'score', 'recommendation', 'justification', 'hr_decision', 'upload_date', 'file_path'],
-               {
-                   'id': new_id,
-                   'job_id': job_id,
-                   'filename': candidate_data['filename'],
-                   'content_text': candidate_data['content'].replace('\r', ''),
-                   'score': candidate_data['score'],
-                   'recommendation': candidate_data['recommendation'],
-                   'justification': candidate_data['justification'],
-                   'hr_decision': '',
-                   'upload_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                   'file_path': file_path
-               })
-    return new_id
+    return {
+        'id': new_id,
+        'job_id': job_id,
+        'filename': candidate_data['filename'],
+        'content_text': candidate_data['content'].replace('\r', ''),
+        'score': candidate_data['score'],
+        'recommendation': candidate_data['recommendation'],
+        'justification': candidate_data['justification'],
+        'hr_decision': '',
+        'upload_date': _now(),
+        'file_path': file_path,
+        'decision_date': '',
+        'job_version': candidate_data.get('job_version', 1),
+        'duplicate_of': candidate_data.get('duplicate_of', ''),
+        'scoring_mode': candidate_data.get('scoring_mode') or SCORING_MODE,
+        'copy_of': candidate_data.get('copy_of', '')
+    }
 
-def get_candidate_pool(job_id):
-    """Get all candidates from pool for a specific job."""
-    candidates = load_csv('candidate_pool.csv')
-    return [c for c in candidates if str(c['job_id']) == str(job_id)]
+def save_candidate_to_pool(job_id, candidate_data):
+    """Save screened candidate to candidate pool."""
+    with shards.lock(shards.shard_name('candidate_pool.csv', job_id)):
+        new_id = get_next_id('candidate_pool.csv', job_id)
+        append_csv('candidate_pool.csv', CSV_HEADERS['candidate_pool.csv'], _pool_row(job_id, candidate_data, new_id))
+        termstats.add_document(candidate_data['content'])
+    return new_id
 
 def update_candidate_decision(candidate_id, decision, notes=''):
-    """Update HR decision for a candidate."""
-    candidates = load_csv('candidate_pool.csv')
+    """Update HR decision for a hot pool candidate; archive.update_candidate_decision restores an archived one first."""
+    names = shards.files_holding('candidate_pool.csv', [candidate_id])
     updated = False
-    new_candidates = []
-    
-    fieldnames = ['id', 'job_id', 'filename', 'content_text', 'score', 'recommendation', 'justification', 'hr_decision', 'upload_date', 'file_path']
-    
-    for candidate in candidates:
-        if str(candidate['id']) == str(candidate_id):
-            candidate['hr_decision'] = decision
-            if notes:
-                candidate['justification'] = f"{candidate['justification']} | HR: {notes}"
-            updated = True
-        new_candidates.append(candidate)
-    
-    if updated:
-        path = os.path.join(DATA_DIR, 'candidate_pool.csv')
-        with open(path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(new_candidates)
-    
+    with shards.lock(*names):
+        for name in names:
+            candidates = load_csv(name)
+            new_candidates = []
+
+            for candidate in candidates:
+                if str(candidate['id']) == str(candidate_id):
+                    candidate['hr_decision'] = decision
+                    candidate['decision_date'] = _now()
+                    if notes:
+                        candidate['justification'] = f"{candidate['justification']} | HR: {notes}"
+                    updated = True
+                new_candidates.append(candidate)
+
+            if updated:
+                rewrite_csv(name, new_candidates)
+                fragment_cache.invalidate('candidate_pool.csv', candidate_id)
+                break
+
     return updated
 
+# --- BATCH DECISIONS ---
+APPLICATION_ACTIONS = {'select': 'Selected', 'reject': 'Rejected'}
+CANDIDATE_DECISIONS = {'Hire', 'Interview', 'Reject'}
+BATCH_JOURNAL_DIR = 'decision_batches'
+BATCH_JOURNAL_TTL = 7 * 24 * 3600
+
+def _batch_journal_path(hr_id, idempotency_key):
+    digest = hashlib.sha256(f"{hr_id}:{idempotency_key}".encode('utf-8')).hexdigest()
+    return os.path.join(DATA_DIR, BATCH_JOURNAL_DIR, f"{digest}.json")
+
+def _prune_batch_journal():
+    journal_dir = os.path.join(DATA_DIR, BATCH_JOURNAL_DIR)
+    cutoff = datetime.now().timestamp() - BATCH_JOURNAL_TTL
+    for name in os.listdir(journal_dir):
+        path = os.path.join(journal_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+        except OSError:
+            continue
+
+def apply_batch_decisions(hr_id, app_decisions, candidate_decisions, idempotency_key=None):
+    """Apply many HR decisions in one transaction: one read and one atomic write per table.
+
+    ``app_decisions`` items are ``{'id', 'action': 'select'|'reject', 'notes'}`` and
+    ``candidate_decisions`` items are ``{'id', 'decision': 'Hire'|'Interview'|'Reject', 'notes'}``.
+    Only rows belonging to ``hr_id``'s jobs are touched. Applying the same decision twice
+    leaves the row unchanged, and a repeated ``idempotency_key`` returns the stored result
+    of the first call without re-applying anything. Rows of archived jobs are not
+    found; archive.apply_batch_decisions restores them first.
+    """
+    journal_path = _batch_journal_path(hr_id, idempotency_key) if idempotency_key else None
+    app_ids = [str(item.get('id', '')) for item in app_decisions]
+    candidate_ids = [str(item.get('id', '')) for item in candidate_decisions]
+    # Read outside the locks, which are taken in name order; a job's owner never changes
+    my_jobs = {j['id'] for j in load_jobs() if str(j['hr_id']) == str(hr_id)}
+    app_files = shards.files_holding('applications.csv', app_ids) if app_decisions else []
+    candidate_files = shards.files_holding('candidate_pool.csv', candidate_ids) if candidate_decisions else []
+    # Replays of one key must not interleave, whichever shards the rows are in
+    journal_lock = [BATCH_JOURNAL_DIR] if journal_path else []
+
+    with shards.lock(*app_files, *candidate_files, *journal_lock):
+        if journal_path and os.path.exists(journal_path):
+            with open(journal_path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            result['replayed'] = True
+            return result
+
+        timestamp = _now()
+        result = {'applications': [], 'candidates': [], 'updated': 0, 'replayed': False}
+
+        if app_decisions:
+            apps = {name: load_csv(name) for name in app_files}
+            by_id = {a['id']: (name, a) for name, rows in apps.items() for a in rows}
+            changed = []
+            changed_files = set()
+            for item in app_decisions:
+                app_id = str(item.get('id', ''))
+                status = APPLICATION_ACTIONS.get(str(item.get('action', '')).lower())
+                notes = str(item.get('notes', '') or '')
+                name, app = by_id.get(app_id, (None, None))
+                if status is None:
+                    outcome = 'invalid'
+                elif app is None:
+                    outcome = 'not_found'
+                elif app['job_id'] not in my_jobs:
+                    outcome = 'forbidden'
+                elif app['status'] == status and app.get('hr_notes', '') == notes:
+                    outcome = 'unchanged'
+                else:
+                    app['status'] = status
+                    app['hr_notes'] = notes
+                    app['decision_date'] = timestamp
+                    changed.append(app_id)
+                    changed_files.add(name)
+                    outcome = 'updated'
+                result['applications'].append({'id': app_id, 'status': outcome})
+            for name in changed_files:
+                rewrite_csv(name, apps[name])
+            for app_id in changed:
+                fragment_cache.invalidate('applications.csv', app_id)
+            result['updated'] += len(changed)
+
+        if candidate_decisions:
+            candidates = {name: load_csv(name) for name in candidate_files}
+            by_id = {c['id']: (name, c) for name, rows in candidates.items() for c in rows}
+            changed = []
+            changed_files = set()
+            for item in candidate_decisions:
+                candidate_id = str(item.get('id', ''))
+                decision = item.get('decision')
+                notes = str(item.get('notes', '') or '')
+                name, candidate = by_id.get(candidate_id, (None, None))
+                note_suffix = f" | HR: {notes}" if notes else ''
+                if decision not in CANDIDATE_DECISIONS:
+                    outcome = 'invalid'
+                elif candidate is None:
+                    outcome = 'not_found'
+                elif candidate['job_id'] not in my_jobs:
+                    outcome = 'forbidden'
+                elif candidate['hr_decision'] == decision and candidate['justification'].endswith(note_suffix):
+                    outcome = 'unchanged'
+                else:
+                    candidate['hr_decision'] = decision
+                    candidate['decision_date'] = timestamp
+                    if note_suffix and not candidate['justification'].endswith(note_suffix):
+                        candidate['justification'] += note_suffix
+                    changed.append(candidate_id)
+                    changed_files.add(name)
+                    outcome = 'updated'
+                result['candidates'].append({'id': candidate_id, 'status': outcome})
+            for name in changed_files:
+                rewrite_csv(name, candidates[name])
+            for candidate_id in changed:
+                fragment_cache.invalidate('candidate_pool.csv', candidate_id)
+            result['updated'] += len(changed)
+
+        if journal_path:
+            os.makedirs(os.path.dirname(journal_path), exist_ok=True)
+            _prune_batch_journal()
+            with atomic_write(journal_path, encoding='utf-8') as f:
+                json.dump(result, f)
+
+    return result
+
 # --- ADMIN MONITORING ---
 def get_recent_activity():
     """Get recent activity for admin dashboard."""
-    apps = load_csv('applications.csv')
-    resumes = load_csv('resumes.csv')
     jobs = load_jobs()
-    users = {u['id']: u['username'] for u in load_users()}
+    users = {u['id']: u['username'] for u in iter_csv('users.csv', columns=('id', 'username'))}
     job_titles = {j['id']: j['title'] for j in jobs}
     
     # Get latest applications
-    recent_apps = sorted(apps, key=lambda x: x.get('id', '0'), reverse=True)[:10]
+    recent_apps = heapq.nlargest(10, iter_csv('applications.csv'), key=lambda x: x.get('id', '0'))
     for app in recent_apps:
         app['username'] = users.get(app.get('user_id'), 'Unknown')
         app['job_title'] = job_titles.get(app.get('job_id'), 'Unknown Job')
     
     # Get latest resumes
-    recent_resumes = sorted(resumes, key=lambda x: x.get('upload_date', ''), reverse=True)[:10]
+    recent_resumes = heapq.nlargest(10, iter_csv('resumes.csv', listing_columns('resumes.csv')),
+                                    key=lambda x: x.get('upload_date', ''))
     for resume in recent_resumes:
         resume['username'] = users.get(resume.get('user_id'), 'Unknown')
     
@@ -722,7 +1091,7 @@ def get_recent_activity():
 
 def get_system_metrics():
     """Calculate system health metrics."""
-    apps = load_csv('applications.csv')
+    apps = list(iter_csv('applications.csv', columns=('job_id', 'score')))
     jobs = load_jobs()
     
     # Calculate average application score